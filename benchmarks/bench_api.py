@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+API benchmark of hdns_cli against the local mock API
+
+Starts benchmarks/mock_api.py for every zone size and measures show_records, bulk_create_records,
+delete_records and export_zone. Reports operations per second of the whole command and the
+p50/p95/p99 latency of the API requests it sent.
+
+    python benchmarks/bench_api.py --sizes 10,1000,100000 --latency 20
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import hdns_cli  # noqa: E402
+
+TOKEN = "token"
+ZONE = "example0.org"
+
+
+@contextlib.contextmanager
+def mock_api(records, latency, max_per_page, rate_limit):
+    """ Run the mock API in its own process with one zone of records A records, yields the URL """
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "mock_api.py"), "--port", "0", "--token", TOKEN,
+         "--zones", "1", "--records", str(records), "--latency", str(latency), "--max_per_page", str(max_per_page),
+         "--rate_limit", str(rate_limit)],
+        stdout=subprocess.PIPE, text=True
+    )
+    try:
+        yield process.stdout.readline().split()[-1]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def client(url):
+    """ Hdns_cli with a Metrics hook and without the zone cache on disk """
+    cli = hdns_cli.Hdns_cli(token=TOKEN, system=url, no_cache=True, rate_limit=0, burst=1, retries=3, backoff=0.1,
+                            max_backoff=1)
+    metrics = hdns_cli.Metrics()
+    cli.add_hook(metrics)
+    return cli, metrics
+
+
+def measure(name, size, ops, function, metrics):
+    """ Run function with stdout discarded, returns a result row """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        latencies = function()
+        seconds = time.perf_counter() - start
+
+    if latencies is None:
+        latencies = [event['latency'] for events in metrics.requests.values() for event in events]
+    latencies = sorted(latency * 1000 for latency in latencies)
+    requests = sum(len(events) for events in metrics.requests.values())
+
+    return {
+        "scenario": name, "size": size, "ops": ops, "requests": requests, "seconds": round(seconds, 3),
+        "ops_per_sec": round(ops / seconds, 1) if seconds else None,
+        "p50_ms": round(hdns_cli.percentile(latencies, 50), 2),
+        "p95_ms": round(hdns_cli.percentile(latencies, 95), 2),
+        "p99_ms": round(hdns_cli.percentile(latencies, 99), 2),
+    }
+
+
+def bench_size(url, size, samples, tmp):
+    """ All scenarios against a zone with size records, returns the result rows """
+    rows = []
+
+    cli, metrics = client(url)
+    rows.append(measure("show_records", size, size,
+                        lambda: cli.show_records(ZONE, output="ndjson"), metrics))
+
+    yaml_file = os.path.join(tmp, f"records-{size}.yaml")
+    with open(yaml_file, "w") as f:
+        f.write("records:\n")
+        for i in range(size):
+            f.write(f"  - {{zone: {ZONE}, name: bench{i}, type: A, value: 10.1.{i >> 8 & 255}.{i & 255}}}\n")
+    cli, metrics = client(url)
+    rows.append(measure("bulk_create_records", size, size,
+                        lambda: cli.bulk_create_records(yaml_file), metrics))
+
+    # every delete_records call is one operation, latency is the wall time of the call
+    keys = random.Random(size).sample(range(size), min(size, samples))
+    cli, metrics = client(url)
+    cli._get_zone_id(ZONE)
+    metrics.requests.clear()
+
+    def delete():
+        latencies = []
+        for i in keys:
+            start = time.perf_counter()
+            cli.delete_records(ZONE, f"host{i}", "A", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    rows.append(measure("delete_records", size, len(keys), delete, metrics))
+
+    cli, metrics = client(url)
+    export_file = os.path.join(tmp, f"export-{size}.zone")
+    rows.append(measure("export_zone", size, 1, lambda: cli.export_zone(ZONE, export_file), metrics))
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API benchmark of hdns_cli against the local mock API')
+    parser.add_argument('--sizes', default='10,1000,100000', help='comma separated number of records per zone')
+    parser.add_argument('--latency', type=float, default=0, help='latency of the mock API in ms')
+    parser.add_argument('--max_per_page', type=int, default=100, help='maximum page size of the mock API')
+    parser.add_argument('--rate_limit', type=float, default=0, help='requests per second of the mock API')
+    parser.add_argument('--samples', type=int, default=500, help='delete_records calls per size')
+    parser.add_argument('--json', action='store_true', help='print the results as json')
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            with mock_api(size, args.latency, args.max_per_page, args.rate_limit) as url:
+                rows += bench_size(url, size, args.samples, tmp)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(hdns_cli.tabulate.tabulate([list(row.values()) for row in rows], [
+            'Scenario', 'Size', 'Ops', 'Requests', 'Seconds', 'Ops/s', 'p50 ms', 'p95 ms', 'p99 ms'
+        ]))
+
+
+if __name__ == '__main__':
+    main()
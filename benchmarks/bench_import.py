@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Import time benchmark of hdns_cli
+
+Imports hdns_cli in fresh interpreters with -X importtime and fails if the import
+gets slower than --max_ms or pulls in one of the heavy modules at load time.
+
+    python benchmarks/bench_import.py --runs 10 --max_ms 50
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ['requests', 'fire', 'loguru', 'tabulate', 'yaml', 'pprint', 'httpx']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time():
+    """
+    Import hdns_cli in a new interpreter
+
+    :return: (total import time in ms, set of imported top level modules)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import hdns_cli'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    total = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip().split('.')[0])
+        if name.strip() == 'hdns_cli':
+            total = int(cumulative) / 1000
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time benchmark of hdns_cli')
+    parser.add_argument('--runs', type=int, default=10, help='number of imports')
+    parser.add_argument('--max_ms', type=float, default=50, help='fail if the median import time is higher')
+    args = parser.parse_args()
+
+    # compile once, the imports would otherwise measure the bytecode compiler (eg. with PYTHONDONTWRITEBYTECODE)
+    subprocess.run([sys.executable, '-m', 'py_compile', 'hdns_cli.py'], cwd=ROOT, check=True)
+    times = []
+    modules = set()
+    for _ in range(args.runs):
+        total, imported = import_time()
+        times.append(total)
+        modules |= imported
+
+    median = statistics.median(times)
+    print(f"hdns_cli import: min {min(times):.1f} ms, median {median:.1f} ms, max {max(times):.1f} ms")
+
+    failed = False
+    heavy = sorted(set(HEAVY_MODULES) & modules)
+    if heavy:
+        print(f"FAIL: imported at load time: {', '.join(heavy)}")
+        failed = True
+    if median > args.max_ms:
+        print(f"FAIL: median import time {median:.1f} ms > {args.max_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
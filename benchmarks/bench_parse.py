@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Parse benchmark of record listings
+
+Decodes a listing of --records records split into pages of --per_page like the API sends them and keeps
+all records, as a record index does. Every JSON backend is measured with plain dicts and with Record
+objects, each in a fresh interpreter, reporting the parse time, peak RSS and retained memory.
+
+    python benchmarks/bench_parse.py --records 100000 --runs 3
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VARIANTS = [(backend, objects) for backend in ('json', 'orjson', 'msgspec') for objects in ('dict', 'Record')]
+
+
+def rss_kb():
+    """ Current resident set size in KB """
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def write_payload(file, records, per_page):
+    """ Pages of a records listing, one JSON document per line """
+    with open(file, "w") as f:
+        for page in range(0, records, per_page):
+            f.write(json.dumps({"records": [
+                {"id": f"{i:032x}", "type": "TXT" if i % 4 else "A", "name": f"host{i}",
+                 "value": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" if i % 4 == 0 else f"\"v=spf1 ip4:10.0.0.{i % 255} -all\"",
+                 "zone_id": "a1b2c3d4e5f6a7b8c9d0e1", "ttl": 3600 if i % 3 else None,
+                 "created": "2021-06-01 12:00:00.000 +0000 UTC", "modified": "2021-06-01 12:00:00.000 +0000 UTC"}
+                for i in range(page, min(page + per_page, records))
+            ], "meta": {"pagination": {"page": page // per_page + 1, "per_page": per_page,
+                                       "last_page": -(-records // per_page), "total_entries": records}}}) + "\n")
+
+
+def run_variant(file, backend, objects):
+    """ Parse the payload in this interpreter, returns the measurements """
+    import gc
+    import hdns_cli
+
+    name, loads = hdns_cli.json_backend(backend)
+    if name != backend:
+        return None
+
+    with open(file, "rb") as f:
+        pages = f.read().splitlines()
+
+    gc.collect()
+    before = rss_kb()
+    start = time.perf_counter()
+
+    records = []
+    for page in pages:
+        entries = loads(page)['records']
+        records.extend(entries if objects == 'dict' else map(hdns_cli.Record, entries))
+
+    seconds = time.perf_counter() - start
+    del pages
+    gc.collect()
+
+    return {
+        "backend": backend, "objects": objects, "records": len(records), "seconds": seconds,
+        "peak_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024,
+        "retained_mb": (rss_kb() - before) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse benchmark of record listings')
+    parser.add_argument('--records', type=int, default=100000, help='number of records of the listing')
+    parser.add_argument('--per_page', type=int, default=100, help='records per page')
+    parser.add_argument('--runs', type=int, default=3, help='runs per variant, the median is reported')
+    parser.add_argument('--json', action='store_true', help='print the results as json')
+    parser.add_argument('--variant', help=argparse.SUPPRESS)
+    parser.add_argument('--payload', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.payload, *args.variant.split(':'))))
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        payload = os.path.join(tmp, "records.ndjson")
+        write_payload(payload, args.records, args.per_page)
+
+        for backend, objects in VARIANTS:
+            results = []
+            for _ in range(args.runs):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--variant', f"{backend}:{objects}", '--payload', payload],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(output)
+                if result is None:
+                    break
+                results.append(result)
+
+            if not results:
+                rows.append({"backend": backend, "objects": objects, "records": None, "seconds": None,
+                             "peak_mb": None, "retained_mb": None})
+                continue
+
+            rows.append({key: statistics.median(result[key] for result in results)
+                         if isinstance(results[0][key], float) else results[0][key] for key in results[0]})
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    import tabulate
+    print(tabulate.tabulate(
+        [[row['backend'], row['objects'], row['records'] or 'not installed',
+          *(f"{row[key]:.{3 if key == 'seconds' else 1}f}" if row[key] is not None else '-'
+            for key in ('seconds', 'peak_mb', 'retained_mb'))] for row in rows],
+        ['Backend', 'Objects', 'Records', 'Parse s', 'Peak MB', 'Retained MB']
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Hetzner DNS API
+
+Implements zones, records, records/bulk, primary_servers, zone import/export and zone file validation
+in memory with pagination, ETags, an optional latency per request and an optional rate limit, so hdns
+can be measured without the production API.
+
+    python benchmarks/mock_api.py --port 8053 --zones 3 --records 1000 --latency 20
+    hdns --system http://127.0.0.1:8053 --token token show_zones
+"""
+
+import argparse
+import hashlib
+import ipaddress
+import json
+import shlex
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def now():
+    return time.strftime("%Y-%m-%d %H:%M:%S.000 +0000 UTC", time.gmtime())
+
+
+class MockState(object):
+    """ Zones, records and primary servers of the mock API """
+
+    def __init__(self):
+        self.zones = {}
+        self.records = {}
+        self.zone_records = {}
+        self.primary_servers = {}
+        self.lock = threading.RLock()
+        self.requests = 0
+
+    def add_zone(self, name, ttl=86400):
+        with self.lock:
+            zone = {
+                "id": uuid.uuid4().hex[:22], "name": name, "ttl": ttl, "registrar": "", "legacy_dns_host": "",
+                "legacy_ns": [], "ns": ["hydrogen.ns.hetzner.com", "oxygen.ns.hetzner.com", "helium.ns.hetzner.de"],
+                "created": now(), "verified": now(), "modified": now(), "project": "", "owner": "",
+                "permission": "", "zone_type": {"id": "", "name": "", "description": "", "prices": None},
+                "status": "verified", "paused": False, "is_secondary_dns": False,
+                "txt_verification": {"name": "", "token": ""}, "records_count": 0
+            }
+            self.zones[zone['id']] = zone
+            self.zone_records[zone['id']] = {}
+            self.add_record(zone['id'], "@", "SOA", "hydrogen.ns.hetzner.com. dns.hetzner.com. 1 86400 10800 3600000 3600")
+            for ns in zone['ns']:
+                self.add_record(zone['id'], "@", "NS", f"{ns}.")
+            return zone
+
+    def delete_zone(self, zone_id):
+        with self.lock:
+            del self.zones[zone_id]
+            for record_id in self.zone_records.pop(zone_id):
+                del self.records[record_id]
+            for ps_id in [ps_id for ps_id, ps in self.primary_servers.items() if ps['zone_id'] == zone_id]:
+                del self.primary_servers[ps_id]
+
+    def add_record(self, zone_id, name, type, value, ttl=None):
+        with self.lock:
+            rr = {"id": uuid.uuid4().hex, "type": type, "name": name, "value": value, "zone_id": zone_id,
+                  "created": now(), "modified": now()}
+            if ttl:
+                rr['ttl'] = ttl
+            self.records[rr['id']] = rr
+            self.zone_records[zone_id][rr['id']] = rr
+            self._touch(zone_id)
+            return rr
+
+    def update_record(self, record_id, data):
+        with self.lock:
+            rr = self.records[record_id]
+            if data.get('zone_id', rr['zone_id']) != rr['zone_id']:
+                raise KeyError(data['zone_id'])
+            rr.update({key: data[key] for key in ('name', 'type', 'value') if key in data})
+            if data.get('ttl'):
+                rr['ttl'] = data['ttl']
+            else:
+                rr.pop('ttl', None)
+            rr['modified'] = now()
+            self._touch(rr['zone_id'])
+            return rr
+
+    def delete_record(self, record_id):
+        with self.lock:
+            rr = self.records.pop(record_id)
+            del self.zone_records[rr['zone_id']][record_id]
+            self._touch(rr['zone_id'])
+
+    def _touch(self, zone_id):
+        zone = self.zones[zone_id]
+        zone['records_count'] = len(self.zone_records[zone_id])
+        zone['modified'] = now()
+
+    def export_zone(self, zone_id):
+        zone = self.zones[zone_id]
+        lines = [f"$ORIGIN {zone['name']}.", f"$TTL {zone['ttl']}"]
+        with self.lock:
+            for rr in self.zone_records[zone_id].values():
+                lines.append(f"{rr['name']}\t{rr.get('ttl', '')}\tIN\t{rr['type']}\t{rr['value']}")
+        return "\n".join(lines) + "\n"
+
+
+def relative_name(name, zone):
+    """ Record name relative to the zone as the API stores it, eg. www.example.org. -> www """
+    name = name.rstrip(".")
+    if name == zone:
+        return "@"
+    return name[:-len(zone) - 1] if name.endswith("." + zone) else name
+
+
+def read_zonefile(text, zone=None):
+    """
+    Records of a zone file as dicts with name, type, value and ttl, names relative to zone, raises ValueError.
+    Independent of the parser of hdns so that the mock doesn't check hdns against itself: comments,
+    parentheses, $ORIGIN, $TTL and omitted owner names are supported, @ without origin stays @.
+    """
+    origin = f"{zone}." if zone else None
+    ttl = None
+    owner = None
+    entries = []
+    tokens = []
+    depth = 0
+
+    for number, line in enumerate(text.splitlines(), 1):
+        lexer = shlex.shlex(line, posix=False)
+        lexer.whitespace_split = True
+        lexer.commenters = ";"
+        try:
+            words = list(lexer)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}")
+
+        if depth == 0:
+            if not words:
+                continue
+            start, blank = number, line[:1] in (" ", "\t")
+
+        for word in words:
+            depth += word.count("(") - word.count(")")
+            word = word if word.startswith('"') else word.strip("()")
+            if word:
+                tokens.append(word)
+
+        if depth < 0:
+            raise ValueError(f"line {start}: unbalanced parentheses")
+        if depth == 0 and tokens:
+            entries.append((start, blank, tokens))
+            tokens = []
+
+    if depth:
+        raise ValueError(f"line {start}: unbalanced parentheses")
+
+    records = []
+    for number, blank, tokens in entries:
+        if tokens[0].upper() == "$ORIGIN" and len(tokens) == 2:
+            origin = tokens[1] if tokens[1].endswith(".") else f"{tokens[1]}.{origin or ''}"
+            continue
+        if tokens[0].upper() == "$TTL" and len(tokens) == 2 and tokens[1].isdigit():
+            ttl = int(tokens[1])
+            continue
+        if tokens[0].startswith("$"):
+            raise ValueError(f"line {number}: unsupported directive {tokens[0]}")
+
+        if not blank:
+            owner = tokens.pop(0)
+            if zone and origin:
+                owner = relative_name(origin if owner == "@" else owner if owner.endswith(".") else
+                                      f"{owner}.{origin}", zone)
+        if owner is None:
+            raise ValueError(f"line {number}: record without owner name")
+
+        record = {"name": owner, "ttl": ttl, "type": None, "value": None}
+        while tokens and (tokens[0].isdigit() or tokens[0].upper() == "IN"):
+            token = tokens.pop(0)
+            if token.isdigit():
+                record['ttl'] = int(token)
+        if tokens:
+            record['type'] = tokens[0].upper()
+            record['value'] = " ".join(tokens[1:])
+
+        error = valid_record(record)
+        if error is None and record['type'] in ('A', 'AAAA'):
+            try:
+                ipaddress.ip_address(record['value'])
+            except ValueError:
+                error = f"invalid {record['type']} value {record['value']}"
+        if error is not None:
+            raise ValueError(f"line {number}: {error}")
+        records.append(record)
+
+    return records
+
+
+def valid_record(data):
+    """ Error message for invalid records, None if the record is valid """
+    for field in ('name', 'type', 'value'):
+        if not data.get(field):
+            return f"{field} is missing"
+    if data['type'] not in ('A', 'AAAA', 'NS', 'MX', 'CNAME', 'RP', 'TXT', 'SOA', 'HINFO', 'SRV', 'DANE', 'TLSA',
+                            'DS', 'CAA'):
+        return f"invalid type {data['type']}"
+    return None
+
+
+class RateLimit(object):
+    """ Token bucket per server, requests over the limit are answered with 429 """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """ Returns (allowed, remaining, seconds until the bucket is full, seconds until the next token) """
+        with self.lock:
+            current = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (current - self.time) * self.rate)
+            self.time = current
+
+            allowed = self.tokens >= 1
+            if allowed:
+                self.tokens -= 1
+            return (allowed, int(self.tokens), (self.burst - self.tokens) / self.rate,
+                    0 if allowed else (1 - self.tokens) / self.rate)
+
+
+class MockApi(object):
+    """
+    Mock API server running in a thread
+    :param token: Accepted Auth-API-Token
+    :param latency: Seconds every request is delayed
+    :param max_per_page: Maximum page size of the listings
+    :param rate_limit: Requests per second, 0 for no limit
+    :param burst: Requests which may be sent at once within the rate limit
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, token="token", latency=0.0, max_per_page=100, rate_limit=0.0,
+                 burst=10):
+        self.state = MockState()
+        self.token = token
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.rate_limit = RateLimit(rate_limit, burst) if rate_limit else None
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def seed(self, zones, records):
+        """ Create zones example0.org ... with records host0 ... A 10.x.x.x each """
+        for z in range(zones):
+            zone = self.state.add_zone(f"example{z}.org")
+            for i in range(records):
+                self.state.add_record(zone['id'], f"host{i}", "A", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self.dispatch("GET")
+
+            def do_POST(self):
+                self.dispatch("POST")
+
+            def do_PUT(self):
+                self.dispatch("PUT")
+
+            def do_DELETE(self):
+                self.dispatch("DELETE")
+
+            def send(self, status, body, content_type="application/json", headers=None):
+                if not isinstance(body, bytes):
+                    body = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def error(self, status, message, headers=None):
+                self.send(status, {"error": {"message": message, "code": status}}, headers=headers)
+
+            def dispatch(self, method):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                path = url.path[len("/api/v1/"):] if url.path.startswith("/api/v1/") else None
+
+                with api.state.lock:
+                    api.state.requests += 1
+
+                if api.latency:
+                    time.sleep(api.latency)
+
+                headers = {}
+                if api.rate_limit is not None:
+                    allowed, remaining, reset, retry = api.rate_limit.take()
+                    headers = {"RateLimit-Limit": str(api.rate_limit.burst), "RateLimit-Remaining": str(remaining),
+                               "RateLimit-Reset": str(int(reset + 0.999))}
+                    if not allowed:
+                        headers["Retry-After"] = str(int(retry + 0.999))
+                        return self.error(429, "rate limit exceeded", headers)
+
+                if path is None:
+                    return self.error(404, "not found")
+                if self.headers.get("Auth-API-Token") != api.token:
+                    return self.error(401, "invalid token")
+
+                try:
+                    status, content = api.route(method, path, query, body)
+                except KeyError as e:
+                    status, content = 404, {"error": {"message": f"{e.args[0]} not found", "code": 404}}
+                except ValueError as e:
+                    status, content = 422, {"error": {"message": str(e), "code": 422}}
+
+                content_type = "text/plain" if isinstance(content, str) else "application/json"
+                if method == "GET" and status == 200:
+                    body = content.encode() if isinstance(content, str) else json.dumps(content).encode()
+                    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        return self.send(304, b"", content_type, {**headers, "ETag": etag})
+                    return self.send(status, body, content_type, {**headers, "ETag": etag})
+                self.send(status, content, content_type, headers)
+
+        return Handler
+
+    def page(self, items, query, key):
+        """ One page of a listing with the pagination meta data of the API """
+        per_page = min(int(query.get("per_page", 100)), self.max_per_page)
+        page = max(int(query.get("page", 1)), 1)
+        last_page = max(1, -(-len(items) // per_page))
+        return {key: items[(page - 1) * per_page:page * per_page], "meta": {"pagination": {
+            "page": page, "per_page": per_page, "previous_page": page - 1 if page > 1 else None,
+            "next_page": page + 1 if page < last_page else None, "last_page": last_page,
+            "total_entries": len(items)
+        }}}
+
+    def route(self, method, path, query, body):
+        """ Returns (status, content) of a request, KeyError answers 404 and ValueError 422 """
+        state = self.state
+        data = json.loads(body) if body and path != "zones/file/validate" and not path.endswith("/import") else {}
+        parts = path.split("/")
+
+        if parts[0] == "zones":
+            if path == "zones" and method == "GET":
+                zones = sorted(state.zones.values(), key=lambda zone: zone['name'])
+                if "name" in query:
+                    zones = [zone for zone in zones if zone['name'] == query['name']]
+                if "search_name" in query:
+                    zones = [zone for zone in zones if query['search_name'] in zone['name']]
+                return 200, self.page(zones, query, "zones")
+
+            if path == "zones" and method == "POST":
+                if any(zone['name'] == data.get('name') for zone in state.zones.values()):
+                    raise ValueError("zone already exists")
+                return 200, {"zone": state.add_zone(data['name'], data.get('ttl', 86400))}
+
+            if path == "zones/file/validate" and method == "POST":
+                results = read_zonefile(body.decode())
+                return 200, {"parsed_records": len(results), "valid_records": [
+                    {key: result[key] for key in ('name', 'type', 'value', 'ttl')} for result in results
+                ]}
+
+            zone = state.zones[parts[1]]
+
+            if len(parts) == 2 and method == "GET":
+                return 200, {"zone": zone}
+            if len(parts) == 2 and method == "PUT":
+                with state.lock:
+                    zone.update({key: data[key] for key in ('name', 'ttl') if key in data}, modified=now())
+                return 200, {"zone": zone}
+            if len(parts) == 2 and method == "DELETE":
+                state.delete_zone(zone['id'])
+                return 200, ""
+            if parts[2:] == ["export"] and method == "GET":
+                return 200, state.export_zone(zone['id'])
+            if parts[2:] == ["import"] and method == "POST":
+                results = read_zonefile(body.decode(), zone['name'])
+                with state.lock:
+                    for record_id in list(state.zone_records[zone['id']]):
+                        state.delete_record(record_id)
+                    for result in results:
+                        state.add_record(zone['id'], result['name'], result['type'], result['value'], result['ttl'])
+                return 200, {"zone": zone}
+
+        if parts[0] == "records":
+            if path == "records" and method == "GET":
+                with state.lock:
+                    if "zone_id" in query:
+                        records = list(state.zone_records[query['zone_id']].values())
+                    else:
+                        records = list(state.records.values())
+                return 200, self.page(records, query, "records")
+
+            if path == "records" and method == "POST":
+                error = valid_record(data)
+                if error:
+                    raise ValueError(error)
+                state.zones[data['zone_id']]
+                return 200, {"record": state.add_record(data['zone_id'], data['name'], data['type'], data['value'],
+                                                        data.get('ttl'))}
+
+            if path == "records/bulk" and method == "POST":
+                created, invalid = [], []
+                for rr in data.get('records', []):
+                    if valid_record(rr) or rr.get('zone_id') not in state.zones:
+                        invalid.append(rr)
+                    else:
+                        created.append(state.add_record(rr['zone_id'], rr['name'], rr['type'], rr['value'],
+                                                        rr.get('ttl')))
+                return 200, {"records": created, "valid_records": created, "invalid_records": invalid}
+
+            if path == "records/bulk" and method == "PUT":
+                updated, failed = [], []
+                for rr in data.get('records', []):
+                    try:
+                        updated.append(state.update_record(rr['id'], rr))
+                    except KeyError:
+                        failed.append(rr)
+                return 200, {"records": updated, "failed_records": failed}
+
+            rr = state.records[parts[1]]
+
+            if method == "GET":
+                return 200, {"record": rr}
+            if method == "PUT":
+                return 200, {"record": state.update_record(rr['id'], data)}
+            if method == "DELETE":
+                state.delete_record(rr['id'])
+                return 200, ""
+
+        if parts[0] == "primary_servers":
+            if path == "primary_servers" and method == "GET":
+                servers = list(state.primary_servers.values())
+                if "zone_id" in query:
+                    servers = [ps for ps in servers if ps['zone_id'] == query['zone_id']]
+                return 200, {"primary_servers": servers}
+
+            if path == "primary_servers" and method == "POST":
+                zone = state.zones[data['zone_id']]
+                ps = {"id": uuid.uuid4().hex[:22], "address": data['address'], "port": data['port'],
+                      "zone_id": zone['id'], "created": now(), "modified": now()}
+                with state.lock:
+                    state.primary_servers[ps['id']] = ps
+                    zone['is_secondary_dns'] = True
+                return 200, {"primary_server": ps}
+
+            ps = state.primary_servers[parts[1]]
+
+            if method == "GET":
+                return 200, {"primary_server": ps}
+            if method == "PUT":
+                with state.lock:
+                    ps.update({key: data[key] for key in ('address', 'port', 'zone_id') if key in data},
+                              modified=now())
+                return 200, {"primary_server": ps}
+            if method == "DELETE":
+                with state.lock:
+                    del state.primary_servers[ps['id']]
+                return 200, ""
+
+        raise KeyError(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Hetzner DNS API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8053, help='0 picks a free port')
+    parser.add_argument('--token', default='token', help='accepted Auth-API-Token')
+    parser.add_argument('--latency', type=float, default=0, help='delay of every request in ms')
+    parser.add_argument('--max_per_page', type=int, default=100, help='maximum page size of the listings')
+    parser.add_argument('--rate_limit', type=float, default=0, help='requests per second, 0 for no limit')
+    parser.add_argument('--burst', type=int, default=10, help='requests which may be sent at once')
+    parser.add_argument('--zones', type=int, default=0, help='number of zones created at start')
+    parser.add_argument('--records', type=int, default=0, help='number of A records created in every zone')
+    args = parser.parse_args()
+
+    api = MockApi(args.host, args.port, args.token, args.latency / 1000, args.max_per_page, args.rate_limit,
+                  args.burst)
+    api.seed(args.zones, args.records)
+    print(f"mock API listening on {api.url}", flush=True)
+
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,64 @@
 #!/usr/bin/env python3
 
-import requests
-import fire
+import importlib
 import json
-from loguru import logger
-import tabulate
-import yaml
-from pprint import pprint
 import os.path
 from os.path import expanduser
+import sys
+import hashlib
+import ipaddress
+import math
+import re
+import tempfile
+import threading
+import time
+
+########################################################################################################################
+# Lazy imports, heavy modules are only imported when a command uses them
+########################################################################################################################
+class LazyModule(object):
+    """
+    Module which is imported on first attribute access, submodules are imported the same way.
+    The import runs through importlib.import_module, so threads using the module at once wait for each other.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, name):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+
+        try:
+            return getattr(self._module, name)
+        except AttributeError:
+            pass
+
+        try:
+            return importlib.import_module(f"{self._name}.{name}")
+        except ImportError:
+            raise AttributeError(f"module {self._name!r} has no attribute {name!r}") from None
+
+
+def lazy_import(name):
+    """ Module which is imported on first attribute access """
+    return LazyModule(name)
+
+
+class _LazyLogger(object):
+    """ loguru logger, imported on first use """
+
+    def __getattr__(self, name):
+        from loguru import logger
+        return getattr(logger, name)
+
+
+requests = lazy_import("requests")
+tabulate = lazy_import("tabulate")
+yaml = lazy_import("yaml")
+concurrent = lazy_import("concurrent")
+logger = _LazyLogger()
 
 ########################################################################################################################
 # Try to autoload settings
@@ -25,26 +75,1171 @@ def config_loader(file):
     except Exception as e:
         logger.exception(e)
 
-home = expanduser("~")
+def profiles_loader(file, system):
+    """ Named accounts of [profile NAME] sections, system defaults to the one of [general] """
+    profiles = {}
+    try:
+        import configparser
+        config = configparser.ConfigParser()
+        config.read(file)
+        for section in config.sections():
+            if section.startswith('profile '):
+                profiles[section[len('profile '):].strip()] = {
+                    'system': config.get(section, 'system', fallback=system or 'dns.hetzner.com'),
+                    'token': config.get(section, 'token'),
+                }
+    except Exception as e:
+        logger.exception(e)
 
-if os.path.isfile(f"{home}/.hdns/hdns.ini"):
-    SYSTEM, TOKEN = config_loader(f"{home}/.hdns/hdns.ini")
-elif os.path.isfile("/etc/hdns/hdns.ini"):
-    SYSTEM, TOKEN = config_loader("/etc/hdns/hdns.ini")
-elif os.path.isfile("./hdns.ini"):
-    SYSTEM, TOKEN = config_loader("./hdns.ini")
-else:
-    SYSTEM = ""
-    TOKEN = ""
+    return profiles
+
+def settings_loader(file, section, defaults):
+    """ Optional settings of a section, missing options keep their default """
+    settings = dict(defaults)
+    if file is None:
+        return settings
+
+    try:
+        import configparser
+        config = configparser.ConfigParser()
+        config.read(file)
+        for option, default in defaults.items():
+            if config.has_option(section, option):
+                settings[option] = type(default)(config.get(section, option))
+    except Exception as e:
+        logger.exception(e)
+
+    return settings
+
+home = expanduser("~")
+_config = None
+
+
+def load_config():
+    """ Settings of the first INI file found, loaded once on first access """
+    global _config
+
+    if _config is None:
+        if os.path.isfile(f"{home}/.hdns/hdns.ini"):
+            config_file = f"{home}/.hdns/hdns.ini"
+        elif os.path.isfile("/etc/hdns/hdns.ini"):
+            config_file = "/etc/hdns/hdns.ini"
+        elif os.path.isfile("./hdns.ini"):
+            config_file = "./hdns.ini"
+        else:
+            config_file = None
+
+        if config_file is not None:
+            system, token = config_loader(config_file) or ("", "")
+        else:
+            system, token = "", ""
+
+        _config = {
+            'CONFIG_FILE': config_file,
+            'SYSTEM': system,
+            'TOKEN': token,
+            'LIMITS': settings_loader(config_file, 'limits', {
+                'rate_limit': 0.0,
+                'burst': 10,
+                'retries': 5,
+                'backoff': 0.5,
+                'max_backoff': 60.0,
+            }),
+            'METRICS': settings_loader(config_file, 'metrics', {
+                'statsd': '',
+                'metrics_file': '',
+            }),
+            'PROFILES': profiles_loader(config_file, system) if config_file is not None else {},
+        }
+
+    return _config
+
+
+def __getattr__(name):
+    """ CONFIG_FILE, SYSTEM, TOKEN, LIMITS, METRICS and PROFILES are loaded on first access """
+    if name in ('CONFIG_FILE', 'SYSTEM', 'TOKEN', 'LIMITS', 'METRICS', 'PROFILES'):
+        return load_config()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 ########################################################################################################################
 # CONSTANTS
 ########################################################################################################################
 VALID_TYPES = ['A', 'AAAA', 'NS', 'MX', 'CNAME', 'RP', 'TXT', 'SOA', 'HINFO', 'SRV', 'DANE', 'TLSA', 'DS', 'CAA']
+POOL_SIZE = 10
+TIMEOUT = 30
+CACHE_DIR = f"{home}/.hdns/cache"
+CACHE_TTL = 300
+HTTP_CACHE_DIR = f"{home}/.hdns/cache/http"
+# the HTTP cache is opt-in, writing every page costs more than it saves unless listings are requested repeatedly
+HTTP_CACHE_SIZE = 0
+PER_PAGE = 100
+BATCH_SIZE = 100
+CONCURRENCY = 8
+DAEMON_SOCKET = f"{home}/.hdns/hdns.sock"
+DAEMON_KEY = f"{home}/.hdns/daemon.key"
+# commands the daemon runs, serve can't be nested and the token is never sent over its socket
+DAEMON_COMMANDS = ['show_system', 'refresh', 'show_zones', 'create_zone', 'update_zone', 'delete_zone', 'show_records',
+                   'query', 'create_record', 'bulk_create_records', 'sync', 'batch', 'transaction', 'rollback',
+                   'update_record', 'delete_record', 'delete_records', 'bulk_delete_records', 'delete_record_by_id',
+                   'import_zone', 'export_zone', 'export_all', 'validate_zonefile', 'validate_dir', 'import_dir',
+                   'show_primary_servers', 'create_primary_server', 'update_primary_server', 'delete_primary_server',
+                   'bulk_primary_servers']
+JOURNAL_DIR = f"{home}/.hdns/journal"
+# path parts of the API which are no ids, used to group requests by endpoint
+ENDPOINT_PARTS = ['zones', 'records', 'primary_servers', 'bulk', 'export', 'import', 'file', 'validate']
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+OUTPUT_FORMATS = ['table', 'json', 'ndjson', 'csv', 'yaml']
+BATCH_OPS = ['create_record', 'update_record', 'delete_record', 'delete_records', 'delete_record_by_id', 'update_zone']
+PRIMARY_SERVER_OPS = ['create', 'update', 'delete']
+# bulk_delete_records asks for confirmation if more records match, unless --force is given
+BULK_DELETE_CONFIRM = 100
+TRANSACTION_OPS = ['create_record', 'update_record', 'delete_record', 'delete_records', 'delete_record_by_id']
+# records managed by Hetzner, never removed by sync
+PROTECTED_RECORDS = [('@', 'SOA'), ('@', 'NS')]
+RETRY_STATUS = [429, 500, 502, 503, 504]
+IDEMPOTENT_METHODS = ['GET', 'PUT', 'DELETE']
+# fastest first, the first installed one decodes the API responses
+JSON_BACKENDS = ['orjson', 'msgspec', 'json']
+
+########################################################################################################################
+# RATE LIMITER
+########################################################################################################################
+class RateLimiter(object):
+    """
+    Token bucket shared by all requests of a client, thread safe.
+    With rate 0 the rate and burst are learned from the RateLimit headers of the API, until the API
+    sends them requests are only held back when the API reports an exhausted limit.
+    """
+
+    def __init__(self, rate=0.0, burst=10):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._learn = rate <= 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """ PRIVATE: Add the tokens of the time since the last refill, call with the lock held """
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """ Wait until a request may be sent """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._blocked_until - now
+
+                if wait <= 0:
+                    if self.rate <= 0:
+                        return
+
+                    self._refill(now)
+
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+
+                    wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """ Hold back all requests for seconds, eg. after a 429 with Retry-After """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def learn(self, limit, remaining, reset):
+        """
+        Follow the limit of the API: RateLimit-Limit requests at once, refilled within RateLimit-Reset
+        seconds once used. The rate is the highest seen as Reset is rounded up to whole seconds, the
+        tokens never exceed the remaining requests reported by the API.
+        """
+        with self._lock:
+            learned = self.rate > 0
+            if reset > 0 and limit > remaining:
+                self.rate = max(self.rate, (limit - remaining) / reset)
+            if self.rate <= 0:
+                return
+
+            self.burst = max(limit, 1)
+            if learned:
+                self._refill(time.monotonic())
+                self._tokens = min(self._tokens, remaining)
+            else:
+                self._tokens, self._updated = float(remaining), time.monotonic()
+
+    def update(self, headers):
+        """ Follow the rate limit headers of an API response """
+        remaining = headers.get('RateLimit-Remaining', headers.get('X-RateLimit-Remaining-Minute'))
+        if remaining is None:
+            return
+
+        try:
+            reset = headers.get('RateLimit-Reset')
+            if reset is not None:
+                # epoch timestamp or seconds until the limit is refilled
+                reset = float(reset) - time.time() if float(reset) > 1e9 else float(reset)
+
+            limit = headers.get('RateLimit-Limit')
+            if self._learn and limit is not None and reset is not None:
+                self.learn(int(limit), int(remaining), reset)
+
+            # a learned rate paces the requests until the limit is refilled
+            if int(remaining) > 0 or self._learn and self.rate > 0:
+                return
+
+            self.pause(max(reset if reset is not None else 60 - time.time() % 60, 0))
+
+        except ValueError:
+            pass
+
+
+def retry_after(headers):
+    """ Seconds of a Retry-After header (delay seconds or HTTP date), None if not present """
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+########################################################################################################################
+# METRICS
+########################################################################################################################
+def endpoint_of(path):
+    """ API path with ids replaced, eg. records/{id} """
+    return "/".join(part if part in ENDPOINT_PARTS else "{id}" for part in path.split("/"))
+
+
+def percentile(values, p):
+    """ Nearest rank percentile of sorted values """
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class Metrics(object):
+    """
+    Hook collecting request and cache events of one hdns run.
+    Request events: {"event": "request", "method", "endpoint", "status", "bytes", "latency", "wait", "attempt"}
+    Cache events: {"event": "cache", "cache", "hit"}
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.cache = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            if event['event'] == 'request':
+                self.requests.setdefault((event['method'], event['endpoint']), []).append(event)
+            elif event['event'] == 'cache':
+                key = (event['cache'], 'hit' if event['hit'] else 'miss')
+                self.cache[key] = self.cache.get(key, 0) + 1
+
+    def report(self, file=None):
+        """ Print count, errors, latency percentiles in ms, rate limit wait and bytes per endpoint """
+        file = sys.stderr if file is None else file
+        rows = []
+        with self._lock:
+            for (method, endpoint), events in sorted(self.requests.items(), key=lambda item: item[0][1]):
+                latencies = sorted(event['latency'] * 1000 for event in events)
+                rows.append([
+                    method, endpoint, len(events),
+                    len([event for event in events if event['status'] is None or event['status'] >= 400]),
+                    f"{percentile(latencies, 50):.1f}", f"{percentile(latencies, 95):.1f}",
+                    f"{percentile(latencies, 99):.1f}", f"{sum(latencies):.1f}",
+                    f"{sum(event['wait'] for event in events) * 1000:.1f}",
+                    sum(event['bytes'] for event in events)
+                ])
+            cache = dict(self.cache)
+
+        print("*** Profile " + "*" * 80, file=file)
+        print(tabulate.tabulate(rows, ['Method', 'Endpoint', 'Count', 'Errors', 'p50 ms', 'p95 ms', 'p99 ms',
+                                       'Total ms', 'Wait ms', 'Bytes']), file=file)
+        for name in sorted({name for name, _ in cache}):
+            print(f"cache {name}: {cache.get((name, 'hit'), 0)} hits, {cache.get((name, 'miss'), 0)} misses",
+                  file=file)
+
+    def openmetrics(self):
+        """ Collected events in the OpenMetrics text format """
+        lines = [
+            "# TYPE hdns_api_requests counter",
+            "# HELP hdns_api_requests API requests by method, endpoint and status",
+        ]
+        histogram = [
+            "# TYPE hdns_api_request_duration_seconds histogram",
+            "# HELP hdns_api_request_duration_seconds Latency of the API requests",
+        ]
+        received = [
+            "# TYPE hdns_api_response_bytes counter",
+            "# HELP hdns_api_response_bytes Bytes received from the API",
+        ]
+
+        with self._lock:
+            for (method, endpoint), events in sorted(self.requests.items()):
+                labels = f'method="{method}",endpoint="{endpoint}"'
+
+                statuses = {}
+                for event in events:
+                    status = event['status'] or "error"
+                    statuses[status] = statuses.get(status, 0) + 1
+                for status, count in sorted(statuses.items(), key=str):
+                    lines.append(f'hdns_api_requests_total{{{labels},status="{status}"}} {count}')
+
+                for bucket in LATENCY_BUCKETS:
+                    count = len([event for event in events if event['latency'] <= bucket])
+                    histogram.append(f'hdns_api_request_duration_seconds_bucket{{{labels},le="{bucket}"}} {count}')
+                histogram.append(f'hdns_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} {len(events)}')
+                histogram.append(f'hdns_api_request_duration_seconds_sum{{{labels}}} '
+                                 f'{sum(event["latency"] for event in events):.6f}')
+                histogram.append(f'hdns_api_request_duration_seconds_count{{{labels}}} {len(events)}')
+
+                received.append(f'hdns_api_response_bytes_total{{{labels}}} {sum(event["bytes"] for event in events)}')
+
+            cache = [
+                "# TYPE hdns_cache_lookups counter",
+                "# HELP hdns_cache_lookups Lookups of zone ids and record indexes answered from cache or not",
+            ] + [f'hdns_cache_lookups_total{{cache="{name}",result="{result}"}} {count}'
+                 for (name, result), count in sorted(self.cache.items())]
+
+        return "\n".join(lines + histogram + received + cache + [
+            "# TYPE hdns_last_run_timestamp_seconds gauge",
+            f"hdns_last_run_timestamp_seconds {time.time():.3f}",
+            "# EOF",
+        ]) + "\n"
+
+
+class StatsdHook(object):
+    """ Hook sending request latencies and counters to StatsD over UDP, eg. StatsdHook("localhost:8125") """
+
+    def __init__(self, address, prefix="hdns"):
+        import socket
+
+        host, _, port = str(address).rpartition(":")
+        self.address = (host or "localhost", int(port or 8125))
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, event):
+        if event['event'] == 'request':
+            name = f"{self.prefix}.api.{event['method'].lower()}.{event['endpoint'].replace('/', '.').replace('{id}', 'id')}"
+            metrics = [
+                f"{name}.latency:{event['latency'] * 1000:.3f}|ms",
+                f"{name}.status.{event['status'] or 'error'}:1|c",
+                f"{name}.bytes:{event['bytes']}|c",
+            ]
+        else:
+            metrics = [f"{self.prefix}.cache.{event['cache']}.{'hit' if event['hit'] else 'miss'}:1|c"]
+
+        try:
+            self._socket.sendto("\n".join(metrics).encode(), self.address)
+        except OSError:
+            pass
+
+
+########################################################################################################################
+# JSON
+########################################################################################################################
+_json_loads = None
+
+
+def json_backend(name=None):
+    """
+    Name and decode function of a JSON backend, the first installed of JSON_BACKENDS if no name is given
+    :param name: orjson, msgspec or json, default: the HDNS_JSON environment variable
+    """
+    name = name or os.environ.get('HDNS_JSON')
+
+    for backend in [name] if name else JSON_BACKENDS:
+        try:
+            if backend == 'orjson':
+                import orjson
+                return backend, orjson.loads
+            if backend == 'msgspec':
+                import msgspec
+                return backend, msgspec.json.Decoder().decode
+        except ImportError:
+            continue
+
+    return 'json', json.loads
+
+
+def json_loads(data):
+    """ Decode JSON of str or bytes with the backend chosen by json_backend on first use """
+    global _json_loads
+    if _json_loads is None:
+        _json_loads = json_backend()[1]
+    return _json_loads(data)
+
+
+########################################################################################################################
+# API OBJECTS
+########################################################################################################################
+class ApiObject(object):
+    """
+    Compact read-only object of an API listing, only the fields in __slots__ are kept and the strings
+    of the fields in _intern are shared between objects. Used like a dict: obj['name'], obj.get('ttl'),
+    {**obj}, dict(obj).
+    """
+    __slots__ = ()
+    _intern = ()
+
+    def __init__(self, data):
+        for field in self.__slots__:
+            if field in data:
+                setattr(self, field, data[field])
+
+        for field in self._intern:
+            value = data.get(field)
+            if isinstance(value, str):
+                setattr(self, field, sys.intern(value))
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [field for field in self.__slots__ if hasattr(self, field)]
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in self.keys()]
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        return dict(self) == (dict(other) if hasattr(other, 'keys') else other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class Record(ApiObject):
+    """ Record kept in a record index """
+    __slots__ = ('id', 'zone_id', 'name', 'type', 'value', 'ttl', 'created', 'modified')
+    _intern = ('zone_id', 'type')
+
+
+class Zone(ApiObject):
+    """ Zone of a listing """
+    __slots__ = ('id', 'name', 'ttl', 'registrar', 'ns', 'is_secondary_dns', 'paused', 'records_count', 'status',
+                 'created', 'verified', 'modified')
+
+
+########################################################################################################################
+# FILE HELPERS
+########################################################################################################################
+def atomic_write(file, data, mode=None):
+    """ Write bytes to file through a temporary file, readers never see a partly written file """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file)), prefix=".hdns-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+########################################################################################################################
+# HTTP CACHE
+########################################################################################################################
+class HttpCache(object):
+    """
+    On-disk cache of GET responses with their ETag, Last-Modified and content hash, one file per URL and token.
+    The least recently used files are removed when the cache grows over max_size bytes. Parsed bodies are
+    kept in memory by content hash, so unchanged pages are not parsed again within one run or daemon.
+    """
+
+    def __init__(self, directory, max_size, max_parsed=16 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_parsed = max_parsed
+        self._parsed = {}
+        self._parsed_size = 0
+        self._lock = threading.Lock()
+        # size of the files on disk, scanned on the first write and then tracked by put
+        self._size = None
+        self._sizes = {}
+
+    @staticmethod
+    def key(url, params, token_hash):
+        """ Name of the cache file of an URL with its query parameters and the token """
+        query = "&".join(f"{name}={value}" for name, value in sorted((params or {}).items()))
+        return hashlib.sha256(f"{token_hash} {url}?{query}".encode()).hexdigest()
+
+    def get(self, key):
+        """ Cached entry {"etag", "last_modified", "hash", "body"} or None """
+        try:
+            with open(os.path.join(self.directory, key), "rb") as f:
+                entry = json.loads(f.readline())
+                entry['body'] = f.read()
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def touch(self, key):
+        """ Mark an entry as recently used """
+        try:
+            os.utime(os.path.join(self.directory, key))
+        except OSError:
+            pass
+
+    def put(self, key, headers, body):
+        """ Store a response body with its validators and evict the least recently used entries """
+        meta = {
+            "etag": headers.get('ETag'),
+            "last_modified": headers.get('Last-Modified'),
+            "hash": hashlib.sha256(body).hexdigest(),
+        }
+        data = json.dumps(meta).encode() + b"\n" + body
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            atomic_write(os.path.join(self.directory, key), data, 0o600)
+        except OSError as e:
+            logger.warning(f"http cache not written: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._scan()
+            self._size += len(data) - self._sizes.get(key, 0)
+            self._sizes[key] = len(data)
+            if self._size > self.max_size:
+                self._evict()
+
+    def _scan(self):
+        """ PRIVATE: Sizes of the files on disk, once per instance """
+        self._sizes = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                self._sizes[entry.name] = entry.stat().st_size
+        self._size = sum(self._sizes.values())
+
+    def _evict(self):
+        """ PRIVATE: Remove the least recently used files until the cache fits into max_size """
+        # other processes may have written files too, evict from the current state of the directory
+        self._scan()
+
+        files = []
+        for name in self._sizes:
+            try:
+                files.append((os.stat(os.path.join(self.directory, name)).st_mtime, name))
+            except OSError:
+                pass
+
+        # down to 90% so that the next writes don't evict again right away
+        for _, name in sorted(files):
+            if self._size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                self._size -= self._sizes.pop(name)
+            except OSError:
+                pass
+
+    def parse(self, body, body_hash=None):
+        """ Parsed JSON of a body, bodies seen before are not parsed again """
+        body_hash = body_hash or hashlib.sha256(body).hexdigest()
+        with self._lock:
+            if body_hash in self._parsed:
+                # most recently used entries are kept at the end
+                self._parsed[body_hash] = self._parsed.pop(body_hash)
+                return self._parsed[body_hash][0]
+
+        content = json_loads(body)
+
+        with self._lock:
+            if len(body) <= self.max_parsed and body_hash not in self._parsed:
+                while self._parsed and self._parsed_size + len(body) > self.max_parsed:
+                    _, size = self._parsed.pop(next(iter(self._parsed)))
+                    self._parsed_size -= size
+                self._parsed[body_hash] = (content, len(body))
+                self._parsed_size += len(body)
+
+        return content
+
+
+########################################################################################################################
+# ZONE FILE PARSER
+########################################################################################################################
+ZONE_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"?|;.*|[()]|[^\s();"]+')
+ZONE_TTL = re.compile(r'^(\d+|(\d+[smhdwSMHDW])+)$')
+ZONE_CLASSES = ['IN', 'CH', 'HS', 'CS']
+TTL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+HOSTNAME_LABEL = re.compile(r'^(\*|[A-Za-z0-9_]([A-Za-z0-9_-]{0,61}[A-Za-z0-9_])?)$')
+
+
+def _zone_logical_lines(lines):
+    """ PRIVATE: Join the lines of a zone file to entries, yields (line number, owner omitted, tokens, error) """
+    tokens = []
+    depth = 0
+    start = 0
+    blank_owner = False
+
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.rstrip("\r\n")
+
+        line_tokens = [t for t in ZONE_TOKEN.findall(line) if not t.startswith(";")]
+
+        if depth == 0:
+            if not line_tokens:
+                continue
+            start = number
+            blank_owner = line[:1] in (" ", "\t")
+
+        for token in line_tokens:
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+            else:
+                tokens.append(token)
+
+        if depth < 0:
+            yield start, blank_owner, tokens, "unbalanced parentheses"
+            tokens, depth = [], 0
+        elif depth == 0 and tokens:
+            yield start, blank_owner, tokens, None
+            tokens = []
+
+    if depth > 0:
+        yield start, blank_owner, tokens, "unbalanced parentheses"
+
+
+def _ttl_seconds(value):
+    """ PRIVATE: TTL in seconds, also in BIND format like 1h30m """
+    if value.isdigit():
+        return int(value)
+    return sum(int(n) * TTL_UNITS[unit.lower()] for n, unit in re.findall(r'(\d+)([smhdwSMHDW])', value))
+
+
+def _absolute_name(name, origin):
+    """ PRIVATE: Absolute domain name of a name relative to origin, without origin names stay relative """
+    if name == "@":
+        return origin or name
+    if name.endswith("."):
+        return name
+    return f"{name}.{origin}" if origin else name
+
+
+def _valid_hostname(name):
+    """ PRIVATE: Check a domain name, relative or absolute """
+    if name in ("@", "."):
+        return True
+    name = name[:-1] if name.endswith(".") else name
+    return 0 < len(name) <= 253 and all(HOSTNAME_LABEL.match(label) for label in name.split("."))
+
+
+def _valid_int(value, maximum):
+    return value.isdigit() and int(value) <= maximum
+
+
+def _valid_hex(value):
+    return re.fullmatch(r'[0-9A-Fa-f]+', value) is not None
+
+
+def _check_rdata(type, rdata):
+    """ PRIVATE: Check the data of a record, returns an error message or None """
+    try:
+        if type == 'A':
+            ipaddress.IPv4Address(rdata[0])
+            ok = len(rdata) == 1
+        elif type == 'AAAA':
+            ipaddress.IPv6Address(rdata[0])
+            ok = len(rdata) == 1
+        elif type in ('NS', 'CNAME'):
+            ok = len(rdata) == 1 and _valid_hostname(rdata[0])
+        elif type == 'MX':
+            ok = len(rdata) == 2 and _valid_int(rdata[0], 65535) and _valid_hostname(rdata[1])
+        elif type == 'TXT':
+            ok = len(rdata) >= 1 and all(not t.startswith('"') or (len(t) > 1 and t.endswith('"')) for t in rdata)
+        elif type == 'SOA':
+            ok = len(rdata) == 7 and _valid_hostname(rdata[0]) and _valid_hostname(rdata[1]) and \
+                all(ZONE_TTL.match(t) for t in rdata[2:])
+        elif type == 'SRV':
+            ok = len(rdata) == 4 and all(_valid_int(t, 65535) for t in rdata[:3]) and _valid_hostname(rdata[3])
+        elif type == 'CAA':
+            ok = len(rdata) >= 3 and _valid_int(rdata[0], 255) and re.fullmatch(r'[A-Za-z0-9]+', rdata[1]) is not None
+        elif type == 'DS':
+            ok = len(rdata) >= 4 and _valid_int(rdata[0], 65535) and _valid_int(rdata[1], 255) and \
+                _valid_int(rdata[2], 255) and _valid_hex("".join(rdata[3:]))
+        elif type in ('TLSA', 'DANE'):
+            ok = len(rdata) >= 4 and all(_valid_int(t, 255) for t in rdata[:3]) and _valid_hex("".join(rdata[3:]))
+        elif type == 'HINFO':
+            ok = len(rdata) == 2
+        elif type == 'RP':
+            ok = len(rdata) == 2 and _valid_hostname(rdata[0]) and _valid_hostname(rdata[1])
+        else:
+            return f"type {type} is not supported"
+    except (ValueError, IndexError):
+        ok = False
+
+    return None if ok else f"invalid {type} record data: {' '.join(rdata)}"
+
+
+def parse_zonefile(lines, origin=None):
+    """
+    Parse a zone file in RFC 1035 format line by line with $ORIGIN, $TTL and multi-line parentheses.
+    Yields dicts with line, name, ttl, type, value and error, error is None if the record is valid.
+    Errors in directives are yielded with type None.
+    :param lines: Iterable of lines, eg. an open file
+    :param origin: Origin until the first $ORIGIN, eg. example.org.
+    """
+    if origin and not origin.endswith("."):
+        origin += "."
+    ttl = None
+    owner = None
+
+    for number, blank_owner, tokens, error in _zone_logical_lines(lines):
+        if error is not None:
+            yield {"line": number, "name": None, "ttl": None, "type": None, "value": " ".join(tokens), "error": error}
+            continue
+
+        if tokens[0].startswith("$"):
+            directive = tokens[0].upper()
+            if directive == "$ORIGIN" and len(tokens) == 2 and _valid_hostname(tokens[1]) \
+                    and (origin or tokens[1] != "@"):
+                origin = _absolute_name(tokens[1], origin)
+                origin = origin if origin.endswith(".") else origin + "."
+            elif directive == "$TTL" and len(tokens) == 2 and ZONE_TTL.match(tokens[1]):
+                ttl = _ttl_seconds(tokens[1])
+            else:
+                yield {"line": number, "name": None, "ttl": None, "type": None, "value": " ".join(tokens),
+                       "error": f"invalid or unsupported directive {' '.join(tokens)}"}
+            continue
+
+        if not blank_owner:
+            owner = _absolute_name(tokens.pop(0), origin)
+
+        record = {"line": number, "name": owner, "ttl": ttl, "type": None, "value": None, "error": None}
+
+        # TTL and class may be given in any order before the type
+        while tokens and (ZONE_TTL.match(tokens[0]) or tokens[0].upper() in ZONE_CLASSES):
+            token = tokens.pop(0)
+            if ZONE_TTL.match(token):
+                record["ttl"] = _ttl_seconds(token)
+
+        if owner is None:
+            record["error"] = "record without owner name"
+        elif not _valid_hostname(owner):
+            record["error"] = f"invalid owner name {owner}"
+        elif not tokens:
+            record["error"] = "record without type"
+        else:
+            record["type"] = tokens[0].upper()
+            record["value"] = " ".join(tokens[1:])
+            record["error"] = _check_rdata(record["type"], tokens[1:])
+
+        yield record
+
+
+def check_zonefile(file, origin=None):
+    """
+    Validate a zone file offline, the file is read line by line.
+    Returns a dict with parsed_records, valid_records and errors as (line, message).
+    """
+    parsed = 0
+    valid = 0
+    errors = []
+
+    with open(file, "rb") as f:
+        for record in parse_zonefile(f, origin):
+            # every entry except directives is a record, also if it has an error
+            if not (record["value"] or "").startswith("$"):
+                parsed += 1
+                if record["error"] is None:
+                    valid += 1
+            if record["error"] is not None:
+                errors.append((record["line"], record["error"]))
+
+    return {"parsed_records": parsed, "valid_records": valid, "errors": errors}
+
+
+########################################################################################################################
+# OUTPUT WRITERS
+########################################################################################################################
+def write_output(items, fields, columns, output='table', title=None):
+    """
+    Print items as table or stream them one by one as json, ndjson, csv or yaml
+    :param items: Iterable of dicts, eg. records of iter_records
+    :param fields: Keys of the items written in the machine readable formats
+    :param columns: List of (header, key) shown in the table
+    :param output: One of table, json, ndjson, csv, yaml
+    :param title: Line printed above the table
+    """
+    try:
+        _write_output(items, fields, columns, output, title)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        exit_on_broken_pipe()
+
+
+def exit_on_broken_pipe():
+    """ Reader of stdout went away, eg. hdns show_records ... | head, exit without a traceback """
+    # Python flushes stdout again at exit, point it to devnull so that it doesn't fail another time
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(1)
+
+
+def _write_output(items, fields, columns, output, title):
+    """ PRIVATE: Writers of write_output """
+    if output == 'table':
+        rows = [
+            [", ".join(item.get(key) or []) if isinstance(item.get(key), list) else item.get(key) for _, key in columns]
+            for item in items
+        ]
+        if title is not None:
+            print(title)
+        print(tabulate.tabulate(rows, [header for header, _ in columns]))
+        return
+
+    items = ({key: item.get(key) for key in fields} for item in items)
+
+    if output == 'ndjson':
+        for item in items:
+            print(json.dumps(item))
+
+    elif output == 'json':
+        first = True
+        for item in items:
+            print("[" if first else ",", json.dumps(item))
+            first = False
+        print("[]" if first else "]")
+
+    elif output == 'csv':
+        import csv
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        writer.writerow(fields)
+        for item in items:
+            writer.writerow(["" if value is None else " ".join(value) if isinstance(value, list) else value
+                             for value in item.values()])
+
+    elif output == 'yaml':
+        empty = True
+        for item in items:
+            print(yaml.safe_dump([item], default_flow_style=False, sort_keys=False), end="")
+            empty = False
+        if empty:
+            print("[]")
+
+
+########################################################################################################################
+# RECORD FILTER
+########################################################################################################################
+def compile_pattern(pattern):
+    """ Match function of a glob or /regex/ pattern, patterns without wildcards are compared exactly """
+    pattern = str(pattern)
+
+    if len(pattern) > 1 and pattern.startswith('/') and pattern.endswith('/'):
+        return re.compile(pattern[1:-1]).search
+
+    if not any(char in pattern for char in '*?['):
+        return pattern.__eq__
+
+    import fnmatch
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+def record_matcher(type=None, name=None, value=None):
+    """
+    Filter function for records, None matches everything
+    :param type: One or more types, comma separated, eg. A,AAAA
+    :param name: Glob or /regex/ of the record name, eg. 'mail*' or '/^srv[0-9]+$/'
+    :param value: Glob or /regex/ of the record value, eg. 10.0.0.5 or '10.0.*'
+    """
+    tests = []
+
+    if type is not None:
+        types = type if isinstance(type, (list, tuple)) else str(type).split(',')
+        types = {str(t).strip().upper() for t in types}
+        tests.append(lambda rr: rr['type'] in types)
+
+    if name is not None:
+        match_name = compile_pattern(name)
+        tests.append(lambda rr: match_name(rr['name']))
+
+    if value is not None:
+        match_value = compile_pattern(value)
+        tests.append(lambda rr: match_value(rr['value']))
+
+    return lambda rr: all(test(rr) for test in tests)
+
+
+########################################################################################################################
+# RECORD INDEX
+########################################################################################################################
+class RecordIndex(object):
+    """ Records of one zone indexed by id and by (name, type, value) """
+
+    def __init__(self, records=()):
+        self.by_id = {}
+        self.by_key = {}
+        self._lock = threading.RLock()
+
+        for rr in records:
+            self.add(rr)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self.by_id.values()))
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def add(self, rr):
+        """ Add or replace a record, kept as compact Record """
+        if not isinstance(rr, Record):
+            rr = Record(rr)
+
+        with self._lock:
+            self.remove(rr['id'])
+            self.by_id[rr['id']] = rr
+            self.by_key.setdefault((rr['name'], rr['type'], rr['value']), []).append(rr)
+
+    def remove(self, record_id):
+        """ Remove a record by id, returns the removed record or None """
+        with self._lock:
+            rr = self.by_id.pop(record_id, None)
+            if rr is not None:
+                key = (rr['name'], rr['type'], rr['value'])
+                self.by_key[key] = [r for r in self.by_key[key] if r['id'] != record_id]
+                if not self.by_key[key]:
+                    del self.by_key[key]
+            return rr
+
+    def ids(self, name, type, value):
+        """ Ids of all records with the given name, type and value """
+        with self._lock:
+            return [rr['id'] for rr in self.by_key.get((name, type, value), [])]
+
+
+class PrimaryServerIndex(object):
+    """ Primary servers of all zones indexed by id and by (zone_id, address, port) """
+
+    def __init__(self, primary_servers=()):
+        self.by_id = {}
+        self.by_key = {}
+        self._lock = threading.RLock()
+
+        for ps in primary_servers:
+            self.add(ps)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self.by_id.values()))
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def add(self, ps):
+        """ Add or replace a primary server """
+        with self._lock:
+            self.remove(ps['id'])
+            self.by_id[ps['id']] = ps
+            self.by_key.setdefault((ps['zone_id'], ps['address'], int(ps['port'])), []).append(ps)
+
+    def remove(self, ps_id):
+        """ Remove a primary server by id, returns the removed primary server or None """
+        with self._lock:
+            ps = self.by_id.pop(ps_id, None)
+            if ps is not None:
+                key = (ps['zone_id'], ps['address'], int(ps['port']))
+                self.by_key[key] = [p for p in self.by_key[key] if p['id'] != ps_id]
+                if not self.by_key[key]:
+                    del self.by_key[key]
+            return ps
+
+    def ids(self, zone_id, address, port):
+        """ Ids of the primary servers of a zone with the given address and port """
+        with self._lock:
+            return [ps['id'] for ps in self.by_key.get((zone_id, address, int(port)), [])]
+
+
+########################################################################################################################
+# SNAPSHOT
+########################################################################################################################
+class Snapshot(object):
+    """
+    Local SQLite copy of zones, records and primary servers, written by hdns refresh and read with --offline.
+    Every zone keeps the modified timestamp and records_count its records were downloaded with.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS zones (
+            id TEXT PRIMARY KEY, name TEXT, modified TEXT, records_count INTEGER, data TEXT
+        );
+        CREATE TABLE IF NOT EXISTS records (
+            id TEXT PRIMARY KEY, zone_id TEXT, name TEXT, type TEXT, value TEXT, modified TEXT, data TEXT
+        );
+        CREATE INDEX IF NOT EXISTS records_zone ON records (zone_id);
+        CREATE TABLE IF NOT EXISTS primary_servers (
+            id TEXT PRIMARY KEY, zone_id TEXT, data TEXT
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY, value TEXT
+        );
+    """
+
+    def __init__(self, file):
+        import sqlite3
+
+        self.file = file
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(file, check_same_thread=False)
+        self._db.executescript(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _select(self, query, params=()):
+        """ Decoded data column of a query, fetched in chunks """
+        with self._lock:
+            cursor = self._db.execute(query, params)
+            rows = cursor.fetchmany(1000)
+
+        while rows:
+            for (data,) in rows:
+                yield json_loads(data)
+            with self._lock:
+                rows = cursor.fetchmany(1000)
+
+    def zones(self):
+        return self._select("SELECT data FROM zones ORDER BY name")
+
+    def records(self, zone_id=None):
+        if zone_id is None:
+            return self._select("SELECT data FROM records ORDER BY rowid")
+        return self._select("SELECT data FROM records WHERE zone_id = ? ORDER BY rowid", (zone_id,))
+
+    def primary_servers(self, zone_id=None):
+        if zone_id is None:
+            return self._select("SELECT data FROM primary_servers ORDER BY rowid")
+        return self._select("SELECT data FROM primary_servers WHERE zone_id = ? ORDER BY rowid", (zone_id,))
+
+    def refreshed(self):
+        """ Time of the last refresh, None if never refreshed """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'refreshed'").fetchone()
+        return float(row[0]) if row else None
+
+    def zone_versions(self):
+        """ {zone_id: (modified, records_count)} the records of the zones were stored with """
+        with self._lock:
+            rows = self._db.execute("SELECT id, modified, records_count FROM zones").fetchall()
+        return {zone_id: (modified, records_count) for zone_id, modified, records_count in rows}
+
+    def store_zone(self, zone, records):
+        """ Replace a zone and all of its records """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM records WHERE zone_id = ?", (zone['id'],))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((rr['id'], zone['id'], rr['name'], rr['type'], rr['value'], rr.get('modified'), json.dumps(dict(rr)))
+                 for rr in records)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO zones VALUES (?, ?, ?, ?, ?)",
+                (zone['id'], zone['name'], zone.get('modified'), zone.get('records_count'), json.dumps(dict(zone)))
+            )
+
+    def update_zones(self, zones):
+        """ Update unchanged zones and remove zones which don't exist anymore """
+        zones = list(zones)
+        with self._lock, self._db:
+            self._db.executemany("UPDATE zones SET name = ?, data = ? WHERE id = ?",
+                                 ((zone['name'], json.dumps(dict(zone)), zone['id']) for zone in zones))
+
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS current (id TEXT PRIMARY KEY)")
+            self._db.execute("DELETE FROM current")
+            self._db.executemany("INSERT OR IGNORE INTO current VALUES (?)", ((zone['id'],) for zone in zones))
+            removed = self._db.execute("DELETE FROM zones WHERE id NOT IN (SELECT id FROM current)").rowcount
+            self._db.execute("DELETE FROM records WHERE zone_id NOT IN (SELECT id FROM current)")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('refreshed', ?)", (str(time.time()),))
+        return removed
+
+    def store_primary_servers(self, primary_servers):
+        """ Replace all primary servers """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM primary_servers")
+            self._db.executemany("INSERT INTO primary_servers VALUES (?, ?, ?)",
+                                 ((ps['id'], ps['zone_id'], json.dumps(ps)) for ps in primary_servers))
+
+    def store_record(self, rr):
+        """ Add or replace a record changed by hdns, zones which are not in the snapshot are ignored """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO records "
+                "SELECT ?, ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM zones WHERE id = ?)",
+                (rr['id'], rr['zone_id'], rr['name'], rr['type'], rr['value'], rr.get('modified'), json.dumps(dict(rr)),
+                 rr['zone_id'])
+            )
+
+    def remove_record(self, record_id):
+        """ Remove a record deleted by hdns """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM records WHERE id = ?", (record_id,))
+
+    def store_primary_server(self, ps):
+        """ Add or replace a primary server changed by hdns """
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO primary_servers VALUES (?, ?, ?)",
+                             (ps['id'], ps['zone_id'], json.dumps(ps)))
+
+    def remove_primary_server(self, ps_id):
+        """ Remove a primary server deleted by hdns """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM primary_servers WHERE id = ?", (ps_id,))
+
 
 ########################################################################################################################
 # HDNS CLI
 ########################################################################################################################
+class ProfileError(Exception):
+    """ Profile given with --account or --all_profiles is not configured """
+
+
+class OfflineError(Exception):
+    """ No snapshot to answer from or a command which needs the API with --offline """
+
+
 class Hdns_cli(object):
     """HDNS - CLI tool to administer Hetzner DNS via API - Version 1.0.0\n
     Hetzner provides an DNS service completely manageable via API,
@@ -63,16 +1258,444 @@ class Hdns_cli(object):
     system=dns.hetzner.com
     token=<your_token>
 
+    [profile <name>]
+    token=<token_of_another_project>
+
     ---
     Written by Maximilian Thoma 2021, released under GNU General Public License v3.0
     More on https://lanbugs.de or https://github.com/lanbugs/hdns_cli
     :param token: Token for authentication
-    :param system: FQDN of the DNS System used, eg. dns.hetzner.com
+    :param system: FQDN of the DNS System used, eg. dns.hetzner.com, or an URL like http://127.0.0.1:8053
+    :param pool_size: Number of keep-alive connections held in the connection pool, default: 10
+    :param timeout: Timeout in seconds for every API request, default: 30
+    :param http2: Use HTTP/2 if the optional httpx[http2] package is installed, default: False
+    :param cache_ttl: Seconds the zone name to id cache is valid, default: 300
+    :param no_cache: Do not read or write the zone and HTTP caches in ~/.hdns/cache
+    :param http_cache_size: Maximum size in MB of the HTTP response cache in ~/.hdns/cache/http, default: 0 disabled
+    :param offline: Answer read commands from the local snapshot written by hdns refresh, no API requests
+    :param profile: Print count, latency percentiles and bytes per API endpoint and cache hits to stderr at exit
+    :param metrics_file: Write the request metrics at exit to this file in the OpenMetrics text format
+    :param statsd: Send request latencies and counters to this StatsD host:port
+    :param per_page: Number of entries fetched per page from the API, default: 100
+    :param rate_limit: Maximum requests per second, 0 follows the rate limit headers of the API only
+    :param burst: Requests which may be sent at once before rate_limit applies, default: 10
+    :param retries: Retries for rate limited (429), failed (5xx) or broken requests, default: 5
+    :param backoff: Base delay in seconds of the jittered exponential backoff, default: 0.5
+    :param max_backoff: Maximum delay in seconds between two retries, default: 60
+    :param account: Use system and token of the [profile NAME] section of the INI file
+    :param all_profiles: Run read commands concurrently for all profiles and merge the results with a profile column
     """
 
-    def __init__(self, token=TOKEN, system=SYSTEM):
+    def __init__(self, token=None, system=None, pool_size=POOL_SIZE, timeout=TIMEOUT, http2=False,
+                 cache_ttl=CACHE_TTL, no_cache=False, per_page=PER_PAGE, rate_limit=None, burst=None,
+                 retries=None, backoff=None, max_backoff=None, offline=False, profile=False, metrics_file=None,
+                 statsd=None, account=None, all_profiles=False, http_cache_size=HTTP_CACHE_SIZE):
+        if account is not None:
+            profiles = load_config()['PROFILES']
+            if account not in profiles:
+                raise ProfileError(f"profile {account} not found, known profiles: {', '.join(sorted(profiles)) or '-'}")
+            token = profiles[account]['token'] if token is None else token
+            system = profiles[account]['system'] if system is None else system
+
+        if all_profiles and not load_config()['PROFILES']:
+            raise ProfileError("no [profile NAME] sections found for --all_profiles")
+
+        if token is None or system is None:
+            token = load_config()['TOKEN'] if token is None else token
+            system = load_config()['SYSTEM'] if system is None else system
+
+        limits = dict(rate_limit=rate_limit, burst=burst, retries=retries, backoff=backoff, max_backoff=max_backoff)
+        if None in limits.values():
+            limits = {key: load_config()['LIMITS'][key] if value is None else value for key, value in limits.items()}
+
         self.API_TOKEN = token
         self.SYSTEM = system
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._http2 = http2
+        self._base_url = f"{system if '://' in system else 'https://' + system}/api/v1"
+        self._session = None
+        self._cache_ttl = cache_ttl
+        self._no_cache = no_cache
+        self._http_cache = None
+        if http_cache_size and not no_cache:
+            self._http_cache = HttpCache(HTTP_CACHE_DIR, http_cache_size * 1024 * 1024)
+        self._offline = offline
+        self._snapshot = None
+        self._zone_ids = None
+        self._zone_ids_time = 0
+        self._zone_ids_fetched = False
+        self._zone_ids_lock = threading.RLock()
+        self._per_page = per_page
+        self._bulk_supported = True
+        self._record_indexes = {}
+        self._record_indexes_time = {}
+        self._record_indexes_lock = threading.Lock()
+        self._primary_servers = None
+        self._primary_servers_time = 0
+        self._primary_servers_lock = threading.Lock()
+        self._rate_limiter = RateLimiter(limits['rate_limit'], limits['burst'])
+        self._retries = limits['retries']
+        self._backoff = limits['backoff']
+        self._max_backoff = limits['max_backoff']
+        self._account = account
+        self._all_profiles = all_profiles
+        self._label = ""
+        self._clients = None
+        # options of the clients --all_profiles runs, one per profile with its own pool and rate limit
+        self._options = dict(pool_size=pool_size, timeout=timeout, http2=http2, cache_ttl=cache_ttl,
+                             no_cache=no_cache, per_page=per_page, offline=offline, http_cache_size=http_cache_size,
+                             **limits)
+
+        if metrics_file is None or statsd is None:
+            metrics_file = metrics_file or load_config()['METRICS']['metrics_file'] or None
+            statsd = statsd or load_config()['METRICS']['statsd'] or None
+
+        self._hooks = []
+        if profile or metrics_file:
+            import atexit
+            self._metrics = Metrics()
+            self._hooks.append(self._metrics)
+            atexit.register(self._write_metrics, profile, metrics_file)
+        if statsd:
+            self._hooks.append(StatsdHook(statsd))
+
+        # with --all_profiles every profile client checks its own snapshot
+        if offline and not all_profiles and not os.path.isfile(self._snapshot_file()):
+            raise OfflineError("no snapshot for --offline, run hdns refresh first")
+
+    def add_hook(self, hook):
+        """
+        Call hook with a dict for every API request and zone id or record index lookup, eg. Metrics()
+        Request: {"event": "request", "method", "endpoint", "status", "bytes", "latency", "wait", "attempt"}
+        Cache: {"event": "cache", "cache": "zone_ids", "record_index", "primary_servers" or "http", "hit": True or False}
+        """
+        self._hooks.append(hook)
+
+    def _emit(self, event):
+        """ PRIVATE: Pass an event to all hooks, failing hooks don't stop the command """
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logger.warning(f"hook {hook} failed: {e}")
+
+    def _write_metrics(self, profile, metrics_file):
+        """ PRIVATE: Print the profile and write the metrics file at exit """
+        if profile:
+            self._metrics.report()
+        if metrics_file:
+            try:
+                atomic_write(metrics_file, self._metrics.openmetrics().encode(), 0o644)
+            except OSError as e:
+                logger.warning(f"metrics file not written: {e}")
+
+    def _get_session(self):
+        """ PRIVATE: Shared keep-alive session, created on first use """
+        if self._session is None:
+            if self._http2:
+                try:
+                    import httpx
+                    self._session = httpx.Client(
+                        http2=True,
+                        limits=httpx.Limits(max_connections=self._pool_size,
+                                            max_keepalive_connections=self._pool_size),
+                    )
+                    return self._session
+                except ImportError:
+                    logger.warning("httpx[http2] is not installed, falling back to HTTP/1.1")
+
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self._pool_size, pool_maxsize=self._pool_size)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+        return self._session
+
+    def _send(self, method, url, **kwargs):
+        """ PRIVATE: Send one request over the shared session """
+        session = self._get_session()
+
+        if isinstance(session, requests.Session):
+            return session.request(method, url, **kwargs)
+
+        import httpx
+
+        # httpx expects raw bodies as content=, form data stays data=
+        if isinstance(kwargs.get("data"), (str, bytes)) or hasattr(kwargs.get("data"), "read"):
+            kwargs["content"] = kwargs.pop("data")
+
+        try:
+            return session.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(e) from e
+
+    def _request(self, method, path, headers=None, **kwargs):
+        """
+        PRIVATE: Send an API request over the shared session
+        Requests pass the rate limiter, rate limited (429) requests are retried with jittered exponential
+        backoff honoring Retry-After, failed (5xx) or broken requests only if the method is idempotent.
+        """
+        import random
+
+        if self._offline:
+            raise OfflineError(f"{method} {path} not possible with --offline")
+
+        request_headers = {"Auth-API-Token": self.API_TOKEN}
+        if headers is not None:
+            request_headers.update(headers)
+
+        kwargs.setdefault("timeout", self._timeout)
+        url = f"{self._base_url}/{path}"
+        attempt = 0
+
+        while True:
+            start = time.perf_counter()
+            self._rate_limiter.acquire()
+            waited = time.perf_counter() - start
+
+            # streamed bodies are sent from the start again on retries
+            if hasattr(kwargs.get("data"), "seek"):
+                kwargs["data"].seek(0)
+
+            start = time.perf_counter()
+            try:
+                response = self._send(method, url, headers=request_headers, **kwargs)
+            except requests.exceptions.RequestException:
+                if self._hooks:
+                    self._emit_request(method, path, None, start, waited, attempt)
+                if attempt >= self._retries or method not in IDEMPOTENT_METHODS:
+                    raise
+                response = None
+
+            if response is not None:
+                if self._hooks:
+                    self._emit_request(method, path, response, start, waited, attempt)
+                self._rate_limiter.update(response.headers)
+
+                retry = response.status_code == 429 or (
+                    response.status_code in RETRY_STATUS and method in IDEMPOTENT_METHODS
+                )
+                if not retry or attempt >= self._retries:
+                    return response
+
+            delay = random.uniform(0, min(self._max_backoff, self._backoff * 2 ** attempt))
+            if response is not None:
+                wait = retry_after(response.headers)
+                if wait is not None:
+                    delay = min(wait, self._max_backoff) + delay / 10
+                if response.status_code == 429:
+                    self._rate_limiter.pause(delay)
+
+            attempt += 1
+            logger.debug(f"{method} {path} {response.status_code if response is not None else 'failed'}, "
+                         f"retry {attempt}/{self._retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def _emit_request(self, method, path, response, start, waited, attempt):
+        """ PRIVATE: Request event for the hooks """
+        self._emit({
+            "event": "request",
+            "method": method,
+            "endpoint": endpoint_of(path),
+            "status": response.status_code if response is not None else None,
+            "bytes": len(response.content) if response is not None else 0,
+            "latency": time.perf_counter() - start,
+            "wait": waited,
+            "attempt": attempt
+        })
+
+    @staticmethod
+    def _decode(response):
+        """ PRIVATE: Decode a JSON response, non JSON bodies are turned into an error message """
+        if not response.content:
+            return {}
+
+        try:
+            return json_loads(response.content)
+        except ValueError:
+            return {"error": {"message": f"{response.status_code} {response.text[:200].strip()}"}}
+
+    def _get(self, path, params=None, headers=None, raw=False):
+        """
+        PRIVATE: GET through the HTTP cache, returns status code and decoded response, the body if raw
+        Cached responses are revalidated with If-None-Match / If-Modified-Since, on 304 or an unchanged
+        body the cached body and its parsed content are used again.
+        """
+        cache = self._http_cache
+        if cache is None:
+            response = self._request("GET", path, headers=headers, params=params)
+            return response.status_code, response.content if raw else self._decode(response)
+
+        key = cache.key(f"{self._base_url}/{path}", params, self._cache_key())
+        entry = cache.get(key)
+
+        request_headers = dict(headers or {})
+        if entry is not None and entry['etag']:
+            request_headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry['last_modified']:
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self._request("GET", path, headers=request_headers, params=params)
+
+        if response.status_code == 304 and entry is not None:
+            body, body_hash = entry['body'], entry['hash']
+            cache.touch(key)
+        elif response.status_code == 200:
+            body = response.content
+            body_hash = hashlib.sha256(body).hexdigest()
+            if entry is not None and entry['hash'] == body_hash and entry['etag'] == response.headers.get('ETag'):
+                cache.touch(key)
+            else:
+                cache.put(key, response.headers, body)
+        else:
+            return response.status_code, response.content if raw else self._decode(response)
+
+        if self._hooks:
+            self._emit({"event": "cache", "cache": "http", "hit": entry is not None and entry['hash'] == body_hash})
+
+        if raw:
+            return 200, body
+        if not body:
+            return 200, {}
+        try:
+            return 200, cache.parse(body, body_hash)
+        except ValueError:
+            return 200, {"error": {"message": f"200 {body[:200].decode(errors='replace').strip()}"}}
+
+    def _paginate(self, path, key, params=None, factory=None):
+        """
+        PRIVATE: Yield the entries of a listing page by page following meta.pagination
+        :param factory: Class the entries are turned into, eg. Record, dicts if not set
+        """
+        params = dict(params or {})
+        page = 1
+
+        while True:
+            params.update({"page": page, "per_page": self._per_page})
+            status_code, content = self._get(path, params)
+
+            if status_code != 200:
+                raise requests.exceptions.HTTPError(
+                    f"{status_code} listing {path}: {content.get('error', {}).get('message', content)}"
+                )
+
+            entries = content.get(key) or []
+            yield from entries if factory is None else map(factory, entries)
+
+            pagination = (content.get('meta') or {}).get('pagination')
+            if not entries or not pagination or page >= pagination.get('last_page', page):
+                break
+
+            page += 1
+
+    def iter_zones(self):
+        """ Iterate over all zones, page by page """
+        if self._offline:
+            return self._get_snapshot(offline=True).zones()
+        return self._paginate("zones", "zones", factory=Zone)
+
+    def iter_records(self, zone_id=None):
+        """
+        Iterate over all records, page by page
+        :param zone_id: Only records of this zone id, all zones if not set
+        """
+        if self._offline:
+            return self._get_snapshot(offline=True).records(zone_id)
+
+        params = {}
+        if zone_id is not None:
+            params["zone_id"] = zone_id
+        return self._paginate("records", "records", params)
+
+    def iter_primary_servers(self, zone_id=None):
+        """
+        Iterate over all primary servers, page by page
+        :param zone_id: Only primary servers of this zone id, all zones if not set
+        """
+        if self._offline:
+            return self._get_snapshot(offline=True).primary_servers(zone_id)
+
+        params = {}
+        if zone_id is not None:
+            params["zone_id"] = zone_id
+        return self._paginate("primary_servers", "primary_servers", params)
+
+    ####################################################################################################################
+    # Everything regarding profiles
+
+    def _profile_clients(self):
+        """ PRIVATE: One client per [profile NAME] with its own connection pool and rate limit, sharing the hooks """
+        if self._clients is None:
+            self._clients = {}
+            for name in sorted(load_config()['PROFILES']):
+                try:
+                    cli = Hdns_cli(account=name, metrics_file=False, statsd=False, **self._options)
+                except OfflineError as e:
+                    logger.error(f"profile {name}: {e}")
+                    continue
+                cli._hooks = self._hooks
+                cli._label = f"{name}: "
+                self._clients[name] = cli
+
+        return self._clients
+
+    def _each_profile(self, function):
+        """
+        PRIVATE: Items of function(client) for this client, with --all_profiles the items of all profiles
+        merged as they arrive, each with the name of its profile. Failing profiles are logged and skipped.
+        """
+        if not self._all_profiles:
+            yield from function(self)
+            return
+
+        import queue
+
+        clients = self._profile_clients()
+        items = queue.Queue()
+        done = object()
+
+        def run(name, cli):
+            try:
+                for item in function(cli):
+                    items.put({**item, 'profile': name})
+            except Exception as e:
+                logger.error(f"profile {name}: {e}")
+            finally:
+                items.put(done)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            for name, cli in clients.items():
+                executor.submit(run, name, cli)
+
+            remaining = len(clients)
+            while remaining:
+                item = items.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+
+    def _profile_columns(self, fields, columns):
+        """ PRIVATE: Fields and table columns, with --all_profiles the profile in front """
+        if not self._all_profiles:
+            return fields, columns
+        return ['profile'] + fields, [('Profile', 'profile')] + columns
+
+    def _refuse_write(self, command):
+        """
+        PRIVATE: Commands which change something run on one account against the API,
+        raise ProfileError with --all_profiles and OfflineError with --offline
+        """
+        if self._all_profiles:
+            raise ProfileError(f"{command} changes one account and doesn't support --all_profiles, "
+                               f"choose the profile with --account")
+        if self._offline:
+            raise OfflineError(f"{command} changes the account and is not possible with --offline")
+
+    def _where(self):
+        """ PRIVATE: System or profiles shown in the table titles """
+        return "all profiles" if self._all_profiles else self.SYSTEM
 
     def show_token(self):
         """ Shows the current used token """
@@ -82,64 +1705,191 @@ class Hdns_cli(object):
         """ Shows the current used system """
         print(self.SYSTEM)
 
-    def _get_zone_id(self, zone_name):
-        """ PRIVATE: Get the zone id to work with names in records add, mod, remove """
+    def _cache_key(self):
+        """ PRIVATE: Name part of the cache files, one per system and token """
+        return hashlib.sha256(f"{self.SYSTEM}:{self.API_TOKEN}".encode()).hexdigest()[:16]
+
+    def _zone_cache_file(self):
+        """ PRIVATE: On-disk zone cache, one file per system and token """
+        return f"{CACHE_DIR}/zones-{self._cache_key()}.json"
+
+    def _snapshot_file(self):
+        """ PRIVATE: SQLite snapshot of hdns refresh, one file per system and token """
+        return f"{CACHE_DIR}/snapshot-{self._cache_key()}.db"
+
+    def _get_snapshot(self, create=False, offline=False):
+        """
+        PRIVATE: Open the snapshot once, returns None if it doesn't exist and create is False
+        :param offline: Raise an error if there is no snapshot to answer from
+        """
+        if self._snapshot is None:
+            if create:
+                os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+
+            if create or os.path.isfile(self._snapshot_file()):
+                self._snapshot = Snapshot(self._snapshot_file())
+            elif offline:
+                raise OfflineError("no snapshot for --offline, run hdns refresh first")
+            else:
+                self._snapshot = False
+
+        return self._snapshot or None
+
+    def _load_zone_cache(self):
+        """ PRIVATE: Load zone name to id mapping from disk if not expired """
+        if self._no_cache:
+            return False
+
         try:
-            response = requests.get(
-                url=f"https://{self.SYSTEM}/api/v1/zones",
-                headers={"Auth-API-Token": self.API_TOKEN}
+            with open(self._zone_cache_file(), "r") as f:
+                cache = json.load(f)
+
+            if time.time() - cache['time'] < self._cache_ttl:
+                self._zone_ids = cache['zones']
+                self._zone_ids_time = cache['time']
+                return True
+
+        except (OSError, ValueError, KeyError):
+            pass
+
+        return False
+
+    def _save_zone_cache(self):
+        """ PRIVATE: Write zone name to id mapping atomically to disk """
+        if self._no_cache:
+            return
+
+        try:
+            os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+            atomic_write(
+                self._zone_cache_file(),
+                json.dumps({"time": self._zone_ids_time, "zones": self._zone_ids}).encode()
             )
 
-            status_code = response.status_code
-            content = json.loads(response.content)
+        except OSError as e:
+            logger.warning(f"zone cache not written: {e}")
+
+    def _fetch_zone_ids(self):
+        """ PRIVATE: Download the zone list once and refresh the zone cache """
+        self._zone_ids = {zone['name']: zone['id'] for zone in self.iter_zones()}
+        self._zone_ids_time = time.time()
+        self._zone_ids_fetched = True
+        self._save_zone_cache()
+        return True
+
+    def _invalidate_zone_cache(self):
+        """ PRIVATE: Forget cached zone ids, eg. after a zone was created or deleted """
+        with self._zone_ids_lock:
+            self._zone_ids = None
+            self._zone_ids_fetched = False
+
+        if not self._no_cache:
+            try:
+                os.remove(self._zone_cache_file())
+            except OSError:
+                pass
+
+    def _get_zone_ids(self):
+        """
+        PRIVATE: Zone name to id mapping, from memory, the zone cache or downloaded
+        Threads share one mapping, the expiry and the reload run under a lock so that the zone list is
+        downloaded once. Callers keep the returned dict, it is replaced and never changed in place.
+        """
+        with self._zone_ids_lock:
+            if self._zone_ids is not None and time.time() - self._zone_ids_time >= self._cache_ttl:
+                self._zone_ids = None
+                self._zone_ids_fetched = False
 
-            if status_code == 200:
-                for zone in content['zones']:
-                    if zone_name == zone['name']:
-                        return zone['id']
+            hit = True
+            if self._zone_ids is None and not self._load_zone_cache():
+                self._fetch_zone_ids()
+                hit = False
 
-            return False
+            zone_ids = self._zone_ids
 
-        except requests.exceptions.RequestException as e:
-            logger.exception(e)
+        if self._hooks:
+            self._emit({"event": "cache", "cache": "zone_ids", "hit": hit})
+        return zone_ids
 
-    def _get_record_id(self, zone, name, type, value):
-        """ PRIVATE: Get the record id if record is unique """
+    def _get_zone_id(self, zone_name):
+        """ PRIVATE: Get the zone id to work with names in records add, mod, remove """
         try:
-            zone_id = self._get_zone_id(zone)
+            zone_ids = self._get_zone_ids()
 
-            # get all records of domain
-            response = requests.get(
-                url=f"https://{self.SYSTEM}/api/v1/records",
-                params={
-                    "zone_id": zone_id,
-                },
-                headers={
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-            )
+            if zone_name in zone_ids:
+                return zone_ids[zone_name]
 
-            status_code = response.status_code
-            content = json.loads(response.content)
+            # Zone may be created by someone else since the cache was written
+            with self._zone_ids_lock:
+                fetched = not self._zone_ids_fetched and self._fetch_zone_ids()
+                zone_ids = self._zone_ids
 
-            if status_code == 200:
-                records = content['records']
-                matches = 0
-                result = 0
+            if fetched and self._hooks:
+                self._emit({"event": "cache", "cache": "zone_ids", "hit": False})
+            return zone_ids.get(zone_name, False)
 
-                for rr in records:
-                    if rr['name'] == name and rr['type'] == type and rr['value'] == value:
-                        result = rr['id']
-                        matches += 1
+        except requests.exceptions.RequestException as e:
+            logger.exception(e)
+
+    def _get_record_index(self, zone_id):
+        """ PRIVATE: Record index of a zone, the records are downloaded once per cache_ttl """
+        with self._record_indexes_lock:
+            index = self._record_indexes.get(zone_id)
+            if index is not None and time.time() - self._record_indexes_time[zone_id] >= self._cache_ttl:
+                del self._record_indexes[zone_id]
+                index = None
+
+        if self._hooks:
+            self._emit({"event": "cache", "cache": "record_index", "hit": index is not None})
+
+        if index is None:
+            index = RecordIndex(self.iter_records(zone_id))
+            with self._record_indexes_lock:
+                if zone_id not in self._record_indexes:
+                    self._record_indexes_time[zone_id] = time.time()
+                index = self._record_indexes.setdefault(zone_id, index)
+
+        return index
+
+    def _index_record(self, rr):
+        """ PRIVATE: Add or replace a created/updated record in an already built index and the snapshot """
+        with self._record_indexes_lock:
+            index = self._record_indexes.get(rr.get('zone_id'))
+        if index is not None:
+            index.add(rr)
+
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            snapshot.store_record(rr)
+
+    def _unindex_record(self, record_id):
+        """ PRIVATE: Remove a deleted record from the indexes and the snapshot """
+        with self._record_indexes_lock:
+            indexes = list(self._record_indexes.values())
+        for index in indexes:
+            if index.remove(record_id) is not None:
+                break
+
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            snapshot.remove_record(record_id)
+
+    def _drop_record_index(self, zone_id):
+        """ PRIVATE: Forget the record index of a zone, eg. after an import """
+        with self._record_indexes_lock:
+            self._record_indexes.pop(zone_id, None)
+
+    def _get_record_id(self, zone, name, type, value):
+        """ PRIVATE: Get the record id if record is unique """
+        try:
+            zone_id = self._get_zone_id(zone)
 
-                if matches == 1:
-                    return result
-                else:
-                    return False
+            ids = self._get_record_index(zone_id).ids(name, type, value)
 
+            if len(ids) == 1:
+                return ids[0]
             else:
-                print("Error occured")
-                print(content)
+                return False
 
         except requests.exceptions.RequestException as e:
             logger.exception(e)
@@ -149,89 +1899,126 @@ class Hdns_cli(object):
         try:
             zone_id = self._get_zone_id(zone)
 
-            # get all records of domain
-            response = requests.get(
-                url=f"https://{self.SYSTEM}/api/v1/records",
-                params={
-                    "zone_id": zone_id,
-                },
-                headers={
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-            )
+            return self._get_record_index(zone_id).ids(name, type, value)
 
-            status_code = response.status_code
-            content = json.loads(response.content)
+        except requests.exceptions.RequestException as e:
+            logger.exception(e)
 
-            if status_code == 200:
-                records = content['records']
-                result = []
+    def _get_primary_server_index(self):
+        """ PRIVATE: Primary servers of all zones, downloaded once per cache_ttl """
+        with self._primary_servers_lock:
+            index = self._primary_servers
+            if index is not None and time.time() - self._primary_servers_time >= self._cache_ttl:
+                index = self._primary_servers = None
 
-                for rr in records:
-                    if rr['name'] == name and rr['type'] == type and rr['value'] == value:
-                        result.append(rr['id'])
-                return result
+            if self._hooks:
+                self._emit({"event": "cache", "cache": "primary_servers", "hit": index is not None})
 
-            else:
-                print("Error occured")
-                print(content)
+            if index is None:
+                index = self._primary_servers = PrimaryServerIndex(self.iter_primary_servers())
+                self._primary_servers_time = time.time()
 
-        except requests.exceptions.RequestException as e:
-            logger.exception(e)
+            return index
+
+    def _index_primary_server(self, ps):
+        """ PRIVATE: Add or replace a created/updated primary server in the index and the snapshot """
+        if self._primary_servers is not None:
+            self._primary_servers.add(ps)
+
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            snapshot.store_primary_server(ps)
+
+    def _unindex_primary_server(self, ps_id):
+        """ PRIVATE: Remove a deleted primary server from the index and the snapshot """
+        if self._primary_servers is not None:
+            self._primary_servers.remove(ps_id)
+
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            snapshot.remove_primary_server(ps_id)
+
+    def _joined_primary_servers(self):
+        """ PRIVATE: All primary servers with the name of their zone, joined on the zone id cache """
+        zone_names = {zone_id: zone_name for zone_name, zone_id in self._get_zone_ids().items()}
+        return [{**ps, 'zone': zone_names.get(ps['zone_id'])} for ps in self._get_primary_server_index()]
 
     def _get_primary_server_id(self, zone, address, port=53):
+        """ PRIVATE: Get the id of a primary server of a zone """
         try:
             zone_id = self._get_zone_id(zone)
 
-            response = requests.get(
-                url=f"https://{self.SYSTEM}/api/v1/primary_servers",
-                headers={
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-            )
+            ids = self._get_primary_server_index().ids(zone_id, address, port)
+            return ids[0] if ids else False
 
-            status_code = response.status_code
-            content = json.loads(response.content)
+        except requests.exceptions.RequestException as e:
+            logger.exception(e)
+    def refresh(self, force=False, concurrency=CONCURRENCY):
+        """
+        Update the local snapshot used by --offline, only the records of zones whose modified timestamp
+        or records_count changed since the last refresh are downloaded again
+        :param force: Download the records of all zones
+        :param concurrency: Number of zones downloaded in parallel, default: 8
+        """
+        self._refuse_write("refresh")
 
-            if status_code == 200:
-                for ps in content['primary_servers']:
-                    if ps['zone_id'] == zone_id and ps['address'] == address and ps['port'] == port:
-                        return ps['id']
-            else:
-                return False
+        try:
+            start = time.time()
+            snapshot = self._get_snapshot(create=True)
+
+            zones = list(self.iter_zones())
+            versions = snapshot.zone_versions()
+            changed = [
+                zone for zone in zones
+                if force or versions.get(zone['id']) != (zone.get('modified'), zone.get('records_count'))
+            ]
+
+            self._ensure_pool_size(concurrency)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = {executor.submit(lambda zone_id: list(self.iter_records(zone_id)), zone['id']): zone
+                           for zone in changed}
+
+                records = 0
+                for future in concurrent.futures.as_completed(futures):
+                    zone = futures[future]
+                    zone_records = future.result()
+                    snapshot.store_zone(zone, zone_records)
+                    records += len(zone_records)
+
+            removed = snapshot.update_zones(zones)
+            snapshot.store_primary_servers(self.iter_primary_servers())
+
+            print(f"{len(zones)} zones, {len(changed)} refreshed with {records} records, {removed} removed "
+                  f"in {time.time() - start:.2f}s.")
 
         except requests.exceptions.RequestException as e:
             logger.exception(e)
+
     ####################################################################################################################
     # Everything regarding zones
 
-    def show_zones(self):
-        """ Show all zones eg. hdns show_zones """
+    def show_zones(self, output='table'):
+        """
+        Show all zones eg. hdns show_zones
+        :param output: Output format table, json, ndjson, csv or yaml, default: table
+        """
+        if output not in OUTPUT_FORMATS:
+            print(f"Given output {output} is not supported, valid are {', '.join(OUTPUT_FORMATS)}.")
+            return
+
         try:
-            response = requests.get(
-                url=f"https://{self.SYSTEM}/api/v1/zones",
-                headers={"Auth-API-Token": self.API_TOKEN}
+            fields, columns = self._profile_columns(
+                ['id', 'name', 'ttl', 'is_secondary_dns', 'ns', 'records_count', 'status', 'created', 'modified'],
+                [('ID', 'id'), ('Zone', 'name'), ('Secondary?', 'is_secondary_dns'), ('NS', 'ns')]
             )
 
-            status_code = response.status_code
-            content = json.loads(response.content)
-
-            if status_code == 200:
-                result_header = ['ID', 'Zone', 'Secondary?', 'NS']
-                results = []
-
-                for zone in content['zones']:
-                    results.append(
-                        [
-                            zone['id'],
-                            zone['name'],
-                            zone['is_secondary_dns'],
-                            ", ".join(zone['ns'])
-                        ]
-                    )
-
-                print(f"*** Zones @ {self.SYSTEM} " + "*"*80)
-                print(tabulate.tabulate(results, result_header))
+            write_output(
+                self._each_profile(lambda cli: cli.iter_zones()),
+                fields,
+                columns,
+                output,
+                f"*** Zones @ {self._where()} " + "*"*80
+            )
 
         except requests.exceptions.RequestException as e:
             logger.exception(e)
@@ -242,12 +2029,12 @@ class Hdns_cli(object):
         :param zone: Name of the zone, eg. example.org
         :param ttl: Time to live, default: 86400
         """
+        self._refuse_write("create_zone")
         try:
-            response = requests.post(
-                url=f"https://{self.SYSTEM}/api/v1/zones",
+            response = self._request(
+                "POST", "zones",
                 headers={
                     "Content-Type": "application/json",
-                    "Auth-API-Token": self.API_TOKEN,
                 },
                 data=json.dumps({
                     "name": zone,
@@ -256,9 +2043,10 @@ class Hdns_cli(object):
             )
 
             status_code = response.status_code
-            content = json.loads(response.content)
+            content = self._decode(response)
 
             if status_code == 200:
+                self._invalidate_zone_cache()
                 print(f"zone {zone} created.")
             else:
                 print(content['error']['message'])
@@ -266,6 +2054,21 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    def _update_zone(self, zone_id, zone, ttl):
+        """ PRIVATE: Put zone parameters, returns status code and decoded response """
+        response = self._request(
+            "PUT", f"zones/{zone_id}",
+            headers={
+                "Content-Type": "application/json",
+            },
+            data=json.dumps({
+                "name": zone,
+                "ttl": ttl
+            })
+        )
+
+        return response.status_code, self._decode(response)
+
     def update_zone(self, zone, ttl):
         """
         Update zone parameters
@@ -273,23 +2076,11 @@ class Hdns_cli(object):
         :param ttl: Time to Live
 
         """
+        self._refuse_write("update_zone")
         try:
             zone_id = self._get_zone_id(zone)
 
-            response = requests.put(
-                url=f"https://{self.SYSTEM}/api/v1/zones/{zone_id}",
-                headers={
-                    "Content-Type": "application/json",
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-                data=json.dumps({
-                    "name": zone,
-                    "ttl": ttl
-                })
-            )
-
-            status_code = response.status_code
-            content = json.loads(response.content)
+            status_code, content = self._update_zone(zone_id, zone, ttl)
 
             if status_code == 200:
                 print(f"zone {zone} updated.")
@@ -305,6 +2096,7 @@ class Hdns_cli(object):
         :param zone: Name of the zone, eg. example.org
         :param force: If set to True no safety question applied, zone will be deleted directly
         """
+        self._refuse_write("delete_zone")
         zone_id = self._get_zone_id(zone)
         doit = False
         try:
@@ -318,19 +2110,17 @@ class Hdns_cli(object):
                 doit = True
 
             if doit is True:
-                response = requests.delete(
-                    url=f"https://{self.SYSTEM}/api/v1/zones/{zone_id}",
-                    headers={
-                        "Auth-API-Token": self.API_TOKEN,
-                    },
-                )
+                response = self._request("DELETE", f"zones/{zone_id}")
 
                 status_code = response.status_code
-                content = json.loads(response.content)
+                content = self._decode(response)
 
                 if status_code == 200:
+                    self._invalidate_zone_cache()
+                    self._drop_record_index(zone_id)
                     print(f"zone {zone} deleted.")
                 else:
+                    from pprint import pprint
                     pprint(content)
 
             else:
@@ -343,49 +2133,140 @@ class Hdns_cli(object):
     ####################################################################################################################
     # Everything regarding records
 
-    def show_records(self, zone, id=False):
+    def show_records(self, zone, id=False, output='table', type=None, name=None, value=None):
         """
         Shows records of given zone eg. hdns show_records --zone example.org
         :param zone: Name of the zone, eg. example.org
         :param id: Show record ids if True
+        :param output: Output format table, json, ndjson, csv or yaml, records are printed while they are downloaded
+        except for table, default: table
+        :param type: Only records of these types, comma separated, eg. A,AAAA
+        :param name: Only records whose name matches the glob or /regex/, eg. 'mail*'
+        :param value: Only records whose value matches the glob or /regex/, eg. '10.0.*'
         """
-        zone_id = self._get_zone_id(zone)
+        if output not in OUTPUT_FORMATS:
+            print(f"Given output {output} is not supported, valid are {', '.join(OUTPUT_FORMATS)}.")
+            return
+
+        def records(cli):
+            zone_id = cli._get_zone_id(zone)
+            # with --all_profiles only the profiles having the zone add records
+            if not zone_id:
+                return []
+            return cli.iter_records(zone_id)
 
         try:
-            response = requests.get(
-                url=f"https://{self.SYSTEM}/api/v1/records?zone_id={zone_id}",
-                headers={"Auth-API-Token": self.API_TOKEN}
+            if not self._all_profiles and not self._get_zone_id(zone):
+                print(f"zone {zone} not found.")
+                return
+
+            # Build beautiful list
+            columns = [('Name', 'name'), ('Type', 'type'), ('Value', 'value')]
+            if id is not False:
+                columns.insert(0, ('ID', 'id'))
+            fields, columns = self._profile_columns(
+                ['id', 'zone_id', 'name', 'type', 'value', 'ttl', 'created', 'modified'], columns
             )
 
-            status_code = response.status_code
-            content = json.loads(response.content)
+            write_output(
+                filter(record_matcher(type, name, value), self._each_profile(records)),
+                fields,
+                columns,
+                output,
+                f"*** Records @ {zone} " + "*" * 80
+            )
 
-            print(f"*** Records @ {zone} " + "*" * 80)
-            if status_code == 200:
-                records = content['records']
+        except requests.exceptions.RequestException as e:
+            logger.exception(e)
 
-                # Build beautiful list
-                if id is False:
-                    header = ['Name', 'Type', 'Value']
-                else:
-                    header = ['ID', 'Name', 'Type', 'Value']
-                rows = []
-
-                for rr in records:
-                    if id is False:
-                        rows.append(
-                            [rr['name'], rr['type'], rr['value']]
-                        )
-                    else:
-                        rows.append(
-                            [rr['id'], rr['name'], rr['type'], rr['value']]
-                        )
+    def query(self, type=None, name=None, value=None, zone=None, id=False, output='table',
+              concurrency=CONCURRENCY):
+        """
+        Search records of all zones eg. hdns query --type A --value 10.0.0.5
+        Without --zone the records of all zones are read in one listing instead of one download per zone.
+        :param type: Only records of these types, comma separated, eg. A,AAAA
+        :param name: Only records whose name matches the glob or /regex/, eg. 'mail*'
+        :param value: Only records whose value matches the glob or /regex/, eg. '10.0.*'
+        :param zone: Only zones whose name matches the glob or /regex/, eg. '*.org'
+        :param id: Show record ids if True
+        :param output: Output format table, json, ndjson, csv or yaml, default: table
+        :param concurrency: Number of zones downloaded in parallel with --zone, default: 8
+        """
+        if output not in OUTPUT_FORMATS:
+            print(f"Given output {output} is not supported, valid are {', '.join(OUTPUT_FORMATS)}.")
+            return
+
+        try:
+            matches = record_matcher(type, name, value)
+
+            columns = [('Zone', 'zone'), ('Name', 'name'), ('Type', 'type'), ('Value', 'value')]
+            if id is not False:
+                columns.insert(0, ('ID', 'id'))
+            fields, columns = self._profile_columns(
+                ['id', 'zone_id', 'zone', 'name', 'type', 'value', 'ttl', 'created', 'modified'], columns
+            )
 
-                print(tabulate.tabulate(rows, header))
+            write_output(
+                self._each_profile(lambda cli: cli._query_records(matches, zone, concurrency)),
+                fields,
+                columns,
+                output,
+                f"*** Records @ {self._where()} " + "*" * 80
+            )
 
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    def _query_records(self, matches, zone=None, concurrency=CONCURRENCY):
+        """ PRIVATE: Records of query with the zone name, from all zones or the zones matching the zone pattern """
+        zone_names = {zone_id: zone_name for zone_name, zone_id in self._get_zone_ids().items()}
+
+        if zone is None:
+            records = self.iter_records()
+        else:
+            match_zone = compile_pattern(zone)
+            records = self._iter_zones_records(
+                [zone_id for zone_id, zone_name in zone_names.items() if match_zone(zone_name)], concurrency
+            )
+
+        return ({**rr, 'zone': zone_names.get(rr['zone_id'])} for rr in records if matches(rr))
+
+    def _iter_zones_records(self, zone_ids, concurrency=CONCURRENCY):
+        """ PRIVATE: Download the records of several zones in parallel, yields records zone by zone as they finish """
+        if len(zone_ids) == 1:
+            yield from self.iter_records(zone_ids[0])
+            return
+
+        self._ensure_pool_size(concurrency)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(lambda zone_id: list(self.iter_records(zone_id)), zone_id)
+                       for zone_id in zone_ids]
+
+            for future in concurrent.futures.as_completed(futures):
+                yield from future.result()
+
+    def _create_record(self, zone_id, name, type, value, ttl=0):
+        """ PRIVATE: Post one record, returns status code and decoded response """
+        response = self._request(
+            "POST", "records",
+            headers={
+                "Content-Type": "application/json",
+            },
+            data=json.dumps({
+                "value": value,
+                "ttl": ttl,
+                "type": type,
+                "name": name,
+                "zone_id": zone_id
+            })
+        )
+
+        content = self._decode(response)
+        if response.status_code == 200 and 'record' in content:
+            self._index_record(content['record'])
+
+        return response.status_code, content
+
     def create_record(self, zone, name, type, value, ttl=0):
         """
         Create new record in zone
@@ -395,27 +2276,12 @@ class Hdns_cli(object):
         :param value: Value of the record eg. 1.1.1.1
         :param ttl: Time to live default 0
         """
+        self._refuse_write("create_record")
         try:
             zone_id = self._get_zone_id(zone)
 
             if type in VALID_TYPES:
-                response = requests.post(
-                    url=f"https://{self.SYSTEM}/api/v1/records",
-                    headers={
-                        "Content-Type": "application/json",
-                        "Auth-API-Token": self.API_TOKEN,
-                    },
-                    data=json.dumps({
-                        "value": value,
-                        "ttl": ttl,
-                        "type": type,
-                        "name": name,
-                        "zone_id": zone_id
-                    })
-                )
-
-                status_code = response.status_code
-                content = json.loads(response.content)
+                status_code, content = self._create_record(zone_id, name, type, value, ttl)
 
                 if status_code == 200:
                     print("record successful created.")
@@ -428,19 +2294,680 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
-    def bulk_create_records(self, yaml_file):
+    def _bulk_create_batch(self, zone_id, batch):
+        """
+        PRIVATE: Create a batch of records of one zone via the bulk endpoint, returns a list of (rr, error)
+        or None if the bulk endpoint rejected the batch (4xx) so the records can be created one by one.
+        If the outcome is unknown (timeout, broken connection, 5xx) the bulk request may have been applied,
+        then the records of the zone are reloaded and only the missing records are created.
+        """
+        if not self._bulk_supported:
+            return None
+
+        # counts of identical records known before the request, to tell them apart from records it created
+        with self._record_indexes_lock:
+            index = self._record_indexes.get(zone_id)
+        before = {}
+        if index is not None:
+            for rr in batch:
+                key = (rr['name'], rr['type'], rr['value'])
+                before[key] = len(index.ids(*key))
+
+        try:
+            response = self._request(
+                "POST", "records/bulk",
+                headers={
+                    "Content-Type": "application/json",
+                },
+                data=json.dumps({
+                    "records": [
+                        {
+                            "value": rr['value'],
+                            "ttl": rr.get('ttl', 0),
+                            "type": rr['type'],
+                            "name": rr['name'],
+                            "zone_id": zone_id
+                        } for rr in batch
+                    ]
+                })
+            )
+
+            if response.status_code == 200:
+                content = self._decode(response)
+                for rr in content.get('records') or []:
+                    self._index_record(rr)
+
+                invalid = {}
+                for rr in content.get('invalid_records') or []:
+                    key = (rr.get('name'), rr.get('type'), rr.get('value'))
+                    invalid[key] = invalid.get(key, 0) + 1
+
+                results = []
+                for rr in batch:
+                    key = (rr['name'], rr['type'], rr['value'])
+                    if invalid.get(key):
+                        invalid[key] -= 1
+                        results.append((rr, "rejected as invalid record"))
+                    else:
+                        results.append((rr, None))
+                return results
+
+            if 400 <= response.status_code < 500 and response.status_code != 408:
+                if response.status_code in (404, 405):
+                    self._bulk_supported = False
+                logger.warning(f"bulk endpoint returned {response.status_code}, creating records one by one")
+                return None
+
+            reason = f"status {response.status_code}"
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            reason = str(e)
+
+        return self._bulk_create_missing(zone_id, batch, before, reason)
+
+    def _bulk_create_missing(self, zone_id, batch, before, reason):
+        """
+        PRIVATE: After a bulk request with unknown outcome reload the records of the zone and create only the
+        records of the batch which are still missing, returns a list of (rr, error).
+        Identical records which were not known before the request count as created by it.
+        """
+        logger.warning(f"bulk endpoint failed ({reason}), reloading the records to create only missing records")
+
+        try:
+            self._drop_record_index(zone_id)
+            index = self._get_record_index(zone_id)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            error = f"bulk request failed ({reason}), records not reloaded ({e}), not retried"
+            return [(rr, error) for rr in batch]
+
+        created = {}
+        results = []
+        for rr in batch:
+            key = (rr['name'], rr['type'], rr['value'])
+            if key not in created:
+                created[key] = len(index.ids(*key)) - before.get(key, 0)
+
+            if created[key] > 0:
+                created[key] -= 1
+                results.append((rr, None))
+            else:
+                results += self._single_create(zone_id, rr)
+
+        return results
+
+    def _single_create(self, zone_id, rr):
+        """ PRIVATE: Create one record of a bulk run, returns a list of (rr, error) """
+        try:
+            status_code, content = self._create_record(zone_id, rr['name'], rr['type'], rr['value'],
+                                                       rr.get('ttl', 0))
+            if status_code == 200:
+                return [(rr, None)]
+            return [(rr, content['error']['message'])]
+
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            return [(rr, str(e))]
+
+    def _ensure_pool_size(self, size):
+        """ PRIVATE: Grow the connection pool so that size workers can run in parallel """
+        if size <= self._pool_size:
+            return
+
+        self._pool_size = size
+        if isinstance(self._session, requests.Session):
+            adapter = requests.adapters.HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+    def _update_record(self, record_id, zone_id, name, type, value, ttl=0):
+        """ PRIVATE: Put one record, returns status code and decoded response """
+        response = self._request(
+            "PUT", f"records/{record_id}",
+            headers={
+                "Content-Type": "application/json",
+            },
+            data=json.dumps({
+                "value": value,
+                "ttl": ttl,
+                "type": type,
+                "name": name,
+                "zone_id": zone_id
+            })
+        )
+
+        content = self._decode(response)
+        if response.status_code == 200 and 'record' in content:
+            self._index_record(content['record'])
+
+        return response.status_code, content
+
+    def _delete_record(self, record_id):
+        """ PRIVATE: Delete one record, returns status code and decoded response """
+        response = self._request("DELETE", f"records/{record_id}")
+
+        content = self._decode(response)
+        if response.status_code == 200:
+            self._unindex_record(record_id)
+
+        return response.status_code, content
+
+    def _bulk_update_batch(self, zone_id, batch):
+        """
+        PRIVATE: Update a batch of records of one zone via the bulk endpoint, returns a list of (rr, error)
+        or None if the bulk endpoint is not usable.
+        """
+        if not self._bulk_supported:
+            return None
+
+        try:
+            response = self._request(
+                "PUT", "records/bulk",
+                headers={
+                    "Content-Type": "application/json",
+                },
+                data=json.dumps({
+                    "records": [
+                        {
+                            "id": rr['id'],
+                            "value": rr['value'],
+                            "ttl": rr.get('ttl', 0),
+                            "type": rr['type'],
+                            "name": rr['name'],
+                            "zone_id": zone_id
+                        } for rr in batch
+                    ]
+                })
+            )
+
+            if response.status_code == 200:
+                content = self._decode(response)
+                for rr in content.get('records') or []:
+                    self._index_record(rr)
+
+                failed = {rr.get('id') for rr in content.get('failed_records') or []}
+                return [(rr, "update rejected" if rr['id'] in failed else None) for rr in batch]
+
+            if response.status_code in (404, 405):
+                self._bulk_supported = False
+            logger.warning(f"bulk endpoint returned {response.status_code}, updating records one by one")
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"bulk endpoint failed ({e}), updating records one by one")
+
+        return None
+
+    def _single_update(self, zone_id, rr):
+        """ PRIVATE: Update one record of a bulk run, returns a list of (rr, error) """
+        try:
+            status_code, content = self._update_record(rr['id'], zone_id, rr['name'], rr['type'], rr['value'],
+                                                       rr.get('ttl', 0))
+            if status_code == 200:
+                return [(rr, None)]
+            return [(rr, content['error']['message'])]
+
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            return [(rr, str(e))]
+
+    def _single_delete(self, zone_id, rr):
+        """ PRIVATE: Delete one record of a bulk run, returns a list of (rr, error) """
+        try:
+            status_code, content = self._delete_record(rr['id'])
+            if status_code == 200:
+                return [(rr, None)]
+            return [(rr, content.get('error', {}).get('message', content))]
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return [(rr, str(e))]
+
+    def _bulk_apply(self, jobs, concurrency=CONCURRENCY):
+        """
+        PRIVATE: Run jobs on a worker pool and yield (rr, error) for every record as soon as it is done
+        A job is (bulk_function, single_function, zone_id, batch), if bulk_function is None or returns None
+        every record of the batch is handed to single_function on the same pool.
+        """
+        self._ensure_pool_size(concurrency)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = {}
+            for bulk_function, single_function, zone_id, batch in jobs:
+                if bulk_function is None:
+                    for rr in batch:
+                        pending[executor.submit(single_function, zone_id, rr)] = None
+                else:
+                    pending[executor.submit(bulk_function, zone_id, batch)] = (single_function, zone_id, batch)
+
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    job = pending.pop(future)
+                    results = future.result()
+
+                    # bulk endpoint not usable, fall back to single records on the same pool
+                    if results is None:
+                        single_function, zone_id, batch = job
+                        for rr in batch:
+                            pending[executor.submit(single_function, zone_id, rr)] = None
+                        continue
+
+                    yield from results
+
+    def bulk_create_records(self, yaml_file, batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
         """
         Creates bulk records for zone
         :param yaml_file: Name of the yaml definition file
+        :param batch_size: Records sent per request to the bulk endpoint, default: 100
+        :param concurrency: Number of requests running in parallel, default: 8
         """
+        self._refuse_write("bulk_create_records")
         try:
             with open(yaml_file, 'r') as f:
                 records = yaml.load(f.read(), Loader=yaml.FullLoader)
 
+            start = time.time()
+            failed = []
+            created = 0
+
+            # group records by zone, zone ids are resolved once per zone
+            zones = {}
+            for rr in records['records']:
+                zones.setdefault(rr['zone'], []).append(rr)
+
+            batches = []
+            for zone, zone_records in zones.items():
+                zone_id = self._get_zone_id(zone)
+                if not zone_id:
+                    failed += [(rr, f"zone {zone} not found") for rr in zone_records]
+                    continue
+
+                valid = []
+                for rr in zone_records:
+                    if rr['type'] in VALID_TYPES:
+                        valid.append(rr)
+                    else:
+                        failed.append((rr, f"Given type {rr['type']} is not supported."))
+
+                for i in range(0, len(valid), batch_size):
+                    batches.append((zone_id, valid[i:i + batch_size]))
+
+            jobs = [(self._bulk_create_batch, self._single_create, zone_id, batch) for zone_id, batch in batches]
+
+            for rr, error in self._bulk_apply(jobs, concurrency):
+                if error is None:
+                    created += 1
+                    print(f"created {rr['name']} {rr['type']} {rr['value']} @ {rr['zone']}")
+                else:
+                    failed.append((rr, error))
+
+            for rr, error in failed:
+                print(f"FAILED  {rr['name']} {rr['type']} {rr['value']} @ {rr['zone']}: {error}")
+
+            duration = time.time() - start
+            print(f"{created} records created, {len(failed)} failed in {duration:.2f}s "
+                  f"({created / duration if duration else 0:.1f} records/s)")
+
+        except Exception as e:
+            logger.exception(e)
+
+    def _sync_diff(self, zone_id, desired, prune=True):
+        """
+        PRIVATE: Compare desired records with the current records of a zone
+        Returns lists of records to create, update and delete, records which only
+        differ in value are updated in place instead of deleted and created.
+        """
+        # hashed index of the current state keyed on (name, type, value)
+        current = dict(self._get_record_index(zone_id).by_key)
+
+        creates = []
+        updates = []
+        seen = set()
+
+        for rr in desired:
+            key = (rr['name'], rr['type'], rr['value'])
+            if key in seen:
+                continue
+            seen.add(key)
+
+            if key not in current:
+                creates.append(rr)
+            elif 'ttl' in rr and current[key][0].get('ttl') != rr['ttl']:
+                updates.append(dict(rr, id=current[key][0]['id']))
+
+        deletes = []
+        if prune:
+            for key, records in current.items():
+                if (key[0], key[1]) in PROTECTED_RECORDS:
+                    continue
+                # surplus identical records are removed as well
+                extra = records if key not in seen else records[1:]
+                deletes += [dict(rr, zone=desired[0]['zone']) for rr in extra]
+
+        # pair creates and deletes of the same name and type to updates
+        obsolete = {}
+        for rr in deletes:
+            obsolete.setdefault((rr['name'], rr['type']), []).append(rr)
+
+        remaining = []
+        for rr in creates:
+            candidates = obsolete.get((rr['name'], rr['type']))
+            if candidates:
+                old = candidates.pop()
+                updates.append(dict(rr, id=old['id'], value_old=old['value']))
+            else:
+                remaining.append(rr)
+
+        deletes = [rr for records in obsolete.values() for rr in records]
+        return remaining, updates, deletes
+
+    def sync(self, file, plan=False, prune=True, batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
+        """
+        Sync zones to the records defined in a yaml file (same format as bulk_create_records)
+        :param file: Name of the yaml definition file
+        :param plan: Only show the changes, don't apply them
+        :param prune: Delete records which are not in the file, SOA and NS of the zone apex are kept
+        :param batch_size: Records sent per request to the bulk endpoint, default: 100
+        :param concurrency: Number of requests running in parallel, default: 8
+        """
+        self._refuse_write("sync")
+        try:
+            with open(file, 'r') as f:
+                records = yaml.load(f.read(), Loader=yaml.FullLoader)
+
+            start = time.time()
+
+            zones = {}
             for rr in records['records']:
-                self.create_record(rr['zone'], rr['name'], rr['type'], rr['value'])
+                zones.setdefault(rr['zone'], []).append(rr)
+
+            jobs = []
+            changes = 0
+
+            for zone, desired in zones.items():
+                zone_id = self._get_zone_id(zone)
+                if not zone_id:
+                    print(f"zone {zone} not found, skipped.")
+                    continue
+
+                unsupported = [rr for rr in desired if rr['type'] not in VALID_TYPES]
+                for rr in unsupported:
+                    print(f"Given type {rr['type']} is not supported, {rr['name']} {rr['value']} skipped.")
+
+                creates, updates, deletes = self._sync_diff(
+                    zone_id, [rr for rr in desired if rr['type'] in VALID_TYPES], prune
+                )
+
+                print(f"*** Sync @ {zone}: {len(creates)} to create, {len(updates)} to update, "
+                      f"{len(deletes)} to delete")
+
+                if plan:
+                    for rr in creates:
+                        print(f"  + {rr['name']} {rr['type']} {rr['value']}")
+                    for rr in updates:
+                        print(f"  ~ {rr['name']} {rr['type']} {rr.get('value_old', rr['value'])} -> {rr['value']}"
+                              f"{' ttl ' + str(rr['ttl']) if 'ttl' in rr else ''}")
+                    for rr in deletes:
+                        print(f"  - {rr['name']} {rr['type']} {rr['value']}")
+
+                changes += len(creates) + len(updates) + len(deletes)
+
+                for i in range(0, len(updates), batch_size):
+                    jobs.append((self._bulk_update_batch, self._single_update, zone_id, updates[i:i + batch_size]))
+                for i in range(0, len(creates), batch_size):
+                    jobs.append((self._bulk_create_batch, self._single_create, zone_id, creates[i:i + batch_size]))
+                jobs.append((None, self._single_delete, zone_id, deletes))
+
+            if plan:
+                print(f"{changes} changes planned, nothing applied.")
+                return
+
+            failed = 0
+            for rr, error in self._bulk_apply(jobs, concurrency):
+                if error is not None:
+                    failed += 1
+                    print(f"FAILED  {rr['name']} {rr['type']} {rr['value']} @ {rr['zone']}: {error}")
+
+            duration = time.time() - start
+            print(f"{changes - failed} changes applied, {failed} failed in {duration:.2f}s.")
+
+        except Exception as e:
+            logger.exception(e)
+
+    @staticmethod
+    def _error_message(content):
+        """ PRIVATE: Error message of a decoded API response """
+        if isinstance(content, dict) and isinstance(content.get('error'), dict):
+            return content['error'].get('message', str(content))
+        return str(content)
+
+    def _batch_op(self, op):
+        """ PRIVATE: Run one operation of a batch, returns None or the error message """
+        action = op.get('op')
+        if action not in BATCH_OPS:
+            return f"unknown op {action}, valid are {', '.join(BATCH_OPS)}"
+
+        if action == 'delete_record_by_id':
+            status_code, content = self._delete_record(op['record_id'])
+            return None if status_code == 200 else self._error_message(content)
+
+        zone_id = self._get_zone_id(op['zone'])
+        if not zone_id:
+            return f"zone {op['zone']} not found"
+
+        if action == 'update_zone':
+            status_code, content = self._update_zone(zone_id, op['zone'], op['ttl'])
+
+        elif action == 'create_record':
+            if op['type'] not in VALID_TYPES:
+                return f"Given type {op['type']} is not supported."
+            status_code, content = self._create_record(zone_id, op['name'], op['type'], op['value'],
+                                                       op.get('ttl', 0))
+
+        elif action == 'update_record':
+            record_id = op.get('record_id') or self._get_record_id(op['zone'], op['name'], op['type'], op['value'])
+            if not record_id:
+                return "record not found or not unique"
+            status_code, content = self._update_record(record_id, zone_id, op.get('name_new', op['name']), op['type'],
+                                                       op.get('value_new', op['value']), op.get('ttl', 0))
+
+        elif action == 'delete_record':
+            record_id = op.get('record_id') or self._get_record_id(op['zone'], op['name'], op['type'], op['value'])
+            if not record_id:
+                return "record not found or not unique"
+            status_code, content = self._delete_record(record_id)
+
+        else:
+            record_ids = self._get_all_record_ids(op['zone'], op['name'], op['type'], op['value'])
+            if not record_ids:
+                return "record not found"
+            for record_id in record_ids:
+                status_code, content = self._delete_record(record_id)
+                if status_code != 200:
+                    break
+
+        return None if status_code == 200 else self._error_message(content)
+
+    def _batch_run(self, ops, batch_size):
+        """
+        PRIVATE: Run operations of one zone in order, returns a list of (line, op, error)
+        Consecutive create_record operations are sent together to the bulk endpoint.
+        """
+        if len(ops) > 1:
+            zone_id = self._get_zone_id(ops[0][1]['zone'])
+            if zone_id and all(op.get('type') in VALID_TYPES and 'name' in op and 'value' in op for _, op in ops):
+                lines = {id(op): line for line, op in ops}
+                results = self._bulk_create_batch(zone_id, [op for _, op in ops])
+                if results is not None:
+                    return [(lines[id(op)], op, error) for op, error in results]
+
+        results = []
+        for line, op in ops:
+            try:
+                results.append((line, op, self._batch_op(op)))
+            except KeyError as e:
+                results.append((line, op, f"missing field {e}"))
+            except (requests.exceptions.RequestException, ValueError, TypeError) as e:
+                results.append((line, op, str(e)))
+        return results
+
+    def batch(self, file=None, concurrency=CONCURRENCY, batch_size=BATCH_SIZE):
+        """
+        Run operations of a JSON lines file or stdin, eg. hdns batch ops.jsonl or hdns batch < ops.jsonl
+        One JSON object per line, eg. {"op": "create_record", "zone": "example.org", "name": "www", "type": "A", "value": "1.1.1.1"}
+        valid ops are create_record, update_record, delete_record, delete_records, delete_record_by_id and update_zone
+        with the parameters of the commands. Operations of one zone run in the given order, zones in parallel.
+        Prints one JSON result line per operation with line, op, zone, ok and error.
+        :param file: JSON lines file with operations, default: stdin
+        :param concurrency: Number of zones processed in parallel, default: 8
+        :param batch_size: Consecutive create_record operations of a zone sent per request to the bulk endpoint, default: 100
+        """
+        self._refuse_write("batch")
+        from collections import deque
+
+        start = time.time()
+        queues = {}
+        lock = threading.Lock()
+        counts = {"ops": 0, "failed": 0}
+
+        def emit(line, op, error):
+            result = {"line": line, "op": op.get('op'), "zone": op.get('zone'), "ok": error is None}
+            if error is not None:
+                result["error"] = error
+            if 'id' in op:
+                result["id"] = op['id']
+
+            with lock:
+                counts["ops"] += 1
+                counts["failed"] += error is not None
+                print(json.dumps(result), flush=True)
+
+        def drain(zone):
+            while True:
+                with lock:
+                    queue = queues[zone]
+                    if not queue:
+                        del queues[zone]
+                        return
+
+                    ops = [queue.popleft()]
+                    while (ops[0][1].get('op') == 'create_record' and queue and len(ops) < batch_size
+                           and queue[0][1].get('op') == 'create_record'):
+                        ops.append(queue.popleft())
+
+                try:
+                    results = self._batch_run(ops, batch_size)
+                except Exception as e:
+                    logger.exception(e)
+                    results = [(line, op, str(e)) for line, op in ops]
+
+                for line, op, error in results:
+                    emit(line, op, error)
+
+        self._ensure_pool_size(concurrency)
+        f = sys.stdin if file in (None, '-') else open(file, 'r')
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                workers = []
+
+                for line, text in enumerate(f, 1):
+                    if not text.strip() or text.lstrip().startswith('#'):
+                        continue
+
+                    try:
+                        op = json.loads(text)
+                        if not isinstance(op, dict):
+                            raise ValueError("operation is not a JSON object")
+                    except ValueError as e:
+                        emit(line, {}, f"invalid JSON: {e}")
+                        continue
+
+                    zone = op.get('zone')
+                    with lock:
+                        if zone not in queues:
+                            queues[zone] = deque()
+                            workers.append(executor.submit(drain, zone))
+                        queues[zone].append((line, op))
+
+                for worker in concurrent.futures.as_completed(workers):
+                    worker.result()
+
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+        duration = time.time() - start
+        print(f"{counts['ops']} operations, {counts['failed']} failed in {duration:.2f}s", file=sys.stderr)
+
+    def transaction(self, file=None, batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
+        """
+        Apply the operations of a JSON lines file or stdin all or nothing, eg. hdns transaction ops.jsonl
+        Same format as hdns batch, valid ops are create_record, update_record, delete_record, delete_records
+        and delete_record_by_id. All records are checked first, if one change fails the applied changes are reverted.
+        :param file: JSON lines file with operations, default: stdin
+        :param batch_size: Records sent per request to the bulk endpoint, default: 100
+        :param concurrency: Number of requests running in parallel, default: 8
+        """
+        self._refuse_write("transaction")
+        start = time.time()
+        tx = Transaction(self, batch_size, concurrency)
+        f = sys.stdin if file in (None, '-') else open(file, 'r')
 
-        except Exception as e:\
+        try:
+            for text in f:
+                if text.strip() and not text.lstrip().startswith('#'):
+                    tx.add(json.loads(text))
+
+            journal = tx.commit()
+            changes = len(journal['creates']) + len(journal['updates']) + len(journal['deletes'])
+            print(f"{changes} changes committed in {time.time() - start:.2f}s, journal {journal['id']}")
+
+        except TransactionError as e:
+            print(f"transaction failed: {e}")
+            if e.journal is not None:
+                print(f"journal {e.journal}")
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.exception(e)
+
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+    def rollback(self, journal=None, concurrency=CONCURRENCY):
+        """
+        Revert the changes of a transaction, lists the journals if no journal is given
+        :param journal: Journal id or file, eg. 20211017-101500-3fa2c1
+        :param concurrency: Number of requests running in parallel, default: 8
+        """
+        self._refuse_write("rollback")
+        import glob
+
+        try:
+            if journal is None:
+                journals = []
+                for file in glob.glob(f"{JOURNAL_DIR}/*.json"):
+                    with open(file, 'r') as f:
+                        journals.append(json.load(f))
+
+                rows = [
+                    [data['id'], data['state'], ", ".join(data['zones'].values()), len(data['creates']),
+                     len(data['updates']), len(data['deletes'])]
+                    for data in sorted(journals, key=lambda data: data['time'])
+                ]
+
+                print(tabulate.tabulate(rows, ['Journal', 'State', 'Zones', 'Creates', 'Updates', 'Deletes']))
+                return
+
+            tx = Transaction(self, concurrency=concurrency)
+            tx.journal = str(journal) if os.path.isfile(str(journal)) else f"{JOURNAL_DIR}/{journal}.json"
+            with open(tx.journal, 'r') as f:
+                data = json.load(f)
+
+            changes, failed = tx.rollback(data)
+            for rr, error in failed:
+                print(f"FAILED  {rr['name']} {rr['type']} {rr['value']} @ {rr['zone']}: {error}")
+            print(f"{changes - len(failed)} changes reverted, {len(failed)} failed.")
+
+        except (requests.exceptions.RequestException, OSError, ValueError, KeyError) as e:
             logger.exception(e)
 
     def update_record(self, zone, name, type, value, name_new=None, value_new=None, record_id=None):
@@ -454,6 +2981,7 @@ class Hdns_cli(object):
         :param value_new: New value of the record eg. 1.1.1.1
         :param record_id: Record ID if record is not unique. Get record_id with show_records --zone example.org --id True
         """
+        self._refuse_write("update_record")
         try:
             zone_id = self._get_zone_id(zone)
 
@@ -466,23 +2994,7 @@ class Hdns_cli(object):
             if value_new is None:
                 value_new = value
 
-            response = requests.put(
-                url=f"https://{self.SYSTEM}/api/v1/records/{record_id}",
-                headers={
-                    "Content-Type": "application/json",
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-                data=json.dumps({
-                    "value": value_new,
-                    "ttl": 0,
-                    "type": type,
-                    "name": name_new,
-                    "zone_id": zone_id
-                })
-            )
-
-            status_code = response.status_code
-            content = json.loads(response.content)
+            status_code, content = self._update_record(record_id, zone_id, name_new, type, value_new)
 
             if status_code == 200:
                 print("record successful updated.")
@@ -500,18 +3012,11 @@ class Hdns_cli(object):
         :param type: Type of record eg. A, valid are A, AAAA, NS, MX, CNAME, RP, TXT, SOA, HINFO, SRV, DANE, TLSA, DS, CAA
         :param value: Value of the record eg. 1.1.1.1
         """
+        self._refuse_write("delete_record")
         try:
             record_id = self._get_record_id(zone, name, type, value)
 
-            response = requests.delete(
-                url=f"https://{self.SYSTEM}/api/v1/records/{record_id}",
-                headers={
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-            )
-
-            status_code = response.status_code
-            content = json.loads(response.content)
+            status_code, content = self._delete_record(record_id)
 
             if status_code == 200:
                 print("record successfully deleted.")
@@ -521,50 +3026,174 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
-    def delete_records(self, zone, name, type, value):
+    def delete_records(self, zone, name, type, value, concurrency=CONCURRENCY):
         """
         Delete records which are identical
         :param zone: Name of the zone, eg. example.org
         :param name: Name of the record, eg. www
         :param type: Type of record eg. A, valid are A, AAAA, NS, MX, CNAME, RP, TXT, SOA, HINFO, SRV, DANE, TLSA, DS, CAA
         :param value: Value of the record eg. 1.1.1.1
+        :param concurrency: Number of records deleted in parallel, default: 8
         """
+        self._refuse_write("delete_records")
         try:
             record_id = self._get_all_record_ids(zone, name, type, value)
-            for r in record_id:
-                response = requests.delete(
-                    url=f"https://{self.SYSTEM}/api/v1/records/{r}",
-                    headers={
-                        "Auth-API-Token": self.API_TOKEN,
-                    },
-                )
-
-                status_code = response.status_code
-                content = json.loads(response.content)
+            jobs = [(None, self._single_delete, None, [{'id': r} for r in record_id])]
 
-                if status_code == 200:
+            for rr, error in self._bulk_apply(jobs, concurrency):
+                if error is None:
                     print("record successfully deleted.")
                 else:
-                    print(content)
+                    print(error)
 
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    @staticmethod
+    def _load_patterns(file):
+        """
+        PRIVATE: Record patterns of a yaml file (records: list like bulk_create_records) or a csv file with header,
+        empty csv cells are left out. Raises ValueError for patterns without zone or without name, type and value.
+        """
+        with open(file, 'r', newline='') as f:
+            if file.endswith('.csv'):
+                import csv
+                reader = csv.DictReader(f)
+                patterns = [({key: value for key, value in row.items() if value}, reader.line_num) for row in reader]
+            else:
+                patterns = list(enumerate(yaml.load(f.read(), Loader=yaml.FullLoader)['records'], 1))
+
+        for pattern, line in patterns:
+            if not pattern.get('zone'):
+                raise ValueError(f"{file}:{line}: zone is missing")
+            if all(pattern.get(key) in (None, '') for key in ('name', 'type', 'value')):
+                raise ValueError(f"{file}:{line}: name, type and value are empty, use name '*' to match every record")
+
+        return [pattern for pattern, line in patterns]
+
+    def _match_records(self, zone_id, patterns):
+        """
+        PRIVATE: Records of a zone matching any of the patterns, SOA and NS of the zone apex excluded
+        Exact patterns are looked up by key, patterns with wildcards or without name, type or value scan the zone.
+        """
+        index = self._get_record_index(zone_id)
+        found = {}
+
+        for pattern in patterns:
+            name, type, value = pattern.get('name'), pattern.get('type'), pattern.get('value')
+            exact = None not in (name, type, value) and not any(
+                char in str(part) for part in (name, value) for char in '*?[/'
+            ) and ',' not in str(type)
+
+            if exact:
+                records = index.by_key.get((str(name), str(type).upper(), str(value)), [])
+            else:
+                matches = record_matcher(type, name, value)
+                records = [rr for rr in index if matches(rr)]
+
+            for rr in records:
+                if (rr['name'], rr['type']) not in PROTECTED_RECORDS:
+                    found[rr['id']] = rr
+
+        return list(found.values())
+
+    def bulk_delete_records(self, file=None, zone=None, name=None, type=None, value=None, dry_run=False,
+                            concurrency=CONCURRENCY, force=False):
+        """
+        Delete all records matching the patterns of a yaml or csv file, or of zone, name, type and value.
+        Name and value are exact, globs or /regex/, every pattern needs at least one of name, type or value,
+        name '*' matches every record of the zone except SOA and NS of the zone apex. The records of every
+        zone are downloaded once. If more than 100 records match a confirmation is asked for.
+        :param file: Yaml file (records: list of zone, name, type, value) or csv file with these columns
+        :param zone: Name of the zone if no file is given, eg. example.org
+        :param name: Name or pattern of the records, eg. '_acme-challenge*'
+        :param type: Types of the records, comma separated, eg. TXT
+        :param value: Value or pattern of the records
+        :param dry_run: Only count the matching records, nothing is deleted
+        :param concurrency: Number of records deleted in parallel, default: 8
+        :param force: If set to True no safety question applied, the records will be deleted directly
+        """
+        self._refuse_write("bulk_delete_records")
+        try:
+            if file is not None:
+                try:
+                    patterns = self._load_patterns(file)
+                except ValueError as e:
+                    print(e)
+                    return
+            elif zone is None:
+                print("Give a file or at least --zone.")
+                return
+            elif all(pattern in (None, '') for pattern in (name, type, value)):
+                print("Give at least one of --name, --type or --value, use --name='*' to delete every record.")
+                return
+            else:
+                patterns = [{'zone': zone, 'name': name, 'type': type, 'value': value}]
+
+            start = time.time()
+
+            zones = {}
+            for pattern in patterns:
+                zones.setdefault(pattern['zone'], []).append(pattern)
+
+            zone_ids = {}
+            for zone_name in zones:
+                zone_ids[zone_name] = self._get_zone_id(zone_name)
+                if not zone_ids[zone_name]:
+                    print(f"zone {zone_name} not found, skipped.")
+                    del zone_ids[zone_name]
+
+            # record indexes of the zones are built in parallel, one download per zone
+            self._ensure_pool_size(concurrency)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                matched = dict(zip(zone_ids, executor.map(
+                    lambda zone_name: self._match_records(zone_ids[zone_name], zones[zone_name]), zone_ids
+                )))
+
+            jobs = []
+            for zone_name, records in matched.items():
+                print(f"*** Delete @ {zone_name}: {len(records)} records")
+                jobs.append((None, self._single_delete, zone_ids[zone_name],
+                             [{**rr, 'zone': zone_name} for rr in records]))
+
+            total = sum(len(records) for records in matched.values())
+            if dry_run:
+                print(f"{total} records would be deleted, nothing applied.")
+                return
+
+            if total > BULK_DELETE_CONFIRM and force is False:
+                print(f"Are you really want to delete {total} records, confirm with 'YES'?")
+                try:
+                    question = input()
+                except EOFError:
+                    question = None
+                if question != 'YES':
+                    print("nothing deleted.")
+                    return
+
+            failed = 0
+            for rr, error in self._bulk_apply(jobs, concurrency):
+                if error is None:
+                    print(f"deleted {rr['name']} {rr['type']} {rr['value']} @ {rr['zone']}")
+                else:
+                    failed += 1
+                    print(f"FAILED  {rr['name']} {rr['type']} {rr['value']} @ {rr['zone']}: {error}")
+
+            duration = time.time() - start
+            print(f"{total - failed} records deleted, {failed} failed in {duration:.2f}s "
+                  f"({(total - failed) / duration if duration else 0:.1f} records/s)")
+
+        except Exception as e:
+            logger.exception(e)
+
     def delete_record_by_id(self, record_id):
         """
         Delete record with record_id if record is not unique
         :param record_id: Record ID you can get the record id via show_records
         """
+        self._refuse_write("delete_record_by_id")
         try:
-            response = requests.delete(
-                url=f"https://{self.SYSTEM}/api/v1/records/{record_id}",
-                headers={
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-            )
-
-            status_code = response.status_code
-            content = json.loads(response.content)
+            status_code, content = self._delete_record(record_id)
 
             if status_code == 200:
                 print("record successfully deleted.")
@@ -577,29 +3206,34 @@ class Hdns_cli(object):
     ####################################################################################################################
     # Everything regarding zone_files
 
+    def _import_zone(self, zone_id, file):
+        """ PRIVATE: Stream a zone file to the import endpoint, returns status code and decoded response """
+        with open(file, "rb") as f:
+            response = self._request(
+                "POST", f"zones/{zone_id}/import",
+                headers={
+                    "Content-Type": "text/plain",
+                },
+                data=f
+            )
+
+        content = self._decode(response)
+        if response.status_code == 200:
+            self._drop_record_index(zone_id)
+
+        return response.status_code, content
+
     def import_zone(self, zone, file):
         """
         Import zone file to zone, WARNING: everything will be overwritten!
         :param zone: Name of the zone, eg. example.org
         :param file: Zone file which should be imported
         """
+        self._refuse_write("import_zone")
         try:
             zone_id = self._get_zone_id(zone)
 
-            with open(file, "r") as f:
-                content = f.read()
-
-            response = requests.post(
-                url=f"https://{self.SYSTEM}/api/v1/zones/{zone_id}/import",
-                headers={
-                    "Content-Type": "text/plain",
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-                data=content
-            )
-
-            status_code = response.status_code
-            content = json.loads(response.content)
+            status_code, content = self._import_zone(zone_id, file)
 
             if status_code == 200:
                 print(f"zone file successfully imported in zone {zone}.")
@@ -609,27 +3243,34 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    def _export_zone(self, zone_id):
+        """ PRIVATE: Get the zone file of a zone id, returns status code and content """
+        return self._get(
+            f"zones/{zone_id}/export",
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded; charset=utf-8",
+            },
+            raw=True
+        )
+
     def export_zone(self, zone, file=None):
         """
         Export zone to file
         :param zone: Name of the zone, eg. example.org
         :param file: Name of file where the zone should be exported, if no file defined zone will be printed out
         """
+        if self._all_profiles:
+            found = [item['profile'] for item in self._each_profile(lambda cli: [{}] if cli._get_zone_id(zone) else [])]
+            if len(found) != 1:
+                print(f"zone {zone} is in the profiles {', '.join(sorted(found))}, choose one with --account."
+                      if found else f"zone {zone} not found in any profile.")
+                return
+            return self._profile_clients()[found[0]].export_zone(zone, file)
+
         try:
             zone_id = self._get_zone_id(zone)
 
-            response = requests.get(
-                url=f"https://{self.SYSTEM}/api/v1/zones/{zone_id}/export",
-                headers={
-                    "Auth-API-Token": self.API_TOKEN,
-                    "Content-Type": "application/x-www-form-urlencoded; charset=utf-8",
-                },
-                data={
-                },
-            )
-
-            status_code = response.status_code
-            content = response.content
+            status_code, content = self._export_zone(zone_id)
 
             if status_code == 200 and not len(content) == 0:
                 if file is None:
@@ -644,27 +3285,133 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
-    def validate_zonefile(self, file):
+    def _export_to_dir(self, zone, directory, state, gzip, force, trust_modified=False):
+        """ PRIVATE: Export one zone of export_all, returns the result and the new state of the zone """
+        import gzip as gz
+
+        file = os.path.join(directory, f"{zone['name']}.zone" + (".gz" if gzip else ""))
+        last = state.get(zone['name'], {})
+        exists = os.path.isfile(file)
+
+        # opt-in: trust that zone.modified changes with every record change, no download needed
+        if trust_modified and not force and exists and last.get('modified') == zone.get('modified') \
+                and last.get('gzip') == gzip:
+            return "unchanged", last
+
+        status_code, content = self._export_zone(zone['id'])
+        if status_code != 200 or len(content) == 0:
+            return f"FAILED ({status_code})", last
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        new_state = {"modified": zone.get('modified'), "sha256": sha256, "gzip": gzip}
+
+        if not force and exists and last.get('sha256') == sha256 and last.get('gzip') == gzip:
+            return "unchanged", new_state
+
+        if gzip:
+            # mtime 0 keeps the compressed file identical for identical zones
+            content = gz.compress(content, mtime=0)
+
+        umask = os.umask(0)
+        os.umask(umask)
+        atomic_write(file, content, 0o666 & ~umask)
+        return "exported", new_state
+
+    def export_all(self, dir, gzip=False, concurrency=CONCURRENCY, force=False, trust_modified=False):
         """
-        Validate zone file
-        :param file: Zone file which should be validated
+        Export all zones to a directory, files of zones whose export has the same sha256 as in the last run are kept
+        :param dir: Directory where the zone files are written, eg. backups/
+        :param gzip: Write gzip compressed zone files (.zone.gz)
+        :param concurrency: Number of zones exported in parallel, default: 8
+        :param force: Export all zones, also if unchanged
+        :param trust_modified: Skip the download of zones whose modified timestamp is unchanged, misses record changes
+                               which don't update the timestamp of the zone
         """
+        if self._all_profiles:
+            # one sub directory per profile, the profiles are exported in parallel
+            clients = self._profile_clients()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(clients)) as executor:
+                list(executor.map(lambda item: item[1].export_all(os.path.join(dir, item[0]), gzip, concurrency, force,
+                                                                trust_modified),
+                                  clients.items()))
+            return
+
         try:
+            start = time.time()
+            os.makedirs(dir, exist_ok=True)
+            state_file = os.path.join(dir, ".hdns_export.json")
 
-            with open(file, 'r') as f:
-                data = f.read()
+            try:
+                with open(state_file, "r") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+
+            zones = list(self.iter_zones())
+            results = {}
+
+            self._ensure_pool_size(concurrency)
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = {
+                    executor.submit(self._export_to_dir, zone, dir, state, gzip, force, trust_modified): zone
+                    for zone in zones
+                }
+
+                for future in concurrent.futures.as_completed(futures):
+                    zone = futures[future]
+                    try:
+                        result, state[zone['name']] = future.result()
+                    except (requests.exceptions.RequestException, OSError) as e:
+                        result = f"FAILED ({e})"
+
+                    results[result.split()[0]] = results.get(result.split()[0], 0) + 1
+                    print(f"{self._label}{zone['name']}: {result}")
 
-            response = requests.post(
-                url=f"https://{self.SYSTEM}/api/v1/zones/file/validate",
+            atomic_write(state_file, json.dumps(state, indent=2, sort_keys=True).encode())
+
+            print(f"{self._label}{len(zones)} zones in {time.time() - start:.2f}s: "
+                  + ", ".join(f"{count} {result.lower()}" for result, count in sorted(results.items())))
+
+        except requests.exceptions.RequestException as e:
+            logger.exception(e)
+
+    def _validate_zonefile(self, file):
+        """ PRIVATE: Stream a zone file to the validate endpoint, returns status code and decoded response """
+        with open(file, "rb") as f:
+            response = self._request(
+                "POST", "zones/file/validate",
                 headers={
                     "Content-Type": "text/plain",
-                    "Auth-API-Token": self.API_TOKEN,
                 },
-                data=data
+                data=f
             )
 
-            status_code = response.status_code
-            content = json.loads(response.content)
+        return response.status_code, self._decode(response)
+
+    def validate_zonefile(self, file, remote=False, zone=None):
+        """
+        Validate zone file, offline if not remote
+        :param file: Zone file which should be validated
+        :param remote: Validate with the API instead of the local parser
+        :param zone: Origin of the file until its first $ORIGIN, eg. example.org, without names stay relative
+        """
+        try:
+            if not remote:
+                content = check_zonefile(file, zone)
+
+                if not content['errors']:
+                    print("Zone file OK!")
+                else:
+                    print("Zone file NOT ok!")
+                    for line, error in content['errors']:
+                        print(f"line {line}: {error}")
+
+                print(f"parsed records: {content['parsed_records']}")
+                print(f"valid records: {content['valid_records']}")
+                return
+
+            status_code, content = self._validate_zonefile(file)
 
             if status_code == 200:
                 print("Zone file OK!")
@@ -677,63 +3424,171 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    @staticmethod
+    def _zone_files(path):
+        """ PRIVATE: Zone files of a directory or glob pattern, sorted by name """
+        import glob
+
+        if os.path.isdir(path):
+            files = [os.path.join(path, name) for name in os.listdir(path) if not name.startswith(".")]
+        else:
+            files = glob.glob(path)
+
+        return sorted(file for file in files if os.path.isfile(file))
+
+    @staticmethod
+    def _zone_name_of_file(file):
+        """ PRIVATE: Zone name of a zone file, eg. backups/example.org.zone -> example.org """
+        name = os.path.basename(file)
+        return name[:-len(".zone")] if name.endswith(".zone") else name
+
+    def _check_zonefile(self, file, do_import, remote):
+        """
+        PRIVATE: Validate one zone file and import it if valid, returns a summary row
+        Parsed and valid are record counts, 0 if unknown, failures are reported in result.
+        """
+        zone = self._zone_name_of_file(file)
+        row = {"file": file, "zone": zone, "parsed": 0, "valid": 0, "validate_ms": "", "import_ms": ""}
+
+        try:
+            start = time.time()
+            if remote:
+                status_code, content = self._validate_zonefile(file)
+            else:
+                content = check_zonefile(file, zone)
+                status_code = 200 if not content['errors'] else 422
+                if content['errors']:
+                    line, error = content['errors'][0]
+                    content['error'] = {"message": f"line {line}: {error}"}
+            row["validate_ms"] = round((time.time() - start) * 1000)
+
+            if isinstance(content, dict):
+                parsed, valid = content.get('parsed_records'), content.get('valid_records')
+                row["parsed"] = parsed if isinstance(parsed, int) else 0
+                row["valid"] = len(valid) if isinstance(valid, list) else valid if isinstance(valid, int) else 0
+
+            if status_code != 200:
+                row["result"] = f"invalid: {content.get('error', {}).get('message', status_code)}"
+                return row
+
+            if row["parsed"] != row["valid"]:
+                row["result"] = "invalid records"
+                return row
+
+            if not do_import:
+                row["result"] = "OK"
+                return row
+
+            zone_id = self._get_zone_id(zone)
+            if not zone_id:
+                row["result"] = f"zone {zone} not found"
+                return row
+
+            start = time.time()
+            status_code, content = self._import_zone(zone_id, file)
+            row["import_ms"] = round((time.time() - start) * 1000)
+            row["result"] = "imported" if status_code == 200 else \
+                f"import failed: {content.get('error', {}).get('message', status_code)}"
+
+        except (requests.exceptions.RequestException, OSError) as e:
+            row["result"] = f"failed: {e}"
+
+        return row
+
+    def _check_zonefiles(self, path, do_import, concurrency, remote):
+        """ PRIVATE: Validate and import the zone files of a path on a worker pool and print a summary """
+        files = self._zone_files(path)
+        if not files:
+            print(f"no zone files found in {path}")
+            return
+
+        start = time.time()
+        self._ensure_pool_size(concurrency)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            rows = list(executor.map(lambda file: self._check_zonefile(file, do_import, remote), files))
+
+        header = ['File', 'Zone', 'Parsed', 'Valid', 'Validate ms', 'Import ms', 'Result']
+        print(tabulate.tabulate(
+            [[row["file"], row["zone"], row["parsed"], row["valid"], row["validate_ms"], row["import_ms"],
+              row["result"]] for row in rows],
+            header
+        ))
+
+        passed = sum(1 for row in rows if row["result"] in ("OK", "imported"))
+        print(f"{passed} of {len(rows)} zone files {'imported' if do_import else 'valid'} "
+              f"in {time.time() - start:.2f}s")
+
+    def validate_dir(self, path, concurrency=CONCURRENCY, remote=False):
+        """
+        Validate all zone files of a directory or glob pattern in parallel
+        :param path: Directory or glob pattern, eg. zones/ or 'zones/*.zone'
+        :param concurrency: Number of zone files validated in parallel, default: 8
+        :param remote: Validate with the API instead of the local parser
+        """
+        self._check_zonefiles(path, False, concurrency, remote)
+
+    def import_dir(self, path, concurrency=CONCURRENCY, remote=False):
+        """
+        Validate all zone files of a directory or glob pattern in parallel and import the valid ones,
+        WARNING: the records of the zones will be overwritten! The zone name is the file name without .zone
+        :param path: Directory or glob pattern, eg. zones/ or 'zones/*.zone'
+        :param concurrency: Number of zone files processed in parallel, default: 8
+        :param remote: Validate with the API instead of the local parser
+        """
+        self._refuse_write("import_dir")
+        self._check_zonefiles(path, True, concurrency, remote)
+
     ####################################################################################################################
     # Everything regarding secondary zones
-    def show_primary_servers(self, id=False):
+    def show_primary_servers(self, id=False, output='table'):
         """
         Shows all primary servers configured
         :param id: Show ids of primary servers if True
+        :param output: Output format table, json, ndjson, csv or yaml, default: table
         """
-        try:
-            response = requests.get(
-                url=f"https://{self.SYSTEM}/api/v1/primary_servers",
-                headers={"Auth-API-Token": self.API_TOKEN}
-            )
+        if output not in OUTPUT_FORMATS:
+            print(f"Given output {output} is not supported, valid are {', '.join(OUTPUT_FORMATS)}.")
+            return
 
-            status_code = response.status_code
-            content = json.loads(response.content)
-
-            if status_code == 200:
-                response_zone = requests.get(
-                    url=f"https://{self.SYSTEM}/api/v1/zones",
-                    headers={"Auth-API-Token": self.API_TOKEN}
+        try:
+            primary_servers = list(self._each_profile(lambda cli: cli._joined_primary_servers()))
+
+            if primary_servers or output != 'table':
+                columns = [('Zone', 'zone'), ('IP', 'address'), ('Port', 'port')]
+                if id is not False:
+                    columns.insert(0, ('ID', 'id'))
+                fields, columns = self._profile_columns(
+                    ['id', 'zone_id', 'zone', 'address', 'port', 'created', 'modified'], columns
                 )
-                status_code_zone = response_zone.status_code
-                content_zone = json.loads(response_zone.content)
 
-                if status_code_zone == 200:
-
-                    if id is False:
-                        header = ['Zone', 'IP', 'Port']
-                    else:
-                        header = ['ID', 'Zone', 'IP', 'Port']
-
-                    rows = []
-
-                    for ps in content['primary_servers']:
-                        # get zone name
-                        for z in content_zone['zones']:
-                            if ps['zone_id'] == z['id']:
-                                zone_name = z['name']
-
-                        if id is False:
-                            rows.append(
-                                [zone_name, ps['address'], ps['port']]
-                            )
-                        else:
-                            rows.append(
-                                [ps['id'], zone_name, ps['address'], ps['port']]
-                            )
-
-                    print(tabulate.tabulate(rows, header))
-                else:
-                    print("no records")
+                write_output(primary_servers, fields, columns, output)
             else:
                 print("no records")
 
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    def _create_primary_server(self, zone_id, address, port=53):
+        """ PRIVATE: Post one primary server, returns status code and decoded response """
+        response = self._request(
+            "POST", "primary_servers",
+            headers={
+                "Content-Type": "application/json",
+            },
+            data=json.dumps({
+                "address": address,
+                "port": port,
+                "zone_id": zone_id
+            })
+        )
+
+        content = self._decode(response)
+        if response.status_code == 200 and 'primary_server' in content:
+            self._index_primary_server(content['primary_server'])
+
+        return response.status_code, content
+
     def create_primary_server(self, zone, address, port=53):
         """
         Create primary server requires empty zone. This zone is after primary server is created a secondary zone.
@@ -741,23 +3596,10 @@ class Hdns_cli(object):
         :param address: IPv4 or IPv6 address
         :param port: Port of DNS server
         """
+        self._refuse_write("create_primary_server")
         try:
             zone_id = self._get_zone_id(zone)
-            response = requests.post(
-                url=f"https://{self.SYSTEM}/api/v1/primary_servers",
-                headers={
-                    "Content-Type": "application/json",
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-                data=json.dumps({
-                    "address": address,
-                    "port": port,
-                    "zone_id": zone_id
-                })
-            )
-
-            status_code = response.status_code
-            content = json.loads(response.content)
+            status_code, content = self._create_primary_server(zone_id, address, port)
 
             if status_code == 200:
                 print(f"primary_server {address}:{port} for zone {zone} created.")
@@ -767,6 +3609,26 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    def _update_primary_server(self, ps_id, zone_id, address, port=53):
+        """ PRIVATE: Put one primary server, returns status code and decoded response """
+        response = self._request(
+            "PUT", f"primary_servers/{ps_id}",
+            headers={
+                "Content-Type": "application/json",
+            },
+            data=json.dumps({
+                "address": address,
+                "port": port,
+                "zone_id": zone_id
+            })
+        )
+
+        content = self._decode(response)
+        if response.status_code == 200 and 'primary_server' in content:
+            self._index_primary_server(content['primary_server'])
+
+        return response.status_code, content
+
     def update_primary_server(self, zone, address, port=53, address_new=None, port_new=None):
         """
         Update primary server
@@ -776,6 +3638,7 @@ class Hdns_cli(object):
         :param address_new: New address IPv4 or IPv6
         :param port_new: New port eg. 53
         """
+        self._refuse_write("update_primary_server")
         try:
             ps_id = self._get_primary_server_id(zone, address, port)
             zone_id = self._get_zone_id(zone)
@@ -786,21 +3649,7 @@ class Hdns_cli(object):
             if port_new is None:
                 port_new = port
 
-            response = requests.put(
-                url=f"https://{self.SYSTEM}/api/v1/primary_servers/{ps_id}",
-                headers={
-                    "Content-Type": "application/json",
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-                data=json.dumps({
-                    "address": address_new,
-                    "port": port_new,
-                    "zone_id": zone_id
-                })
-            )
-
-            status_code = response.status_code
-            content = json.loads(response.content)
+            status_code, content = self._update_primary_server(ps_id, zone_id, address_new, port_new)
 
             if status_code == 200:
                 print(f"primary server {address}:{port} for zone {zone} updated.")
@@ -810,20 +3659,23 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    def _delete_primary_server(self, ps_id):
+        """ PRIVATE: Delete one primary server, returns status code and decoded response """
+        response = self._request("DELETE", f"primary_servers/{ps_id}")
+
+        content = self._decode(response)
+        if response.status_code == 200:
+            self._unindex_primary_server(ps_id)
+
+        return response.status_code, content
+
     def delete_primary_server(self, zone, address, port=53):
         """ Delete an primary server """
+        self._refuse_write("delete_primary_server")
         try:
             ps_id = self._get_primary_server_id(zone, address, port)
 
-            response = requests.delete(
-                url=f"https://{self.SYSTEM}/api/v1/primary_servers/{ps_id}",
-                headers={
-                    "Auth-API-Token": self.API_TOKEN,
-                },
-            )
-
-            status_code = response.status_code
-            content = json.loads(response.content)
+            status_code, content = self._delete_primary_server(ps_id)
 
             if status_code == 200:
                 print("primary server successfully deleted.")
@@ -833,12 +3685,947 @@ class Hdns_cli(object):
         except requests.exceptions.RequestException as e:
             logger.exception(e)
 
+    def _primary_server_op(self, op):
+        """ PRIVATE: Run one entry of bulk_primary_servers, returns None or the error message """
+        action = op.get('op', 'create')
+        if action not in PRIMARY_SERVER_OPS:
+            return f"unknown op {action}, valid are {', '.join(PRIMARY_SERVER_OPS)}"
+
+        zone_id = self._get_zone_id(op['zone'])
+        if not zone_id:
+            return f"zone {op['zone']} not found"
+
+        port = op.get('port', 53)
+        if action == 'create':
+            status_code, content = self._create_primary_server(zone_id, op['address'], port)
+        else:
+            ps_id = self._get_primary_server_id(op['zone'], op['address'], port)
+            if not ps_id:
+                return f"primary server {op['address']}:{port} not found"
+
+            if action == 'update':
+                status_code, content = self._update_primary_server(
+                    ps_id, zone_id, op.get('address_new', op['address']), op.get('port_new', port)
+                )
+            else:
+                status_code, content = self._delete_primary_server(ps_id)
+
+        return None if status_code == 200 else self._error_message(content)
+
+    def bulk_primary_servers(self, yaml_file, concurrency=CONCURRENCY):
+        """
+        Create, update and delete primary servers of many zones in parallel, eg. to move secondary zones to
+        another primary. Zones and primary servers are downloaded once, not once per entry.
+        :param yaml_file: Yaml file with primary_servers: list of op (create, update or delete, default create),
+        zone, address, port and for update address_new and port_new
+        :param concurrency: Number of requests running in parallel, default: 8
+        """
+        self._refuse_write("bulk_primary_servers")
+        try:
+            with open(yaml_file, 'r') as f:
+                ops = yaml.load(f.read(), Loader=yaml.FullLoader)['primary_servers']
+
+            start = time.time()
+            if any(op.get('op', 'create') != 'create' for op in ops):
+                self._get_primary_server_index()
+
+            self._ensure_pool_size(concurrency)
+            failed = 0
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = {executor.submit(self._primary_server_op, op): op for op in ops}
+
+                for future in concurrent.futures.as_completed(futures):
+                    op = futures[future]
+                    try:
+                        error = future.result()
+                    except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                        error = str(e)
+
+                    target = f"{op.get('address')}:{op.get('port', 53)} @ {op.get('zone')}"
+                    if error is None:
+                        print(f"{op.get('op', 'create')}d {target}")
+                    else:
+                        failed += 1
+                        print(f"FAILED  {op.get('op', 'create')} {target}: {error}")
+
+            duration = time.time() - start
+            print(f"{len(ops) - failed} primary servers changed, {failed} failed in {duration:.2f}s.")
+
+        except Exception as e:
+            logger.exception(e)
+
+    ####################################################################################################################
+    # Daemon
+
+    def serve(self, socket=DAEMON_SOCKET, port=None):
+        """
+        Keep connections, zone ids and record indexes warm and run the commands of hdns --via-daemon
+        eg. hdns serve & hdns --via-daemon show_records example.org
+        :param socket: Unix socket the daemon listens on, default: ~/.hdns/hdns.sock
+        :param port: Listen on this TCP port of 127.0.0.1 instead of the Unix socket, every request must send the
+                     shared secret of ~/.hdns/daemon.key which is created on first use
+        """
+        address = daemon_address(socket if port is None else port)
+        try:
+            server = daemon_server(self, address)
+        except PermissionError as e:
+            print(e, file=sys.stderr)
+            sys.exit(2)
+        print(f"hdns daemon listening on {address}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if not isinstance(address, tuple):
+                os.remove(address)
+
+
+########################################################################################################################
+# TRANSACTIONS
+########################################################################################################################
+class TransactionError(Exception):
+    """ Transaction not applied or reverted, journal is the path of its journal if one was written """
+
+    def __init__(self, message, journal=None):
+        super().__init__(message)
+        self.journal = journal
+
+
+class Transaction(object):
+    """
+    Record changes of one or more zones applied together through the bulk endpoints.
+    The affected records are downloaded and checked before anything is changed, the changes and the
+    previous state are written to a journal in ~/.hdns/journal and if one change fails all applied
+    changes are reverted. A journal can be reverted later with hdns rollback.
+
+        with Transaction(Hdns_cli()) as tx:
+            tx.update_record("example.org", "www", "A", "1.1.1.1", value_new="1.0.0.1")
+            tx.delete_records("example.org", "old", "A", "1.1.1.4")
+    """
+
+    def __init__(self, cli, batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
+        self.cli = cli
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.ops = []
+        self.journal = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def add(self, op):
+        """ Add an operation in the format of hdns batch, eg. {"op": "create_record", "zone": ..., ...} """
+        if op.get('op') not in TRANSACTION_OPS:
+            raise TransactionError(f"unknown op {op.get('op')}, valid are {', '.join(TRANSACTION_OPS)}")
+        if 'zone' not in op:
+            raise TransactionError(f"op {op['op']} without zone")
+        self.ops.append(op)
+
+    def create_record(self, zone, name, type, value, ttl=0):
+        self.add({"op": "create_record", "zone": zone, "name": name, "type": type, "value": value, "ttl": ttl})
+
+    def update_record(self, zone, name, type, value, name_new=None, value_new=None, ttl=None, record_id=None):
+        """ Update a record, ttl keeps the current ttl if not set """
+        self.add({"op": "update_record", "zone": zone, "name": name, "type": type, "value": value,
+                  "name_new": name_new, "value_new": value_new, "ttl": ttl, "record_id": record_id})
+
+    def delete_record(self, zone, name, type, value):
+        self.add({"op": "delete_record", "zone": zone, "name": name, "type": type, "value": value})
+
+    def delete_records(self, zone, name, type, value):
+        self.add({"op": "delete_records", "zone": zone, "name": name, "type": type, "value": value})
+
+    def delete_record_by_id(self, zone, record_id):
+        self.add({"op": "delete_record_by_id", "zone": zone, "record_id": record_id})
+
+    def _current_records(self, zone_ids):
+        """ Download the records of the zones again, returns {zone_id: RecordIndex} """
+        for zone_id in zone_ids:
+            self.cli._drop_record_index(zone_id)
+
+        self.cli._ensure_pool_size(self.concurrency)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return dict(zip(zone_ids, executor.map(self.cli._get_record_index, zone_ids)))
+
+    def _plan(self):
+        """ Resolve the operations to records and check them against the current state, returns the journal """
+        zones = {}
+        for op in self.ops:
+            if op['zone'] not in zones:
+                zones[op['zone']] = self.cli._get_zone_id(op['zone'])
+                if not zones[op['zone']]:
+                    raise TransactionError(f"zone {op['zone']} not found")
+
+        indexes = self._current_records(list(set(zones.values())))
+
+        journal = {
+            "id": time.strftime("%Y%m%d-%H%M%S") + f"-{os.urandom(3).hex()}",
+            "time": time.time(),
+            "state": None,
+            "zones": {zone_id: zone for zone, zone_id in zones.items()},
+            "creates": [],
+            "updates": [],
+            "deletes": []
+        }
+        changed = set()
+
+        def unique_id(op, index):
+            ids = [op['record_id']] if op.get('record_id') else index.ids(op['name'], op['type'], op['value'])
+            if len(ids) != 1 or ids[0] not in index.by_id:
+                raise TransactionError(f"{op['op']} {op.get('name')} {op.get('type')} {op.get('value')} @ {op['zone']}: "
+                                       f"record not found or not unique")
+            return ids[0]
+
+        def change(record_id):
+            if record_id in changed:
+                raise TransactionError(f"record {record_id} is changed more than once")
+            changed.add(record_id)
+
+        for op in self.ops:
+            zone_id = zones[op['zone']]
+            index = indexes[zone_id]
+
+            if op['op'] == 'create_record':
+                if op['type'] not in VALID_TYPES:
+                    raise TransactionError(f"Given type {op['type']} is not supported.")
+                journal['creates'].append({
+                    "zone_id": zone_id, "zone": op['zone'], "name": op['name'], "type": op['type'],
+                    "value": op['value'], "ttl": op.get('ttl') or 0,
+                    "existing_ids": index.ids(op['name'], op['type'], op['value'])
+                })
+
+            elif op['op'] == 'update_record':
+                record_id = unique_id(op, index)
+                change(record_id)
+                before = index.by_id[record_id]
+                journal['updates'].append({
+                    "id": record_id, "zone_id": zone_id, "zone": op['zone'],
+                    "name": op.get('name_new') or before['name'], "type": before['type'],
+                    "value": op['value_new'] if op.get('value_new') is not None else before['value'],
+                    "ttl": op['ttl'] if op.get('ttl') is not None else before.get('ttl', 0),
+                    "before": dict(before)
+                })
+
+            else:
+                if op['op'] == 'delete_records':
+                    record_ids = index.ids(op['name'], op['type'], op['value'])
+                    if not record_ids:
+                        raise TransactionError(f"delete_records {op['name']} {op['type']} {op['value']} @ {op['zone']}: "
+                                               f"record not found")
+                else:
+                    record_ids = [unique_id(op, index)]
+
+                for record_id in record_ids:
+                    change(record_id)
+                    before = index.by_id[record_id]
+                    journal['deletes'].append({
+                        "id": record_id, "zone_id": zone_id, "zone": op['zone'], "name": before['name'],
+                        "type": before['type'], "value": before['value'], "before": dict(before),
+                        "expected": len(index.ids(before['name'], before['type'], before['value']))
+                    })
+
+        return journal
+
+    def _jobs(self, creates, updates, deletes):
+        """ Bulk jobs for _bulk_apply, grouped by zone and batch_size """
+        jobs = []
+        for bulk_function, single_function, changes in ((self.cli._bulk_update_batch, self.cli._single_update, updates),
+                                                        (self.cli._bulk_create_batch, self.cli._single_create, creates),
+                                                        (None, self.cli._single_delete, deletes)):
+            zones = {}
+            for rr in changes:
+                zones.setdefault(rr['zone_id'], []).append(rr)
+            for zone_id, zone_changes in zones.items():
+                for i in range(0, len(zone_changes), self.batch_size):
+                    jobs.append((bulk_function, single_function, zone_id, zone_changes[i:i + self.batch_size]))
+        return jobs
+
+    def _apply(self, jobs):
+        """ Run jobs, returns a list of (rr, error) of the failed changes """
+        return [(rr, error) for rr, error in self.cli._bulk_apply(jobs, self.concurrency) if error is not None]
+
+    def _write_journal(self, journal):
+        os.makedirs(JOURNAL_DIR, mode=0o700, exist_ok=True)
+        atomic_write(self.journal, json.dumps(journal, indent=1).encode(), 0o600)
+
+    def commit(self):
+        """ Check, journal and apply all operations, returns the journal, raises TransactionError on failure """
+        journal = self._plan()
+        self.journal = f"{JOURNAL_DIR}/{journal['id']}.json"
+        journal['state'] = "applying"
+        self._write_journal(journal)
+
+        failed = self._apply(self._jobs(journal['creates'], journal['updates'], journal['deletes']))
+
+        if not failed:
+            journal['state'] = "committed"
+            self._write_journal(journal)
+            return journal
+
+        journal['failed'] = [f"{rr['name']} {rr['type']} {rr['value']} @ {rr['zone']}: {error}" for rr, error in failed]
+        self._write_journal(journal)
+        self.rollback(journal)
+        raise TransactionError(f"{len(failed)} changes failed, transaction rolled back: {journal['failed'][0]}",
+                               self.journal)
+
+    def rollback(self, journal):
+        """ Revert the changes of a journal with the current state of the zones, running it again is safe """
+        indexes = self._current_records(list(journal['zones']))
+        updated = {rr['id'] for rr in journal['updates']}
+
+        # records created by the transaction have a new id
+        deletes = []
+        for rr in journal['creates']:
+            for record_id in indexes[rr['zone_id']].ids(rr['name'], rr['type'], rr['value']):
+                if record_id not in rr['existing_ids'] and record_id not in updated \
+                        and record_id not in {d['id'] for d in deletes}:
+                    deletes.append({**indexes[rr['zone_id']].by_id[record_id], "zone": rr['zone']})
+
+        updates = []
+        restored = {}
+        for rr in journal['updates']:
+            before = rr['before']
+            key = (rr['zone_id'], before['name'], before['type'], before['value'])
+            restored[key] = restored.get(key, 0) + 1
+
+            current = indexes[rr['zone_id']].by_id.get(rr['id'])
+            if current is None:
+                logger.warning(f"record {rr['id']} was deleted since the transaction, not restored")
+            elif any(current.get(field) != before.get(field) for field in ('name', 'type', 'value', 'ttl')):
+                updates.append({**before, "ttl": before.get('ttl', 0), "zone": rr['zone']})
+
+        # deleted records are created again as long as fewer records with the same name, type and value exist
+        creates = []
+        removed = {d['id'] for d in deletes}
+        for rr in journal['deletes']:
+            key = (rr['zone_id'], rr['name'], rr['type'], rr['value'])
+            present = len([record_id for record_id in indexes[rr['zone_id']].ids(rr['name'], rr['type'], rr['value'])
+                           if record_id not in removed and record_id not in updated])
+            if present + restored.get(key, 0) < rr['expected']:
+                restored[key] = restored.get(key, 0) + 1
+                before = rr['before']
+                creates.append({"name": before['name'], "type": before['type'], "value": before['value'],
+                                "ttl": before.get('ttl', 0), "zone_id": rr['zone_id'], "zone": rr['zone']})
+
+        failed = self._apply(self._jobs(creates, updates, deletes))
+
+        journal['state'] = "rollback failed" if failed else "rolled back"
+        journal['rollback_failed'] = [f"{rr['name']} {rr['type']} {rr['value']} @ {rr['zone']}: {error}"
+                                      for rr, error in failed]
+        if self.journal is not None:
+            self._write_journal(journal)
+
+        return len(creates) + len(updates) + len(deletes), failed
+
+
+########################################################################################################################
+# ASYNC HDNS
+########################################################################################################################
+class HdnsApiError(Exception):
+    """ Error response of the Hetzner DNS API """
+
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class AsyncHdns(object):
+    """
+    Asyncio client for the Hetzner DNS API with the same methods as Hdns_cli.
+    All methods are coroutines returning the API objects instead of printing them,
+    errors of the API are raised as HdnsApiError. Requires the optional httpx package.
+
+    async with AsyncHdns(token="...") as hdns:
+        zones = await hdns.show_zones()
+
+    :param token: Token for authentication
+    :param system: FQDN of the DNS System used, eg. dns.hetzner.com, or an URL like http://127.0.0.1:8053
+    :param pool_size: Number of keep-alive connections held in the connection pool, default: 10
+    :param timeout: Timeout in seconds for every API request, default: 30
+    :param concurrency: Maximum number of requests running at the same time, default: 8
+    :param http2: Use HTTP/2, requires httpx[http2]
+    :param per_page: Number of entries fetched per page from the API, default: 100
+    """
+
+    def __init__(self, token=None, system=None, pool_size=POOL_SIZE, timeout=TIMEOUT,
+                 concurrency=CONCURRENCY, http2=False, per_page=PER_PAGE):
+        import httpx
+
+        self.API_TOKEN = load_config()['TOKEN'] if token is None else token
+        self.SYSTEM = load_config()['SYSTEM'] if system is None else system
+        self._base_url = f"{self.SYSTEM if '://' in self.SYSTEM else 'https://' + self.SYSTEM}/api/v1"
+        self._concurrency = concurrency
+        self._per_page = per_page
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._semaphore = None
+        self._lookup_locks = {}
+        self._zone_ids = None
+        self._record_indexes = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """ Close the connection pool """
+        await self._client.aclose()
+
+    async def _request(self, method, path, headers=None, **kwargs):
+        """ PRIVATE: Send an API request, at most concurrency requests run at the same time """
+        import asyncio
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+
+        request_headers = {"Auth-API-Token": self.API_TOKEN}
+        if headers is not None:
+            request_headers.update(headers)
+
+        async with self._semaphore:
+            return await self._client.request(method, f"{self._base_url}/{path}", headers=request_headers, **kwargs)
+
+    async def _call(self, method, path, payload=None, **kwargs):
+        """ PRIVATE: Send an API request and return the decoded response, raises HdnsApiError """
+        if payload is not None:
+            kwargs["headers"] = {"Content-Type": "application/json"}
+            kwargs["content"] = json.dumps(payload)
+
+        response = await self._request(method, path, **kwargs)
+
+        try:
+            content = json_loads(response.content) if response.content else {}
+        except ValueError:
+            content = {"error": {"message": response.text}}
+
+        if response.status_code != 200:
+            raise HdnsApiError(response.status_code, content.get('error', {}).get('message', content))
+
+        return content
+
+    async def _paginate(self, path, key, params=None):
+        """ PRIVATE: Yield the entries of a listing page by page following meta.pagination """
+        params = dict(params or {})
+        page = 1
+
+        while True:
+            params.update({"page": page, "per_page": self._per_page})
+            content = await self._call("GET", path, params=params)
+
+            entries = content.get(key) or []
+            for entry in entries:
+                yield entry
+
+            pagination = (content.get('meta') or {}).get('pagination')
+            if not entries or not pagination or page >= pagination.get('last_page', page):
+                break
+
+            page += 1
+
+    def iter_zones(self):
+        """ Iterate over all zones, page by page """
+        return self._paginate("zones", "zones")
+
+    def iter_records(self, zone_id=None):
+        """ Iterate over all records of a zone id or all zones, page by page """
+        return self._paginate("records", "records", {} if zone_id is None else {"zone_id": zone_id})
+
+    def iter_primary_servers(self, zone_id=None):
+        """ Iterate over all primary servers of a zone id or all zones, page by page """
+        return self._paginate("primary_servers", "primary_servers", {} if zone_id is None else {"zone_id": zone_id})
+
+    def _get_lookup_lock(self, zone_id=None):
+        """
+        PRIVATE: Lock so that concurrent lookups download the zone list or the records of a zone only once,
+        one lock per zone id and one for the zone list (None) so that different zones are loaded in parallel
+        """
+        import asyncio
+
+        lock = self._lookup_locks.get(zone_id)
+        if lock is None:
+            lock = self._lookup_locks[zone_id] = asyncio.Lock()
+        return lock
+
+    async def _get_zone_id(self, zone_name):
+        """ PRIVATE: Get the zone id of a zone name, the zone list is downloaded once """
+        if self._zone_ids is None or zone_name not in self._zone_ids:
+            async with self._get_lookup_lock():
+                if self._zone_ids is None or zone_name not in self._zone_ids:
+                    self._zone_ids = {zone['name']: zone['id'] async for zone in self.iter_zones()}
+
+        if zone_name not in self._zone_ids:
+            raise HdnsApiError(404, f"zone {zone_name} not found")
+
+        return self._zone_ids[zone_name]
+
+    async def _get_record_index(self, zone_id):
+        """ PRIVATE: Record index of a zone, the records are downloaded once """
+        if zone_id not in self._record_indexes:
+            async with self._get_lookup_lock(zone_id):
+                if zone_id not in self._record_indexes:
+                    self._record_indexes[zone_id] = RecordIndex([rr async for rr in self.iter_records(zone_id)])
+        return self._record_indexes[zone_id]
+
+    async def _get_record_id(self, zone, name, type, value):
+        """ PRIVATE: Get the record id if record is unique """
+        ids = await self._get_all_record_ids(zone, name, type, value)
+        if len(ids) != 1:
+            raise HdnsApiError(404, f"{len(ids)} records {name} {type} {value} found, expected one")
+        return ids[0]
+
+    async def _get_all_record_ids(self, zone, name, type, value):
+        """ PRIVATE: Get the record ids for all identical records """
+        zone_id = await self._get_zone_id(zone)
+        return (await self._get_record_index(zone_id)).ids(name, type, value)
+
+    async def _get_primary_server_id(self, zone, address, port=53):
+        """ PRIVATE: Get the id of a primary server """
+        zone_id = await self._get_zone_id(zone)
+        async for ps in self.iter_primary_servers(zone_id):
+            if ps['address'] == address and ps['port'] == port:
+                return ps['id']
+        raise HdnsApiError(404, f"primary server {address}:{port} for zone {zone} not found")
+
+    @staticmethod
+    async def _read_file(file):
+        """ PRIVATE: Read a file without blocking the event loop """
+        import asyncio
+
+        def read():
+            with open(file, "r") as f:
+                return f.read()
+
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+    ####################################################################################################################
+    # Everything regarding zones
+
+    async def show_zones(self):
+        """ All zones """
+        return [zone async for zone in self.iter_zones()]
+
+    async def create_zone(self, zone, ttl=86400):
+        """ Create new zone, returns the zone """
+        content = await self._call("POST", "zones", {"name": zone, "ttl": ttl})
+        self._zone_ids = None
+        return content.get('zone')
+
+    async def update_zone(self, zone, ttl):
+        """ Update zone parameters, returns the zone """
+        zone_id = await self._get_zone_id(zone)
+        content = await self._call("PUT", f"zones/{zone_id}", {"name": zone, "ttl": ttl})
+        return content.get('zone')
+
+    async def delete_zone(self, zone):
+        """ Delete complete zone without confirmation """
+        zone_id = await self._get_zone_id(zone)
+        await self._call("DELETE", f"zones/{zone_id}")
+        self._zone_ids = None
+        self._record_indexes.pop(zone_id, None)
+
+    ####################################################################################################################
+    # Everything regarding records
+
+    async def show_records(self, zone):
+        """ All records of given zone """
+        zone_id = await self._get_zone_id(zone)
+        return [rr async for rr in self.iter_records(zone_id)]
+
+    async def create_record(self, zone, name, type, value, ttl=0):
+        """ Create new record in zone, returns the record """
+        if type not in VALID_TYPES:
+            raise HdnsApiError(422, f"Given type {type} is not supported.")
+
+        zone_id = await self._get_zone_id(zone)
+        content = await self._call("POST", "records", {
+            "value": value,
+            "ttl": ttl,
+            "type": type,
+            "name": name,
+            "zone_id": zone_id
+        })
+
+        if zone_id in self._record_indexes:
+            self._record_indexes[zone_id].add(content['record'])
+        return content.get('record')
+
+    async def bulk_create_records(self, yaml_file):
+        """ Creates bulk records of a yaml file concurrently, returns lists of created records and failures """
+        import asyncio
+
+        records = yaml.load(await self._read_file(yaml_file), Loader=yaml.FullLoader)['records']
+        results = await asyncio.gather(
+            *[self.create_record(rr['zone'], rr['name'], rr['type'], rr['value'], rr.get('ttl', 0))
+              for rr in records],
+            return_exceptions=True
+        )
+
+        created = [result for result in results if not isinstance(result, Exception)]
+        failed = [(rr, result) for rr, result in zip(records, results) if isinstance(result, Exception)]
+        return created, failed
+
+    async def update_record(self, zone, name, type, value, name_new=None, value_new=None, record_id=None):
+        """ Update exsisting record, returns the record """
+        zone_id = await self._get_zone_id(zone)
+
+        if record_id is None:
+            record_id = await self._get_record_id(zone, name, type, value)
+
+        content = await self._call("PUT", f"records/{record_id}", {
+            "value": value if value_new is None else value_new,
+            "ttl": 0,
+            "type": type,
+            "name": name if name_new is None else name_new,
+            "zone_id": zone_id
+        })
+
+        if zone_id in self._record_indexes:
+            self._record_indexes[zone_id].add(content['record'])
+        return content.get('record')
+
+    async def delete_record(self, zone, name, type, value):
+        """ Delete record if record is unique """
+        await self.delete_record_by_id(await self._get_record_id(zone, name, type, value))
+
+    async def delete_records(self, zone, name, type, value):
+        """ Delete records which are identical concurrently, returns the number of deleted records """
+        import asyncio
+
+        record_ids = await self._get_all_record_ids(zone, name, type, value)
+        await asyncio.gather(*[self.delete_record_by_id(record_id) for record_id in record_ids])
+        return len(record_ids)
+
+    async def delete_record_by_id(self, record_id):
+        """ Delete record with record_id """
+        await self._call("DELETE", f"records/{record_id}")
+
+        for index in self._record_indexes.values():
+            if index.remove(record_id) is not None:
+                break
+
+    ####################################################################################################################
+    # Everything regarding zone_files
+
+    async def import_zone(self, zone, file):
+        """ Import zone file to zone, WARNING: everything will be overwritten! Returns the zone """
+        zone_id = await self._get_zone_id(zone)
+        content = await self._call(
+            "POST", f"zones/{zone_id}/import",
+            headers={"Content-Type": "text/plain"},
+            content=await self._read_file(file)
+        )
+        self._record_indexes.pop(zone_id, None)
+        return content.get('zone')
+
+    async def export_zone(self, zone, file=None):
+        """ Export zone, returns the zone file and writes it to file if given """
+        import asyncio
+
+        zone_id = await self._get_zone_id(zone)
+        response = await self._request("GET", f"zones/{zone_id}/export")
+
+        if response.status_code != 200 or len(response.content) == 0:
+            raise HdnsApiError(response.status_code, "error occured, no zone data recieved")
+
+        data = response.content.decode("utf-8")
+
+        if file is not None:
+            def write():
+                with open(file, "w") as f:
+                    f.write(data)
+
+            await asyncio.get_running_loop().run_in_executor(None, write)
+
+        return data
+
+    async def validate_zonefile(self, file):
+        """ Validate zone file, returns parsed_records and valid_records of the API """
+        return await self._call(
+            "POST", "zones/file/validate",
+            headers={"Content-Type": "text/plain"},
+            content=await self._read_file(file)
+        )
+
+    ####################################################################################################################
+    # Everything regarding secondary zones
+
+    async def show_primary_servers(self):
+        """ All primary servers """
+        return [ps async for ps in self.iter_primary_servers()]
+
+    async def create_primary_server(self, zone, address, port=53):
+        """ Create primary server, returns the primary server """
+        zone_id = await self._get_zone_id(zone)
+        content = await self._call("POST", "primary_servers", {"address": address, "port": port, "zone_id": zone_id})
+        return content.get('primary_server')
+
+    async def update_primary_server(self, zone, address, port=53, address_new=None, port_new=None):
+        """ Update primary server, returns the primary server """
+        zone_id = await self._get_zone_id(zone)
+        ps_id = await self._get_primary_server_id(zone, address, port)
+        content = await self._call("PUT", f"primary_servers/{ps_id}", {
+            "address": address if address_new is None else address_new,
+            "port": port if port_new is None else port_new,
+            "zone_id": zone_id
+        })
+        return content.get('primary_server')
+
+    async def delete_primary_server(self, zone, address, port=53):
+        """ Delete a primary server """
+        ps_id = await self._get_primary_server_id(zone, address, port)
+        await self._call("DELETE", f"primary_servers/{ps_id}")
+
+
+########################################################################################################################
+# DAEMON
+########################################################################################################################
+def daemon_address(address):
+    """ Unix socket path or (host, port) tuple for a TCP port on localhost """
+    if isinstance(address, int) or str(address).isdigit():
+        return ("127.0.0.1", int(address))
+    return expanduser(str(address))
+
+
+def daemon_key(create=False):
+    """
+    Shared secret of the daemon listening on TCP, read from DAEMON_KEY which must only be accessible by the owner
+    :param create: Create the file with a new random secret if it doesn't exist
+    :return: The secret, None if the file doesn't exist
+    """
+    import secrets
+
+    if create and not os.path.exists(DAEMON_KEY):
+        os.makedirs(os.path.dirname(DAEMON_KEY), mode=0o700, exist_ok=True)
+        with os.fdopen(os.open(DAEMON_KEY, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+            f.write(secrets.token_hex(32) + "\n")
+
+    try:
+        if os.stat(DAEMON_KEY).st_mode & 0o077:
+            raise PermissionError(f"{DAEMON_KEY} is accessible by other users, run chmod 600 {DAEMON_KEY}")
+        with open(DAEMON_KEY) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def daemon_argv_error(argv):
+    """
+    Error message if the daemon must not run argv, None if it may. Only the commands of DAEMON_COMMANDS are run,
+    without global flags of hdns, which are given to hdns serve, and without the separators of Fire.
+    """
+    import inspect
+
+    if not argv or argv[0] not in DAEMON_COMMANDS:
+        if argv and argv[0].startswith('-'):
+            return f"global flags like {argv[0]} can't be sent to the daemon, give them to hdns serve"
+        return f"{argv[0] if argv else 'no command'} can't be run via the daemon"
+
+    if '-' in argv[1:] or '--' in argv[1:]:
+        return "'-' and '--' can't be sent to the daemon"
+
+    command = inspect.signature(getattr(Hdns_cli, argv[0])).parameters
+    for arg in argv[1:]:
+        name = arg[2:].partition('=')[0].replace('-', '_') if arg.startswith('--') else None
+        if name and name not in command and name in inspect.signature(Hdns_cli.__init__).parameters:
+            return f"global flags like --{name} can't be sent to the daemon, give them to hdns serve"
+
+    return None
+
+
+def daemon_server(cli, address):
+    """
+    Threaded server running the commands sent by hdns --via-daemon on one Hdns_cli instance,
+    one JSON object per line: {"argv": [...], "cwd": "...", "stdin": "...", "key": "..."} -> {"stdout": "...", "stderr": "...", "code": 0}
+    Over TCP every request must carry the shared secret of DAEMON_KEY, the Unix socket is only accessible by the owner.
+    :param cli: Hdns_cli instance which keeps its connection pool and caches between commands
+    :param address: Unix socket path or (host, port) tuple
+    """
+    import contextlib
+    import hmac
+    import io
+    import socket
+    import socketserver
+    import fire
+
+    key = daemon_key(create=True) if isinstance(address, tuple) else None
+
+    # commands print their output and may do so from worker threads, so they run one after another
+    # with stdout, stderr and the working directory of the calling client
+    lock = threading.Lock()
+    logger.remove()
+    logger.add(lambda message: sys.stderr.write(message))
+
+    def run(argv, cwd, stdin=None):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        code = 0
+
+        with lock, contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            previous = os.getcwd()
+            previous_stdin = sys.stdin
+            sys.stdin = io.StringIO(stdin or "")
+            try:
+                error = daemon_argv_error(argv)
+                if error is not None:
+                    print(error, file=sys.stderr)
+                    return {"stdout": "", "stderr": stderr.getvalue(), "code": 2}
+                os.chdir(cwd)
+                fire.Fire(cli, command=argv, name='hdns')
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except (ProfileError, OfflineError) as e:
+                print(e, file=sys.stderr)
+                code = 2
+            except Exception as e:
+                logger.exception(e)
+                code = 1
+            finally:
+                os.chdir(previous)
+                sys.stdin = previous_stdin
+
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": code}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    call = json.loads(line)
+                    if key is not None and not hmac.compare_digest(str(call.get('key', '')), key):
+                        reply = {"stdout": "", "stderr": "invalid daemon key\n", "code": 2}
+                    else:
+                        reply = run([str(arg) for arg in call['argv']], call.get('cwd') or os.getcwd(),
+                                    call.get('stdin'))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    reply = {"stdout": "", "stderr": f"invalid request: {e}\n", "code": 2}
+
+                self.wfile.write(json.dumps(reply).encode() + b"\n")
+                self.wfile.flush()
+
+    if isinstance(address, tuple):
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer(address, Handler)
+    else:
+        if os.path.exists(address):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                if s.connect_ex(address) == 0:
+                    raise OSError(f"hdns daemon already listening on {address}")
+            os.remove(address)
+
+        os.makedirs(os.path.dirname(address), mode=0o700, exist_ok=True)
+        # the daemon holds the API token, only the owner may connect
+        umask = os.umask(0o177)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(address, Handler)
+        finally:
+            os.umask(umask)
+
+    server.daemon_threads = True
+    return server
+
+
+def _batch_reads_stdin(args):
+    """ PRIVATE: True if the arguments of hdns batch or transaction name no file, so operations are read from stdin """
+    files = []
+    args = iter(args)
+    for arg in args:
+        if arg.startswith('--'):
+            name, has_value, value = arg[2:].partition('=')
+            if not has_value:
+                value = next(args, '')
+            if name == 'file':
+                files.append(value)
+        else:
+            files.append(arg)
+
+    return all(file == '-' for file in files)
+
+
+def daemon_call(address, argv):
+    """
+    Run a command in the daemon started with hdns serve
+    :param address: Unix socket path or TCP port on localhost
+    :param argv: Command and arguments
+    :return: Exit code of the command, None if no daemon is listening
+    """
+    import socket
+
+    address = daemon_address(address)
+    family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+
+    with socket.socket(family, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(address)
+        except OSError:
+            return None
+
+        error = daemon_argv_error(argv)
+        if error is not None:
+            print(error, file=sys.stderr)
+            return 2
+
+        call = {"argv": argv, "cwd": os.getcwd()}
+        if family == socket.AF_INET:
+            try:
+                call["key"] = daemon_key()
+            except PermissionError as e:
+                print(e, file=sys.stderr)
+                return 2
+        if argv[:1] in (['batch'], ['transaction']) and _batch_reads_stdin(argv[1:]):
+            call["stdin"] = sys.stdin.read()
+
+        try:
+            s.sendall(json.dumps(call).encode() + b"\n")
+            reply = json.loads(s.makefile("rb").readline())
+        except (OSError, ValueError) as e:
+            print(f"hdns daemon failed: {e}", file=sys.stderr)
+            return 1
+
+    sys.stdout.write(reply['stdout'])
+    sys.stderr.write(reply['stderr'])
+    return reply['code']
+
 
 ########################################################################################################################
 # MAIN
-@logger.catch
 def main():
-    fire.Fire(Hdns_cli)
+    argv = sys.argv[1:]
+    via_daemon = [arg for arg in argv if arg == '--via-daemon' or arg.startswith('--via-daemon=')]
+
+    if via_daemon:
+        sys.argv[1:] = argv = [arg for arg in argv if arg not in via_daemon]
+        address = via_daemon[-1].partition('=')[2] or DAEMON_SOCKET
+
+        code = daemon_call(address, argv)
+        if code is not None:
+            sys.exit(code)
+
+        print(f"hdns daemon not listening on {address}, running locally", file=sys.stderr)
+
+    import fire
+
+    try:
+        fire.Fire(Hdns_cli)
+    except BrokenPipeError:
+        exit_on_broken_pipe()
+    except (ProfileError, OfflineError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    except Exception as e:
+        logger.exception(e)
 
 
 if __name__ == '__main__':
@@ -9,6 +9,7 @@ setup(
     version="1.0.0",
     scripts=["hdns_cli.py"],
     install_requires=['loguru', 'fire', 'tabulate', 'requests', 'pyyaml'],
+    extras_require={'http2': ['httpx[http2]'], 'async': ['httpx'], 'fast': ['orjson']},
     license="GNU General Public License v3.0",
     entry_points=dict(console_scripts=['hdns=hdns_cli:main'])
 )
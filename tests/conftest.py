@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import hdns_cli  # noqa: E402
+from mock_api import MockApi  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def hdns_home(tmp_path, monkeypatch):
+    """ Caches and journals of hdns in the temporary directory of the test """
+    monkeypatch.setattr(hdns_cli, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(hdns_cli, "HTTP_CACHE_DIR", str(tmp_path / "cache" / "http"))
+    monkeypatch.setattr(hdns_cli, "JOURNAL_DIR", str(tmp_path / "journal"))
+    return tmp_path
+
+
+@pytest.fixture
+def api():
+    """ Mock API with the zone example0.org and the records host0 ... host4 A 10.0.0.x """
+    api = MockApi(token="hdns-test-token").start()
+    api.seed(1, 5)
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def cli(api):
+    """ Hdns_cli talking to the mock API without retries """
+    return hdns_cli.Hdns_cli(token=api.token, system=api.url, no_cache=True, retries=0, rate_limit=0, burst=1)
+
+
+def zone_records(api, name="example0.org"):
+    """ (name, type, value, ttl) of all records of a zone of the mock API """
+    zone_id = next(zone_id for zone_id, zone in api.state.zones.items() if zone['name'] == name)
+    return sorted((rr['name'], rr['type'], rr['value'], rr.get('ttl')) for rr in api.state.zone_records[zone_id].values())
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+import hdns_cli
+from conftest import zone_records
+
+pytest.importorskip("httpx")
+
+ZONE = "example0.org"
+
+
+def run(api, function, **kwargs):
+    """ Result of the coroutine function(hdns) with an AsyncHdns client of the mock API """
+    async def main():
+        async with hdns_cli.AsyncHdns(token=api.token, system=api.url, **kwargs) as hdns:
+            return await function(hdns)
+
+    return asyncio.run(main())
+
+
+def test_reads_follow_pagination(api):
+    records = run(api, lambda hdns: hdns.show_records(ZONE), per_page=2)
+
+    assert sorted(rr['name'] for rr in records if rr['type'] == "A") == [f"host{i}" for i in range(5)]
+    assert [zone['name'] for zone in run(api, lambda hdns: hdns.show_zones())] == [ZONE]
+
+
+def test_record_changes(api):
+    async def changes(hdns):
+        created = await hdns.create_record(ZONE, "www", "A", "192.0.2.1", ttl=600)
+        await hdns.update_record(ZONE, "host0", "A", "10.0.0.0", value_new="192.0.2.2")
+        await hdns.delete_record(ZONE, "host1", "A", "10.0.0.1")
+        return created
+
+    created = run(api, changes)
+
+    assert (created['name'], created['value'], created['ttl']) == ("www", "192.0.2.1", 600)
+    assert [rr for rr in zone_records(api) if rr[1] == "A"] == [
+        ("host0", "A", "192.0.2.2", None), ("host2", "A", "10.0.0.2", None), ("host3", "A", "10.0.0.3", None),
+        ("host4", "A", "10.0.0.4", None), ("www", "A", "192.0.2.1", 600),
+    ]
+
+
+def test_concurrent_lookups_download_once(api, monkeypatch):
+    downloads = []
+    route = api.route
+
+    def counting_route(method, path, query, body):
+        if method == "GET" and path == "records":
+            downloads.append(query)
+        return route(method, path, query, body)
+
+    monkeypatch.setattr(api, "route", counting_route)
+
+    async def deletes(hdns):
+        return await asyncio.gather(*[hdns.delete_records(ZONE, f"host{i}", "A", f"10.0.0.{i}") for i in range(5)])
+
+    assert run(api, deletes) == [1] * 5
+    assert len(downloads) == 1
+    assert [rr for rr in zone_records(api) if rr[1] == "A"] == []
+
+
+def test_errors_raise_hdns_api_error(api):
+    with pytest.raises(hdns_cli.HdnsApiError, match="zone unknown.org not found"):
+        run(api, lambda hdns: hdns.show_records("unknown.org"))
+
+    with pytest.raises(hdns_cli.HdnsApiError, match="2 records host0 A 10.0.0.0 found, expected one"):
+        api.state.add_record(next(iter(api.state.zones)), "host0", "A", "10.0.0.0")
+        run(api, lambda hdns: hdns.delete_record(ZONE, "host0", "A", "10.0.0.0"))
+
+    with pytest.raises(hdns_cli.HdnsApiError) as error:
+        run(api, lambda hdns: hdns.create_zone(ZONE))
+    assert error.value.status_code == 422
+
+
+def test_bulk_create_reports_failures(api, tmp_path):
+    records = tmp_path / "records.yaml"
+    records.write_text("records:\n"
+                       f"  - {{zone: {ZONE}, name: a, type: A, value: 192.0.2.1}}\n"
+                       f"  - {{zone: {ZONE}, name: b, type: BOGUS, value: x}}\n"
+                       "  - {zone: unknown.org, name: c, type: A, value: 192.0.2.3}\n")
+
+    created, failed = run(api, lambda hdns: hdns.bulk_create_records(str(records)))
+
+    assert [rr['name'] for rr in created] == ["a"]
+    assert [(rr['name'], str(error)) for rr, error in failed] == [
+        ("b", "422: Given type BOGUS is not supported."), ("c", "404: zone unknown.org not found"),
+    ]
@@ -0,0 +1,70 @@
+import json
+
+import hdns_cli
+from conftest import zone_records
+
+ZONE = "example0.org"
+
+
+def run_batch(cli, tmp_path, capsys, *lines, **kwargs):
+    ops = tmp_path / "ops.jsonl"
+    ops.write_text("\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines) + "\n")
+    cli.batch(str(ops), **kwargs)
+    captured = capsys.readouterr()
+    return sorted((json.loads(line) for line in captured.out.splitlines()), key=lambda result: result['line']), \
+        captured.err
+
+
+def test_runs_operations_in_order(api, cli, tmp_path, capsys):
+    metrics = hdns_cli.Metrics()
+    cli.add_hook(metrics)
+
+    results, summary = run_batch(
+        cli, tmp_path, capsys,
+        {"op": "create_record", "zone": ZONE, "name": "www", "type": "A", "value": "192.0.2.1"},
+        {"op": "create_record", "zone": ZONE, "name": "www", "type": "A", "value": "192.0.2.2"},
+        {"op": "create_record", "zone": ZONE, "name": "mail", "type": "A", "value": "192.0.2.3", "ttl": 600},
+        {"op": "update_record", "zone": ZONE, "name": "www", "type": "A", "value": "192.0.2.2",
+         "value_new": "192.0.2.4"},
+        {"op": "delete_record", "zone": ZONE, "name": "host0", "type": "A", "value": "10.0.0.0"},
+        {"op": "delete_records", "zone": ZONE, "name": "host1", "type": "A", "value": "10.0.0.1"},
+    )
+
+    assert [(result['line'], result['op'], result['ok']) for result in results] == [
+        (1, "create_record", True), (2, "create_record", True), (3, "create_record", True),
+        (4, "update_record", True), (5, "delete_record", True), (6, "delete_records", True),
+    ]
+    assert summary.startswith("6 operations, 0 failed")
+    # the consecutive creates are sent together to the bulk endpoint
+    assert ("POST", "records") not in metrics.requests
+    assert len(metrics.requests[("POST", "records/bulk")]) == 1
+
+    assert [rr for rr in zone_records(api) if rr[1] == "A"] == [
+        ("host2", "A", "10.0.0.2", None), ("host3", "A", "10.0.0.3", None), ("host4", "A", "10.0.0.4", None),
+        ("mail", "A", "192.0.2.3", 600), ("www", "A", "192.0.2.1", None), ("www", "A", "192.0.2.4", None),
+    ]
+
+
+def test_reports_failed_operations(api, cli, tmp_path, capsys):
+    before = zone_records(api)
+
+    results, summary = run_batch(
+        cli, tmp_path, capsys,
+        "{not json",
+        "# comment",
+        {"op": "drop_zone", "zone": ZONE},
+        {"op": "create_record", "zone": "unknown.org", "name": "www", "type": "A", "value": "192.0.2.1"},
+        {"op": "delete_record", "zone": ZONE, "name": "missing", "type": "A", "value": "192.0.2.1"},
+        {"op": "delete_record", "zone": ZONE, "name": "host0", "type": "A"},
+    )
+
+    assert [(result['line'], result['ok'], result['error']) for result in results] == [
+        (1, False, results[0]['error']),
+        (3, False, f"unknown op drop_zone, valid are {', '.join(hdns_cli.BATCH_OPS)}"),
+        (4, False, "zone unknown.org not found"),
+        (5, False, "record not found or not unique"),
+        (6, False, "missing field 'value'"),
+    ]
+    assert results[0]['error'].startswith("invalid JSON")
+    assert summary.startswith("5 operations, 5 failed")
+    assert zone_records(api) == before
@@ -0,0 +1,84 @@
+import builtins
+
+import pytest
+
+from conftest import zone_records
+
+ZONE = "example0.org"
+
+
+@pytest.fixture
+def zone_id(api):
+    """ example0.org with SOA and NS at the apex of the mock API, an NS delegation and ACME challenges """
+    zone_id = next(iter(api.state.zones))
+    api.state.add_record(zone_id, "sub", "NS", "ns1.example.net.")
+    api.state.add_record(zone_id, "_acme-challenge", "TXT", "\"abc\"")
+    api.state.add_record(zone_id, "_acme-challenge.www", "TXT", "\"def\"")
+    return zone_id
+
+
+def names(api):
+    return sorted({rr[0] for rr in zone_records(api)})
+
+
+def test_glob_and_type(api, cli, zone_id, capsys):
+    cli.bulk_delete_records(zone=ZONE, name="_acme-challenge*", type="TXT")
+
+    assert "2 records deleted, 0 failed" in capsys.readouterr().out
+    assert names(api) == ["@", "host0", "host1", "host2", "host3", "host4", "sub"]
+
+
+def test_regex_on_value(api, cli, zone_id):
+    cli.bulk_delete_records(zone=ZONE, value="/^10\\.0\\.0\\.[0-2]$/")
+
+    assert names(api) == ["@", "_acme-challenge", "_acme-challenge.www", "host3", "host4", "sub"]
+
+
+def test_patterns_of_csv_file(api, cli, zone_id, tmp_path):
+    patterns = tmp_path / "patterns.csv"
+    patterns.write_text("zone,name,type,value\n"
+                        f"{ZONE},host0,A,10.0.0.0\n"
+                        f"{ZONE},,NS,\n"
+                        "unknown.org,*,,\n")
+    cli.bulk_delete_records(str(patterns))
+
+    assert len([rr for rr in zone_records(api) if rr[1] == "NS"]) == 3
+    assert names(api) == ["@", "_acme-challenge", "_acme-challenge.www", "host1", "host2", "host3", "host4"]
+
+
+def test_star_keeps_soa_and_ns_of_apex(api, cli, zone_id):
+    cli.bulk_delete_records(zone=ZONE, name="*")
+
+    assert sorted(rr[1] for rr in zone_records(api)) == ["NS", "NS", "NS", "SOA"]
+    assert names(api) == ["@"]
+
+
+def test_pattern_required(api, cli, zone_id, capsys):
+    before = zone_records(api)
+    cli.bulk_delete_records(zone=ZONE)
+
+    assert "use --name='*'" in capsys.readouterr().out
+    assert zone_records(api) == before
+
+
+def test_dry_run(api, cli, zone_id, capsys):
+    before = zone_records(api)
+    cli.bulk_delete_records(zone=ZONE, type="A", dry_run=True)
+
+    assert "5 records would be deleted, nothing applied." in capsys.readouterr().out
+    assert zone_records(api) == before
+
+
+@pytest.mark.parametrize("answer, force, remaining", [("no", False, 106), ("YES", False, 0), (None, True, 0)])
+def test_confirmation_above_100_records(api, cli, zone_id, monkeypatch, capsys, answer, force, remaining):
+    for i in range(101):
+        api.state.add_record(zone_id, f"bulk{i}", "A", "192.0.2.1")
+    questions = []
+    monkeypatch.setattr(builtins, "input", lambda: questions.append(1) or answer)
+
+    cli.bulk_delete_records(zone=ZONE, type="A", force=force)
+
+    assert len(questions) == (0 if force else 1)
+    assert len([rr for rr in zone_records(api) if rr[1] == "A"]) == remaining
+    if answer == "no":
+        assert "Are you really want to delete 106 records" in capsys.readouterr().out
@@ -0,0 +1,80 @@
+import json
+import socket
+import threading
+
+import pytest
+
+import hdns_cli
+
+
+@pytest.fixture
+def daemon(cli, tmp_path):
+    """ Daemon of cli on a Unix socket in the temporary directory, yields the socket path """
+    address = str(tmp_path / "hdns.sock")
+    server = hdns_cli.daemon_server(cli, address)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield address
+    server.shutdown()
+    server.server_close()
+
+
+def send(address, call):
+    family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+    with socket.socket(family, socket.SOCK_STREAM) as s:
+        s.connect(address)
+        s.sendall(json.dumps(call).encode() + b"\n")
+        return json.loads(s.makefile("rb").readline())
+
+
+def test_allowed_commands_are_public_commands():
+    commands = {name for name, member in vars(hdns_cli.Hdns_cli).items()
+                if callable(member) and not name.startswith('_')}
+    assert set(hdns_cli.DAEMON_COMMANDS) <= commands
+    assert not {'serve', 'show_token', 'add_hook', 'iter_zones'} & set(hdns_cli.DAEMON_COMMANDS)
+
+
+def test_runs_commands(daemon, capsys):
+    assert hdns_cli.daemon_call(daemon, ["show_zones", "--output", "ndjson"]) == 0
+    assert json.loads(capsys.readouterr().out)['name'] == "example0.org"
+
+
+@pytest.mark.parametrize("argv", [
+    ["API_TOKEN"], ["show_token"], ["serve"], ["_session"], ["_request", "GET", "zones"], ["_get_session"],
+    ["show_zones", "-", "API_TOKEN"], ["show_zones", "--", "--interactive"], [],
+])
+def test_refuses_everything_else(daemon, api, argv):
+    reply = send(daemon, {"argv": argv, "cwd": "/"})
+
+    assert reply['code'] == 2
+    assert api.token not in reply['stdout'] + reply['stderr']
+
+
+@pytest.mark.parametrize("argv", [
+    ["--token", "other", "show_zones"], ["--offline=True", "show_zones"], ["show_zones", "--no_cache"],
+    ["show_zones", "--no-cache"],
+])
+def test_refuses_global_flags(daemon, argv, capsys):
+    assert hdns_cli.daemon_call(daemon, argv) == 2
+    assert "give them to hdns serve" in capsys.readouterr().err
+
+
+def test_tcp_requires_key(cli, tmp_path, monkeypatch):
+    monkeypatch.setattr(hdns_cli, "DAEMON_KEY", str(tmp_path / "daemon.key"))
+    server = hdns_cli.daemon_server(cli, ("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    address = server.server_address[:2]
+
+    try:
+        assert (tmp_path / "daemon.key").stat().st_mode & 0o777 == 0o600
+        assert send(address, {"argv": ["show_system"]})['stderr'] == "invalid daemon key\n"
+        assert send(address, {"argv": ["show_system"], "key": "wrong"})['code'] == 2
+
+        reply = send(address, {"argv": ["show_system"], "key": hdns_cli.daemon_key()})
+        assert (reply['code'], reply['stdout']) == (0, f"{cli.SYSTEM}\n")
+
+        (tmp_path / "daemon.key").chmod(0o644)
+        with pytest.raises(PermissionError):
+            hdns_cli.daemon_key()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,51 @@
+import os
+
+import hdns_cli
+
+
+def test_disabled_by_default(cli):
+    assert cli._http_cache is None
+
+
+def test_not_modified_reuses_cached_body(api, hdns_home):
+    cli = hdns_cli.Hdns_cli(token=api.token, system=api.url, retries=0, http_cache_size=1)
+    metrics = hdns_cli.Metrics()
+    cli.add_hook(metrics)
+    zone_id = cli._get_zone_id("example0.org")
+
+    first = [dict(rr) for rr in cli.iter_records(zone_id)]
+    second = [dict(rr) for rr in cli.iter_records(zone_id)]
+
+    assert second == first
+    assert [event['status'] for event in metrics.requests[("GET", "records")]] == [200, 304]
+    assert len(os.listdir(hdns_cli.HTTP_CACHE_DIR)) == 2
+
+    # a changed listing is downloaded again
+    api.state.add_record(zone_id, "new", "A", "192.0.2.1")
+    assert len(list(cli.iter_records(zone_id))) == len(first) + 1
+    assert metrics.requests[("GET", "records")][-1]['status'] == 200
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = hdns_cli.HttpCache(str(tmp_path), 1000)
+
+    for i in range(2):
+        cache.put(f"key{i}", {"ETag": f'"{i}"'}, b"x" * 300)
+        os.utime(tmp_path / f"key{i}", (i, i))
+    cache.touch("key0")
+    cache.put("key2", {}, b"x" * 300)
+
+    assert sorted(os.listdir(tmp_path)) == ["key0", "key2"]
+    entry = cache.get("key0")
+    assert (entry['etag'], entry['body']) == ('"0"', b"x" * 300)
+    assert cache.get("key1") is None
+
+
+def test_tracks_size_of_files_written_before(tmp_path):
+    hdns_cli.HttpCache(str(tmp_path), 10000).put("old", {}, b"x" * 600)
+    os.utime(tmp_path / "old", (0, 0))
+
+    cache = hdns_cli.HttpCache(str(tmp_path), 1000)
+    cache.put("new", {}, b"x" * 600)
+
+    assert os.listdir(tmp_path) == ["new"]
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import hdns_cli
+from conftest import zone_records
+
+
+@pytest.fixture
+def offline(api, cli):
+    """ Hdns_cli answering from the snapshot written by refresh """
+    cli.refresh()
+    return hdns_cli.Hdns_cli(token=api.token, system=api.url, no_cache=True, retries=0, offline=True)
+
+
+def test_reads_answer_from_snapshot(api, offline, capsys):
+    api.stop()
+    offline.show_records("example0.org", output="json")
+
+    records = json.loads(capsys.readouterr().out)
+    assert sorted(rr['name'] for rr in records if rr['type'] == "A") == [f"host{i}" for i in range(5)]
+
+
+@pytest.mark.parametrize("command, args", [
+    ("create_record", ("example0.org", "www", "A", "10.1.1.1")),
+    ("delete_record", ("example0.org", "host0", "A", "10.0.0.0")),
+    ("refresh", ()),
+])
+def test_writes_raise_offline_error(api, offline, command, args):
+    before = zone_records(api)
+
+    with pytest.raises(hdns_cli.OfflineError, match=f"{command} .* not possible with --offline"):
+        getattr(offline, command)(*args)
+
+    assert zone_records(api) == before
+
+
+def test_api_requests_raise_offline_error(offline):
+    with pytest.raises(hdns_cli.OfflineError, match="not possible with --offline"):
+        offline._request("GET", "zones")
+
+
+def test_without_snapshot(api):
+    with pytest.raises(hdns_cli.OfflineError, match="run hdns refresh first"):
+        hdns_cli.Hdns_cli(token=api.token, system=api.url, no_cache=True, offline=True)
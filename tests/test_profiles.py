@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import hdns_cli
+from conftest import zone_records
+from mock_api import MockApi
+
+
+@pytest.fixture
+def other():
+    """ Second mock API with the zone other.org """
+    api = MockApi(token="hdns-other-token").start()
+    api.state.add_zone("other.org")
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def profiles(api, other, monkeypatch):
+    """ Profiles main and other of the INI file """
+    config = dict(hdns_cli.load_config(), PROFILES={
+        'main': {'system': api.url, 'token': api.token},
+        'other': {'system': other.url, 'token': other.token},
+    })
+    monkeypatch.setattr(hdns_cli, "_config", config)
+    return config['PROFILES']
+
+
+def client(**kwargs):
+    return hdns_cli.Hdns_cli(no_cache=True, retries=0, **kwargs)
+
+
+def test_account_uses_system_and_token_of_profile(other, profiles, capsys):
+    client(account="other").show_zones(output="json")
+
+    assert [zone['name'] for zone in json.loads(capsys.readouterr().out)] == ["other.org"]
+
+
+def test_unknown_account(profiles):
+    with pytest.raises(hdns_cli.ProfileError, match="profile missing not found, known profiles: main, other"):
+        client(account="missing")
+
+
+def test_all_profiles_without_profiles(monkeypatch):
+    monkeypatch.setattr(hdns_cli, "_config", dict(hdns_cli.load_config(), PROFILES={}))
+
+    with pytest.raises(hdns_cli.ProfileError, match="no \\[profile NAME\\] sections"):
+        client(all_profiles=True)
+
+
+def test_all_profiles_merges_reads(profiles, capsys):
+    client(all_profiles=True).show_zones(output="json")
+
+    zones = json.loads(capsys.readouterr().out)
+    assert sorted((zone['profile'], zone['name']) for zone in zones) == [("main", "example0.org"), ("other", "other.org")]
+
+
+def test_all_profiles_skips_failing_profile(other, profiles, capsys):
+    other.stop()
+    client(all_profiles=True).show_records("example0.org", output="json", type="A")
+
+    assert {rr['profile'] for rr in json.loads(capsys.readouterr().out)} == {"main"}
+
+
+@pytest.mark.parametrize("command, args", [
+    ("create_record", ("example0.org", "www", "A", "192.0.2.1")),
+    ("delete_record", ("example0.org", "host0", "A", "10.0.0.0")),
+    ("bulk_delete_records", (None, "example0.org", "*")),
+    ("delete_zone", ("example0.org", True)),
+    ("batch", ("ops.jsonl",)),
+])
+def test_all_profiles_refuses_writes(api, profiles, command, args):
+    before = zone_records(api)
+
+    with pytest.raises(hdns_cli.ProfileError, match=f"{command} changes one account and doesn't support --all_profiles"):
+        getattr(client(all_profiles=True), command)(*args)
+
+    assert zone_records(api) == before
@@ -0,0 +1,45 @@
+import time
+
+import hdns_cli
+from mock_api import MockApi
+
+
+def test_learns_rate_and_burst_from_headers():
+    limiter = hdns_cli.RateLimiter()
+    limiter.update({"RateLimit-Limit": "3600", "RateLimit-Remaining": "3599", "RateLimit-Reset": "1"})
+    assert (limiter.rate, limiter.burst) == (1.0, 3600)
+
+    limiter.update({"RateLimit-Limit": "3600", "RateLimit-Remaining": "3000", "RateLimit-Reset": "300"})
+    assert limiter.rate == 2.0
+    # never more tokens than the API has left
+    assert limiter._tokens <= 3000
+
+
+def test_keeps_configured_rate():
+    limiter = hdns_cli.RateLimiter(rate=5, burst=2)
+    limiter.update({"RateLimit-Limit": "3600", "RateLimit-Remaining": "3000", "RateLimit-Reset": "300"})
+    assert (limiter.rate, limiter.burst) == (5, 2)
+
+
+def test_learned_rate_paces_instead_of_pausing():
+    limiter = hdns_cli.RateLimiter()
+    limiter.update({"RateLimit-Limit": "10", "RateLimit-Remaining": "0", "RateLimit-Reset": "1"})
+
+    start = time.monotonic()
+    limiter.acquire()
+    assert 0.05 < time.monotonic() - start < 0.5
+
+
+def test_bulk_requests_without_429():
+    api = MockApi(token="hdns-test-token", rate_limit=100, burst=10).start()
+    try:
+        cli = hdns_cli.Hdns_cli(token=api.token, system=api.url, no_cache=True, retries=0)
+        metrics = hdns_cli.Metrics()
+        cli.add_hook(metrics)
+
+        for _ in range(25):
+            cli._request("GET", "zones")
+
+        assert [event['status'] for event in metrics.requests[("GET", "zones")]] == [200] * 25
+    finally:
+        api.stop()
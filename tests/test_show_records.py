@@ -0,0 +1,22 @@
+import json
+
+import hdns_cli
+
+
+def test_shows_records_of_zone(cli, capsys):
+    cli.show_records("example0.org", output="json", type="A")
+
+    records = json.loads(capsys.readouterr().out)
+    assert sorted(rr['name'] for rr in records) == [f"host{i}" for i in range(5)]
+
+
+def test_unknown_zone(cli, capsys):
+    metrics = hdns_cli.Metrics()
+    cli.add_hook(metrics)
+    cli.show_records("unknown.org")
+
+    captured = capsys.readouterr()
+    assert captured.out == "zone unknown.org not found.\n"
+    assert "Traceback" not in captured.err
+    # no records are requested without a zone id
+    assert ("GET", "records") not in metrics.requests
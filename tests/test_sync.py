@@ -0,0 +1,87 @@
+import yaml
+
+from conftest import zone_records
+
+ZONE = "example0.org"
+
+
+def desired(*records):
+    return [dict(zone=ZONE, **rr) for rr in records]
+
+
+def keys(records):
+    return sorted((rr['name'], rr['type'], rr['value']) for rr in records)
+
+
+def test_sync_diff_creates_updates_and_deletes(cli):
+    zone_id = cli._get_zone_id(ZONE)
+
+    creates, updates, deletes = cli._sync_diff(zone_id, desired(
+        {"name": "host0", "type": "A", "value": "10.0.0.0"},
+        {"name": "host1", "type": "A", "value": "10.9.9.9"},
+        {"name": "host2", "type": "A", "value": "10.0.0.2", "ttl": 600},
+        {"name": "new", "type": "TXT", "value": "\"v=spf1 -all\""},
+    ))
+
+    assert keys(creates) == [("new", "TXT", "\"v=spf1 -all\"")]
+    # a changed value is an update in place of the old record, not a delete and a create
+    assert sorted((rr['name'], rr['value'], rr.get('value_old'), rr.get('ttl')) for rr in updates) == [
+        ("host1", "10.9.9.9", "10.0.0.1", None),
+        ("host2", "10.0.0.2", None, 600),
+    ]
+    assert all(rr['id'] for rr in updates)
+    # SOA and NS of the zone apex are never deleted
+    assert keys(deletes) == [("host3", "A", "10.0.0.3"), ("host4", "A", "10.0.0.4")]
+
+
+def test_sync_diff_without_prune_keeps_other_records(cli):
+    zone_id = cli._get_zone_id(ZONE)
+
+    creates, updates, deletes = cli._sync_diff(zone_id, desired(
+        {"name": "host1", "type": "A", "value": "10.9.9.9"},
+    ), prune=False)
+
+    assert keys(creates) == [("host1", "A", "10.9.9.9")]
+    assert updates == []
+    assert deletes == []
+
+
+def test_sync_diff_removes_duplicates(api, cli):
+    zone_id = cli._get_zone_id(ZONE)
+    api.state.add_record(zone_id, "host0", "A", "10.0.0.0")
+
+    creates, updates, deletes = cli._sync_diff(zone_id, desired(
+        *[{"name": f"host{i}", "type": "A", "value": f"10.0.0.{i}"} for i in range(5)],
+        {"name": "host0", "type": "A", "value": "10.0.0.0"},
+    ))
+
+    assert creates == []
+    assert updates == []
+    assert keys(deletes) == [("host0", "A", "10.0.0.0")]
+
+
+def test_sync_rerun_is_idempotent(api, cli, tmp_path, capsys):
+    file = tmp_path / "records.yaml"
+    file.write_text(yaml.safe_dump({"records": desired(
+        {"name": "host0", "type": "A", "value": "10.0.0.0"},
+        {"name": "host1", "type": "A", "value": "10.9.9.9", "ttl": 600},
+        {"name": "www", "type": "CNAME", "value": "host0"},
+        {"name": "www", "type": "CNAME", "value": "host0"},
+    )}))
+
+    cli.sync(str(file))
+    assert "5 changes applied, 0 failed" in capsys.readouterr().out
+    applied = zone_records(api)
+    assert [rr for rr in applied if rr[1] not in ("SOA", "NS")] == [
+        ("host0", "A", "10.0.0.0", None),
+        ("host1", "A", "10.9.9.9", 600),
+        ("www", "CNAME", "host0", None),
+    ]
+
+    zone_id = cli._get_zone_id(ZONE)
+    cli._drop_record_index(zone_id)
+    assert cli._sync_diff(zone_id, yaml.safe_load(file.read_text())['records']) == ([], [], [])
+
+    cli.sync(str(file))
+    assert "0 changes applied, 0 failed" in capsys.readouterr().out
+    assert zone_records(api) == applied
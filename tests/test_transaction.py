@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import hdns_cli
+from conftest import zone_records
+
+ZONE = "example0.org"
+
+
+def fail_delete_of(api, monkeypatch, name):
+    """ Let the mock API answer the delete of the record name with 500 """
+    route = api.route
+
+    def failing_route(method, path, query, body):
+        parts = path.split("/")
+        if method == "DELETE" and parts[0] == "records" and api.state.records[parts[1]]['name'] == name:
+            return 500, {"error": {"message": "internal error", "code": 500}}
+        return route(method, path, query, body)
+
+    monkeypatch.setattr(api, "route", failing_route)
+
+
+def changes(tx):
+    tx.create_record(ZONE, "new", "A", "192.0.2.10")
+    tx.update_record(ZONE, "host0", "A", "10.0.0.0", value_new="192.0.2.1")
+    tx.delete_record(ZONE, "host1", "A", "10.0.0.1")
+    tx.delete_records(ZONE, "host2", "A", "10.0.0.2")
+
+
+def test_commit(api, cli):
+    with hdns_cli.Transaction(cli) as tx:
+        changes(tx)
+
+    records = [rr[:3] for rr in zone_records(api) if rr[1] == "A"]
+    assert records == [
+        ("host0", "A", "192.0.2.1"), ("host3", "A", "10.0.0.3"), ("host4", "A", "10.0.0.4"), ("new", "A", "192.0.2.10")
+    ]
+    with open(tx.journal) as f:
+        assert json.load(f)['state'] == "committed"
+
+
+def test_failed_change_is_rolled_back(api, cli, monkeypatch):
+    before = zone_records(api)
+    fail_delete_of(api, monkeypatch, "host2")
+
+    tx = hdns_cli.Transaction(cli)
+    changes(tx)
+    with pytest.raises(hdns_cli.TransactionError) as e:
+        tx.commit()
+
+    assert e.value.journal == tx.journal
+    with open(tx.journal) as f:
+        journal = json.load(f)
+    assert journal['state'] == "rolled back"
+    assert journal['failed'] == ["host2 A 10.0.0.2 @ example0.org: internal error"]
+    assert zone_records(api) == before
+
+
+def test_rollback_of_journal_is_idempotent(api, cli):
+    before = zone_records(api)
+    with hdns_cli.Transaction(cli) as tx:
+        changes(tx)
+
+    cli.rollback(tx.journal)
+    assert zone_records(api) == before
+
+    # a second rollback finds nothing left to revert
+    cli.rollback(tx.journal)
+    assert zone_records(api) == before
@@ -0,0 +1,145 @@
+import hdns_cli
+from conftest import zone_records
+
+
+def parse(text, origin=None):
+    return list(hdns_cli.parse_zonefile(text.splitlines(), origin))
+
+
+def test_origin_and_ttl_directives():
+    records = parse(
+        "$ORIGIN example.org.\n"
+        "$TTL 1h30m\n"
+        "@ IN NS ns1\n"
+        "www 300 IN A 192.0.2.1\n"
+        "$ORIGIN sub\n"
+        "mail IN MX 10 mx.example.org.\n"
+        "$TTL 600\n"
+        "abs.example.com. A 192.0.2.2\n"
+    )
+
+    assert [(rr['name'], rr['ttl'], rr['type']) for rr in records] == [
+        ("example.org.", 5400, "NS"),
+        ("www.example.org.", 300, "A"),
+        # a relative $ORIGIN is appended to the current origin
+        ("mail.sub.example.org.", 5400, "MX"),
+        ("abs.example.com.", 600, "A"),
+    ]
+    assert all(rr['error'] is None for rr in records)
+
+
+def test_origin_parameter_until_first_directive():
+    assert parse("www A 192.0.2.1\n", "example.org")[0]['name'] == "www.example.org."
+
+
+def test_multi_line_parentheses():
+    records = parse(
+        "$ORIGIN example.org.\n"
+        "@ IN SOA ns1.example.org. admin.example.org. (\n"
+        "        2021101701 ; serial\n"
+        "        7200       ; refresh\n"
+        "        3600 1209600\n"
+        "        3600 )\n"
+        "www A 192.0.2.1\n"
+    )
+
+    assert records[0] == {
+        "line": 2, "name": "example.org.", "ttl": None, "type": "SOA",
+        "value": "ns1.example.org. admin.example.org. 2021101701 7200 3600 1209600 3600", "error": None
+    }
+    assert (records[1]['line'], records[1]['name']) == (7, "www.example.org.")
+
+
+def test_unbalanced_parentheses():
+    records = parse("@ IN SOA ns1.example.org. admin.example.org. ( 1 2 3 4 5\n", "example.org.")
+
+    assert [rr['error'] for rr in records] == ["unbalanced parentheses"]
+
+
+def test_quoted_txt_with_semicolon():
+    records = parse('txt IN TXT "v=spf1 include:_spf.example.org; -all" "second ; part" ; comment\n', "example.org.")
+
+    assert records[0]['value'] == '"v=spf1 include:_spf.example.org; -all" "second ; part"'
+    assert records[0]['error'] is None
+
+
+def test_blank_owner_repeats_previous_name():
+    records = parse("www A 192.0.2.1\n    AAAA 2001:db8::1\n", "example.org.")
+
+    assert [(rr['name'], rr['type']) for rr in records] == [("www.example.org.", "A"), ("www.example.org.", "AAAA")]
+
+
+def test_errors():
+    records = parse("$INCLUDE other.zone\nwww A 300.1.1.1\nwww MX mail\nwww\n", "example.org.")
+
+    assert [(rr['line'], rr['error'] is not None) for rr in records] == [(1, True), (2, True), (3, True), (4, True)]
+    assert records[0]['type'] is None
+    assert records[3]['error'] == "record without type"
+
+
+def test_check_zonefile(tmp_path):
+    file = tmp_path / "example.org.zone"
+    file.write_text("$ORIGIN example.org.\n$TTL 3600\nwww A 192.0.2.1\nbad A 1.2.3\n")
+
+    assert hdns_cli.check_zonefile(str(file)) == {
+        "parsed_records": 2, "valid_records": 1, "errors": [(4, "invalid A record data: 1.2.3")]
+    }
+
+
+def test_check_zonefile_rows_of_validate_dir(tmp_path):
+    cli = hdns_cli.Hdns_cli(token="token", no_cache=True)
+    (tmp_path / "good.org.zone").write_text("www A 192.0.2.1\n")
+    (tmp_path / "bad.org.zone").write_text("www A 192.0.2.1\nbad A 1.2.3\n")
+
+    good = cli._check_zonefile(str(tmp_path / "good.org.zone"), False, False)
+    bad = cli._check_zonefile(str(tmp_path / "bad.org.zone"), False, False)
+    missing = cli._check_zonefile(str(tmp_path / "missing.org.zone"), False, False)
+
+    assert (good['parsed'], good['valid'], good['result']) == (1, 1, "OK")
+    assert (bad['parsed'], bad['valid']) == (2, 1)
+    assert bad['result'] == "invalid: line 2: invalid A record data: 1.2.3"
+    assert (missing['parsed'], missing['valid']) == (0, 0)
+    assert missing['result'].startswith("failed:")
+
+
+def test_names_stay_relative_without_origin():
+    records = parse("$TTL 3600\n@ IN NS ns1\nwww A 192.0.2.1\n$ORIGIN @\n")
+
+    assert [(rr['name'], rr['error']) for rr in records[:2]] == [("@", None), ("www", None)]
+    assert records[2]['error'] == "invalid or unsupported directive $ORIGIN @"
+
+
+def test_check_zonefile_counts_records_with_errors(tmp_path):
+    file = tmp_path / "example.org.zone"
+    file.write_text("    A 192.0.2.1\nwww A 192.0.2.1\n$INCLUDE other.zone\nwww\n")
+
+    result = hdns_cli.check_zonefile(str(file))
+    assert (result['parsed_records'], result['valid_records']) == (3, 1)
+    assert [line for line, error in result['errors']] == [1, 3, 4]
+
+
+def test_validate_zonefile_with_zone(tmp_path, capsys):
+    cli = hdns_cli.Hdns_cli(token="token", no_cache=True)
+    file = tmp_path / "example.zone"
+    file.write_text("$TTL 3600\n@ IN SOA ns1 admin 1 7200 3600 1209600 3600\nwww CNAME @\n")
+
+    cli.validate_zonefile(str(file))
+    cli.validate_zonefile(str(file), zone="example.org")
+    assert capsys.readouterr().out == "Zone file OK!\nparsed records: 2\nvalid records: 2\n" * 2
+
+
+def test_validate_dir_and_import_dir_remote(api, cli, tmp_path, capsys):
+    (tmp_path / "example0.org.zone").write_text(
+        "$TTL 3600\n@ IN NS ns1.example.org.\nwww A 192.0.2.1\n  AAAA 2001:db8::1\ntxt TXT \"a; b\" ; comment\n"
+    )
+    (tmp_path / "bad.org.zone").write_text("www A 1.2.3\n")
+
+    rows = {row['zone']: row for row in
+            (cli._check_zonefile(str(file), True, True) for file in sorted(tmp_path.glob("*.zone")))}
+
+    assert rows['example0.org']['result'] == "imported"
+    assert rows['bad.org']['result'] == "invalid: line 1: invalid A value 1.2.3"
+    assert zone_records(api) == [
+        ("@", "NS", "ns1.example.org.", 3600), ("txt", "TXT", "\"a; b\"", 3600), ("www", "A", "192.0.2.1", 3600),
+        ("www", "AAAA", "2001:db8::1", 3600),
+    ]